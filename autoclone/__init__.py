@@ -0,0 +1,9 @@
+"""Offline tooling for the OT-2 protocols in scripts/.
+
+Nothing in this package is needed on the robot, the protocols stay self-contained files that
+can be uploaded to the Opentrons App as before.
+"""
+from .estimate import Estimate, estimate
+from .robot import PHASE_PREFIX, OutOfTipsError, ProtocolContext, SimulationError, simulate
+
+__version__ = '1.0.1'
@@ -0,0 +1,234 @@
+"""Splits a large sample batch across several robots.
+
+Usage::
+
+    python -m autoclone.batch constructs.csv scripts/restriction_digestion.py --robots 3 -o batch
+
+The batch manifest lists one sample per entry, as CSV with a header line or as a JSON list, with
+``sample`` and optionally ``mix`` and ``replicates`` (see the sample manifests of the protocols, the
+planner assigns the wells). Samples with the same mix are packed into columns of eight. The columns
+are split into one consecutive range per robot such that the robot finishing last finishes as early
+as possible: a robot runs its columns as plates, one protocol run per plate, and needs the simulated
+runtime of every plate plus a changeover between two runs. A plate takes up to twelve columns, fewer
+if the protocol cannot process more in one run (e.g. because its tip racks do not suffice).
+
+For every robot, the output directory gets one protocol file per run (a copy of the protocol with the
+plate manifest filled in) and a deck sheet with the deck layout, the sample map and the reagent
+volumes of each run. The reported times come from simulating the written protocol files.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+
+from .benchmark import protocol_name
+from .estimate import estimate, format_duration
+from .robot import SimulationError, simulate
+
+MANIFEST = re.compile(r'(\n    manifest = """\n)(.*?)(\n""")', re.S)
+ROWS = 'ABCDEFGH'
+PLATE_COLUMNS = 12
+CHANGEOVER = 15             # min for the operator to set up the next run on the same robot
+
+
+def read_batch(path):
+    """Samples of a batch manifest in the order given."""
+    with open(path, encoding='utf-8') as f:
+        text = f.read().strip()
+    rows = json.loads(text) if text.startswith('[') else list(csv.DictReader(io.StringIO(text)))
+    samples = []
+    for i, row in enumerate(rows):
+        samples.append({
+            'sample': str(row.get('sample') or f'sample {i + 1}'),
+            'mix': str(row.get('mix') or '').strip() or None,
+            'replicates': int(row.get('replicates') or 1)})
+    if not samples:
+        raise ValueError(f'{path} lists no samples')
+    return samples
+
+
+def pack_columns(samples):
+    """Columns of up to eight samples with the same mix, mixes in the order they first appear."""
+    groups = {}
+    for sample in samples:
+        groups.setdefault(sample['mix'], []).append(sample)
+    return [group[k:k + len(ROWS)] for group in groups.values() for k in range(0, len(group), len(ROWS))]
+
+
+def plate_manifest(columns):
+    """CSV manifest of a plate holding ``columns`` in plate columns 1, 2, ..."""
+    samples = [sample for column in columns for sample in column]
+    fields = ['well', 'sample']
+    if any(sample['mix'] is not None for sample in samples):
+        fields.append('mix')
+    if any(sample['replicates'] != 1 for sample in samples):
+        fields.append('replicates')
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(fields)
+    for number, column in enumerate(columns, 1):
+        for row, sample in zip(ROWS, column):
+            entry = dict(sample, well=f'{row}{number}')
+            writer.writerow(['' if entry[field] is None else entry[field] for field in fields])
+    return out.getvalue().rstrip('\n')
+
+
+def with_manifest(source, manifest):
+    """Protocol source with its sample manifest replaced."""
+    if len(MANIFEST.findall(source)) != 1:
+        raise ValueError('the protocol does not read exactly one sample manifest')
+    if '"""' in manifest:
+        raise ValueError('sample names must not contain """')
+    return MANIFEST.sub(lambda match: match.group(1) + manifest + match.group(3), source)
+
+
+class Planner:
+    """Estimated runtimes of plates and robots for one protocol, simulated once per plate layout."""
+
+    def __init__(self, path, changeover=CHANGEOVER):
+        self.path = path
+        with open(path, encoding='utf-8') as f:
+            self.source = f.read()
+        with_manifest(self.source, '')
+        self.changeover = 60 * changeover
+        self.plate_runtimes = {}
+
+    def plate_runtime(self, columns):
+        """Seconds of one run with ``columns`` on the plate, None if the protocol cannot process them in one run."""
+        # runtimes only depend on the sizes, mixes and replicates of the columns, not on the sample names
+        key = tuple((len(column), column[0]['mix'], max(sample['replicates'] for sample in column)) for column in columns)
+        if key not in self.plate_runtimes:
+            source = with_manifest(self.source, plate_manifest(columns))
+            try:
+                self.plate_runtimes[key] = estimate(simulate(self.path, source=source).commands).total
+            except SimulationError:
+                self.plate_runtimes[key] = None
+        return self.plate_runtimes[key]
+
+    def plates(self, columns):
+        """``columns`` in consecutive plates, each filled as far as the protocol can process in one run."""
+        runs = []
+        for column in columns:
+            if runs and len(runs[-1]) < PLATE_COLUMNS and self.plate_runtime(runs[-1] + [column]) is not None:
+                runs[-1] = runs[-1] + [column]
+            elif self.plate_runtime([column]) is not None:
+                runs.append([column])
+            else:
+                raise ValueError(f'{protocol_name(self.path)} cannot process a column of {len(column)} samples')
+        return runs
+
+    def runtime(self, columns):
+        """Seconds a robot needs for ``columns``, including the changeovers between its runs."""
+        runs = self.plates(columns)
+        return sum(self.plate_runtime(plate) for plate in runs) + self.changeover * max(len(runs) - 1, 0)
+
+    def partition(self, columns, robots):
+        """Splits ``columns`` into ``robots`` consecutive ranges with the least runtime of the slowest robot."""
+        n = len(columns)
+        runtime = {}
+
+        def cost(i, j):
+            if (i, j) not in runtime:
+                runtime[(i, j)] = self.runtime(columns[i:j])
+            return runtime[(i, j)]
+
+        # best[k][j]: least finishing time of the slowest of k robots sharing the first j columns, start[k][j]: first column of robot k
+        # (of equally good splits the one giving robot k the fewest columns, so that robots left without work come last)
+        best = [[0.0] + [float('inf')] * n]
+        start = [[0] * (n + 1)]
+        for k in range(1, robots + 1):
+            best.append([0.0] * (n + 1))
+            start.append([0] * (n + 1))
+            for j in range(1, n + 1):
+                best[k][j], i = min((max(best[k - 1][i], cost(i, j)), -i) for i in range(j + 1))
+                start[k][j] = -i
+        ranges = []
+        j = n
+        for k in range(robots, 0, -1):
+            ranges.append(columns[start[k][j]:j])
+            j = start[k][j]
+        return ranges[::-1]
+
+
+def deck_sheet(robot, runs):
+    """Markdown deck sheet of one robot, ``runs`` are (file name, plate columns, recorded protocol)."""
+    total = sum(estimate(protocol.commands).total for _, _, protocol in runs)
+    samples = sum(len(column) for _, columns, _ in runs for column in columns)
+    lines = [f'# Robot {robot}', '',
+             f'{len(runs)} runs, {samples} samples, estimated {format_duration(total)} without changeovers.']
+    for number, (name, columns, protocol) in enumerate(runs, 1):
+        lines += ['', f'## Run {number}: {name} (estimated {format_duration(estimate(protocol.commands).total)})', '',
+                  '| Slot | Labware |', '| --- | --- |']
+        for slot in sorted(protocol.deck, key=int):
+            item = protocol.deck[slot]
+            module = protocol.loaded_modules.get(slot)
+            if module is not None and module.labware is not None:
+                item = f'{item} with {module.labware.load_name}'
+            elif slot in protocol.loaded_labwares:
+                item = protocol.loaded_labwares[slot].load_name
+            if module is not None or slot in protocol.loaded_labwares:
+                lines.append(f'| {slot} | {item} |')
+        lines += ['', 'Samples:', '', '| | ' + ' | '.join(str(k) for k in range(1, len(columns) + 1)) + ' |',
+                  '| --- ' * (len(columns) + 1) + '|']
+        for r, row in enumerate(ROWS):
+            cells = [column[r]['sample'] if r < len(column) else '' for column in columns]
+            lines.append(f'| {row} | ' + ' | '.join(cells) + ' |')
+        reagents = estimate(protocol.commands).reagents
+        if reagents:
+            lines += ['', 'Reagents (µl, without dead volume):', '']
+            lines += [f'- {key}: {volume:g}' for key, volume in reagents.items()]
+    return '\n'.join(lines) + '\n'
+
+
+def write_batch(planner, ranges, output):
+    """Writes the protocol files and deck sheets and returns the simulated runtime per robot."""
+    name = protocol_name(planner.path)
+    runtimes = []
+    for robot, columns in enumerate(ranges, 1):
+        directory = os.path.join(output, f'robot{robot}')
+        os.makedirs(directory, exist_ok=True)
+        runs = []
+        for number, plate in enumerate(planner.plates(columns), 1):
+            path = os.path.join(directory, f'run{number}_{name}.py')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(with_manifest(planner.source, plate_manifest(plate)))
+            runs.append((os.path.basename(path), plate, simulate(path)))
+        with open(os.path.join(directory, 'deck_sheet.md'), 'w', encoding='utf-8') as f:
+            f.write(deck_sheet(robot, runs))
+        runtime = sum(estimate(protocol.commands).total for _, _, protocol in runs)
+        runtimes.append((runs, runtime + planner.changeover * max(len(runs) - 1, 0)))
+    return runtimes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Split a sample batch across several robots with balanced runtimes.')
+    parser.add_argument('batch', help='batch manifest, CSV or JSON with one sample per entry')
+    parser.add_argument('protocol', help='protocol reading a sample manifest, e.g. scripts/restriction_digestion.py')
+    parser.add_argument('--robots', type=int, default=2, help='number of robots')
+    parser.add_argument('--changeover', type=float, default=CHANGEOVER, help='minutes between two runs on the same robot')
+    parser.add_argument('-o', '--output', default='batch', help='output directory')
+    args = parser.parse_args(argv)
+
+    try:
+        planner = Planner(args.protocol, args.changeover)
+    except ValueError as error:
+        parser.error(f'{args.protocol}: {error}')
+    try:
+        ranges = planner.partition(pack_columns(read_batch(args.batch)), args.robots)
+    except ValueError as error:
+        parser.error(str(error))
+    results = write_batch(planner, ranges, args.output)
+    for robot, (runs, runtime) in enumerate(results, 1):
+        samples = sum(len(column) for _, plate, _ in runs for column in plate)
+        print(f'robot {robot}: {len(runs)} runs, {samples} samples, {format_duration(runtime)}')
+    finishing = [runtime for runs, runtime in results if runs]
+    print(f'Everything done after {format_duration(max(finishing))}, '
+          f'robots finish within {format_duration(max(finishing) - min(finishing))} of each other; written to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Offline benchmark of every protocol in scripts/.
+
+Usage::
+
+    python -m autoclone.benchmark              # report and compare against the baseline
+    python -m autoclone.benchmark --update     # accept the current numbers as new baseline
+
+The command exits with status 1 if a protocol got slower or uses more tips than recorded in
+``benchmarks/baseline.json``.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+from .estimate import estimate, format_duration
+from .robot import simulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(ROOT, 'scripts')
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+
+def protocol_paths(directory=SCRIPTS_DIR):
+    """All protocol files, skipping private helpers such as ``__init_.py``."""
+    return sorted(
+        path for path in glob.glob(os.path.join(directory, '*.py'))
+        if not os.path.basename(path).startswith('_'))
+
+
+def protocol_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def benchmark(paths, log=None):
+    """Simulates each protocol and returns its summary keyed by protocol name.
+
+    If ``log`` is given, it is called with the protocol name and every comment and pause message.
+    """
+    results = {}
+    for path in paths:
+        commands = simulate(path).commands
+        if log is not None:
+            for command in commands:
+                if command['command'] in ('comment', 'pause', 'move_labware'):
+                    log(protocol_name(path), command['message'])
+        results[protocol_name(path)] = estimate(commands).summary()
+    return results
+
+
+def compare(results, baseline, tolerance=0.01):
+    """Lists regressions of ``results`` against ``baseline``.
+
+    A protocol regresses if its estimated runtime grows by more than ``tolerance`` (relative)
+    or if it needs more tips than before.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if result['total_seconds'] > reference['total_seconds'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: runtime {format_duration(reference["total_seconds"])} -> '
+                f'{format_duration(result["total_seconds"])}')
+        if result['tips'] > reference['tips']:
+            regressions.append(f'{name}: tips {reference["tips"]} -> {result["tips"]}')
+    return regressions
+
+
+def format_report(results, baseline=None):
+    baseline = baseline or {}
+    lines = []
+    for name, result in results.items():
+        reference = baseline.get(name, {})
+        change = ''
+        if reference:
+            delta = result['total_seconds'] - reference['total_seconds']
+            change = f' ({"+" if delta >= 0 else "-"}{format_duration(abs(delta))})'
+        lines.append(f'{name}: {format_duration(result["total_seconds"])}{change}, '
+                     f'{result["tips"]} tips in {result["tip_pickups"]} pickups, '
+                     f'{result["commands"]} commands, {result["pauses"]} pauses')
+        for phase, seconds in result['phases'].items():
+            lines.append(f'    {phase:<32} {format_duration(seconds)}')
+        for well, volume in result['reagents'].items():
+            lines.append(f'    {well:<48} {volume / 1000:8.2f} ml')
+        for profile, mixing in result.get('mixing', {}).items():
+            lines.append(f'    mixing {profile:<25} {format_duration(mixing["seconds"])} '
+                         f'({mixing["mixes"]} x {mixing["seconds"] / mixing["mixes"]:.1f} s)')
+    return '\n'.join(lines)
+
+
+def load_baseline(path=BASELINE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(results.items())), f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Estimate runtime, tips and reagents of the OT-2 protocols offline.')
+    parser.add_argument('protocols', nargs='*', help='protocol files, defaults to all files in scripts/')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file to compare against')
+    parser.add_argument('--update', action='store_true', help='write the current results as new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.01, help='allowed relative runtime increase')
+    parser.add_argument('--log', action='store_true', help='print the run log (comments and pauses) of each protocol')
+    args = parser.parse_args(argv)
+
+    log = (lambda name, message: print(f'[{name}] {message}')) if args.log else None
+    results = benchmark(args.protocols or protocol_paths(), log)
+    baseline = load_baseline(args.baseline)
+    print(format_report(results, baseline))
+    if args.update:
+        save_baseline({**baseline, **results}, args.baseline)
+        print(f'Baseline written to {args.baseline}')
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# Geometry of the OT-2 deck and of the labware and pipettes used by the scripts in scripts/.
+# Dimensions are taken from the (custom) labware definitions used in the lab and rounded to 0.1 mm,
+# which is more than precise enough for offline runtime estimates.
+
+# front left corner of each deck slot in deck coordinates (mm)
+SLOT_ORIGINS = {
+    '1': (0.0, 0.0), '2': (132.5, 0.0), '3': (265.0, 0.0),
+    '4': (0.0, 90.5), '5': (132.5, 90.5), '6': (265.0, 90.5),
+    '7': (0.0, 181.0), '8': (132.5, 181.0), '9': (265.0, 181.0),
+    '10': (0.0, 271.5), '11': (132.5, 271.5), '12': (265.0, 271.5)}
+
+# the fixed trash sits in slot 12, tips are dropped roughly above its centre
+TRASH_POSITION = (337.0, 315.0, 82.0)
+TRASH_SLOT = '12'
+
+# the Thermocycler Module always occupies these slots, labware is loaded into the first one
+THERMOCYCLER_SLOTS = ('7', '8', '10', '11')
+
+# height of the labware seat above the deck surface (mm)
+MODULE_HEIGHTS = {
+    'thermocycler': 98.0,
+    'magdeck': 45.0,
+    'tempdeck': 82.0}
+
+MODULE_NAMES = {
+    'thermocycler module': 'thermocycler',
+    'thermocyclermodulev1': 'thermocycler',
+    'magnetic module': 'magdeck',
+    'magnetic module gen2': 'magdeck',
+    'magdeck': 'magdeck',
+    'magneticmodulev1': 'magdeck',
+    'magneticmodulev2': 'magdeck',
+    'temperature module': 'tempdeck',
+    'temperature module gen2': 'tempdeck',
+    'tempdeck': 'tempdeck'}
+
+
+def _plate(depth, volume, height, diameter=None, length=None, width=None, rows=8, columns=12,
+           x0=14.4, y0=74.2, pitch=9.0, tiprack=False, tip_length=None):
+    return {
+        'rows': rows, 'columns': columns, 'x0': x0, 'y0': y0, 'pitch': pitch,
+        'depth': depth, 'volume': volume, 'height': height,
+        'diameter': diameter, 'length': length, 'width': width,
+        'tiprack': tiprack, 'tip_length': tip_length}
+
+
+# x0/y0 is the centre of well A1 relative to the front left corner of the labware,
+# wells are either circular (diameter) or rectangular (length along x, width along y)
+LABWARE = {
+    'biorad_96_wellplate_200ul_pcr': _plate(14.8, 200, 16.1, diameter=5.5),
+    'thermofisher_96_pcrplate_200ul': _plate(14.9, 200, 16.0, diameter=5.5),
+    'thermo_96_chilledpcr_200ul': _plate(14.9, 200, 35.0, diameter=5.5),
+    'nonskirted_96_wellplate_300ul': _plate(10.7, 300, 14.4, diameter=6.9),
+    'nest_96_wellplate_200ul_flat': _plate(10.9, 200, 14.2, diameter=6.4),
+    'greiner_96_wellplate_320ul': _plate(10.9, 320, 14.6, diameter=7.0),
+    'usascientific_96_wellplate_2.4ml_deep': _plate(41.3, 2400, 44.1, length=8.2, width=8.2),
+    'agarplate_96_wellplate_5ul': _plate(1.0, 5, 15.0, diameter=5.0),
+    'agilent_12_reservoir_21ml': _plate(39.2, 21000, 44.0, length=8.3, width=71.9, rows=1, y0=42.8),
+    'nest_12_reservoir_15ml': _plate(26.9, 15000, 31.4, length=8.2, width=71.2, rows=1, y0=42.8),
+    'vwr_96_tiprack_300ul': _plate(59.3, 300, 64.5, diameter=5.2, tiprack=True, tip_length=59.3),
+    'vwr_96_tiprack_10ul_short': _plate(31.6, 10, 50.8, diameter=3.3, tiprack=True, tip_length=31.6),
+    'opentrons_96_tiprack_20ul': _plate(39.2, 20, 64.5, diameter=3.3, tiprack=True, tip_length=39.2),
+    'opentrons_96_tiprack_300ul': _plate(59.3, 300, 64.5, diameter=5.2, tiprack=True, tip_length=59.3),
+    'opentrons_1_trash_1100ml_fixed': _plate(0.0, 1100000, 82.0, length=172.9, width=165.9, rows=1, columns=1,
+                                             x0=72.0, y0=43.5)}
+
+FIXED_TRASH = 'opentrons_1_trash_1100ml_fixed'
+
+# default flow rates (µl/s) as reported by the Python Protocol API from apiLevel 2.6 on
+PIPETTES = {
+    'p300_multi': {'channels': 8, 'max_volume': 300, 'min_volume': 30,
+                   'aspirate': 150.0, 'dispense': 300.0, 'blow_out': 300.0},
+    'p300_multi_gen2': {'channels': 8, 'max_volume': 300, 'min_volume': 20,
+                        'aspirate': 94.0, 'dispense': 94.0, 'blow_out': 94.0},
+    'p300_single_gen2': {'channels': 1, 'max_volume': 300, 'min_volume': 20,
+                         'aspirate': 92.86, 'dispense': 92.86, 'blow_out': 92.86},
+    'p20_multi_gen2': {'channels': 8, 'max_volume': 20, 'min_volume': 1,
+                       'aspirate': 7.6, 'dispense': 7.6, 'blow_out': 7.6},
+    'p20_single_gen2': {'channels': 1, 'max_volume': 20, 'min_volume': 1,
+                        'aspirate': 7.6, 'dispense': 7.6, 'blow_out': 7.6}}
+
+# below apiLevel 2.6 the GEN2 pipettes default to about half these flow rates (µl/s, aspirate, dispense and blow-out alike)
+FLOW_RATES_BEFORE_2_6 = {'p300_multi_gen2': 46.43, 'p300_single_gen2': 46.43, 'p20_multi_gen2': 3.78, 'p20_single_gen2': 3.78}
+
+
+def labware_definition(load_name):
+    try:
+        return LABWARE[load_name]
+    except KeyError:
+        raise ValueError(f'No offline definition for labware "{load_name}", please add it to autoclone/deck.py') from None
+
+
+def pipette_definition(instrument_name, api_level='2.8'):
+    """Offline definition of a pipette, with the default flow rates of ``api_level``."""
+    try:
+        definition = PIPETTES[instrument_name]
+    except KeyError:
+        raise ValueError(f'No offline definition for pipette "{instrument_name}", please add it to autoclone/deck.py') from None
+    if instrument_name in FLOW_RATES_BEFORE_2_6 and tuple(int(part) for part in str(api_level).split('.')) < (2, 6):
+        rate = FLOW_RATES_BEFORE_2_6[instrument_name]
+        definition = dict(definition, aspirate=rate, dispense=rate, blow_out=rate)
+    return definition
+
+
+def module_type(module_name):
+    try:
+        return MODULE_NAMES[module_name.lower()]
+    except KeyError:
+        raise ValueError(f'Unknown module "{module_name}"') from None
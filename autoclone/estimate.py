@@ -0,0 +1,215 @@
+"""Wall-clock time estimates for recorded protocol runs.
+
+The estimate walks through the commands recorded by ``autoclone.robot`` and adds up gantry
+moves, plunger movements (volume / flow rate), tip handling, delays and module operations.
+Thermocycler steps include ramping between temperatures. Pauses and manual labware moves wait
+for the operator, so they are counted but do not add to the runtime.
+
+Mixes announced by a ``Mixing: <profile>`` comment are summed up per mixing profile.
+"""
+import collections
+import math
+
+MIXING_PREFIX = 'Mixing: '
+
+# gantry and plunger
+XY_SPEED = 400.0          # mm/s
+Z_SPEED = 125.0           # mm/s
+MOVE_OVERHEAD = 0.3       # s, acceleration and settling per move
+TRAVEL_CLEARANCE = 10.0   # mm above the taller of the two labware when moving between them
+PLUNGER_OVERHEAD = 0.2    # s per aspirate/dispense
+PICK_UP_TIP = 2.5         # s, pressing and retracting once above the tip
+DROP_TIP = 1.5            # s, ejecting once above the trash or tip rack
+BLOW_OUT = 0.5            # s
+TOUCH_TIP = 1.5           # s
+HOME = 10.0               # s
+
+# modules
+LID_MOVE = 22.0           # s to open or close the Thermocycler lid
+LID_HEATING = 0.35        # °C/s
+LID_COOLING = 0.1         # °C/s
+BLOCK_HEATING = 4.4       # °C/s
+BLOCK_COOLING = 2.2       # °C/s
+BLOCK_SETTLE = 5.0        # s until the block is within tolerance of the target
+AMBIENT = 23.0            # °C
+MAGNET_MOVE = 3.0         # s to engage or disengage the magnets
+
+PIPETTE_COMMANDS = ('aspirate', 'dispense', 'blow_out', 'touch_tip', 'air_gap', 'move_to',
+                    'pick_up_tip', 'drop_tip', 'return_tip')
+
+
+def block_ramp(start, end, rate=None):
+    """Seconds the Thermocycler block needs to go from ``start`` to ``end`` °C."""
+    if start is None:
+        start = AMBIENT
+    if rate is None:
+        rate = BLOCK_HEATING if end > start else BLOCK_COOLING
+    if start == end:
+        return 0.0
+    return abs(end - start) / rate + BLOCK_SETTLE
+
+
+def lid_ramp(start, end):
+    """Seconds the heated lid needs to go from ``start`` to ``end`` °C."""
+    if start is None:
+        start = AMBIENT
+    rate = LID_HEATING if end > start else LID_COOLING
+    return abs(end - start) / rate
+
+
+class Estimate:
+    """Per-command durations of a recorded run and the summaries derived from them."""
+
+    def __init__(self, commands, durations):
+        self.commands = commands
+        self.durations = durations
+
+    @property
+    def total(self):
+        return sum(self.durations)
+
+    @property
+    def phases(self):
+        phases = collections.OrderedDict()
+        for command, duration in zip(self.commands, self.durations):
+            phases[command['phase']] = phases.get(command['phase'], 0.0) + duration
+        return phases
+
+    def count(self, *names):
+        return sum(1 for command in self.commands if command['command'] in names)
+
+    @property
+    def tip_pickups(self):
+        return self.count('pick_up_tip')
+
+    @property
+    def tips(self):
+        """Number of new tips, tips picked up again after ``return_tip`` are not counted twice."""
+        return sum(command['tips'] for command in self.commands if command['command'] == 'pick_up_tip')
+
+    @property
+    def pauses(self):
+        # manual labware moves stop the run until the operator confirms them
+        return self.count('pause', 'move_labware')
+
+    @property
+    def liquid_commands(self):
+        return sum(1 for command in self.commands if command['command'] not in ('comment', 'pause', 'move_labware'))
+
+    @property
+    def reagents(self):
+        """Net volume (µl) drawn from each reservoir column or plate, summed over all channels."""
+        balance = collections.defaultdict(float)
+        for command in self.commands:
+            # liquid left in the tip (e.g. a disposal volume) goes back where it is blown out
+            if command['command'] in ('aspirate', 'dispense', 'blow_out') and command['well'] is not None:
+                key = f'{command["labware"]} ({command["slot"]})'
+                if command['reservoir']:
+                    key += f' {command["well"]}'
+                sign = 1 if command['command'] == 'aspirate' else -1
+                balance[key] += sign * command['volume'] * command['channels']
+        return {key: round(volume, 1) for key, volume in sorted(balance.items()) if volume > 1e-6}
+
+    @property
+    def mixing(self):
+        """Number of mixes and seconds per mixing profile.
+
+        A mix consists of the aspirates and dispenses directly following its ``Mixing:`` comment.
+        """
+        profiles = collections.OrderedDict()
+        profile = None
+        for command, duration in zip(self.commands, self.durations):
+            if command['command'] == 'comment' and command['message'].startswith(MIXING_PREFIX):
+                profile = profiles.setdefault(command['message'][len(MIXING_PREFIX):].strip(), {'mixes': 0, 'seconds': 0.0})
+                profile['mixes'] += 1
+            elif command['command'] in ('aspirate', 'dispense') and profile is not None:
+                profile['seconds'] += duration
+            else:
+                profile = None
+        return profiles
+
+    def summary(self):
+        return {
+            'total_seconds': round(self.total, 1),
+            'phases': {phase: round(seconds, 1) for phase, seconds in self.phases.items()},
+            'tip_pickups': self.tip_pickups,
+            'tips': self.tips,
+            'commands': self.liquid_commands,
+            'pauses': self.pauses,
+            'reagents': self.reagents,
+            'mixing': {name: {'mixes': profile['mixes'], 'seconds': round(profile['seconds'], 1)}
+                       for name, profile in self.mixing.items()}}
+
+
+class Estimator:
+    """Keeps track of gantry position and module states while pricing commands one by one."""
+
+    def __init__(self):
+        self.position = None
+        self.top = 0.0
+        self.block = None
+        self.lid = None
+
+    def move(self, command):
+        target = (command['x'], command['y'], command['z'])
+        if self.position is None:
+            self.position, self.top = target, command['top']
+            return 1.0
+        x, y, z = self.position
+        if math.isclose(x, target[0]) and math.isclose(y, target[1]):
+            seconds = abs(z - target[2]) / Z_SPEED
+        else:
+            travel = max(self.top, command['top']) + TRAVEL_CLEARANCE
+            vertical = max(travel - z, 0) + max(travel - target[2], 0)
+            seconds = vertical / Z_SPEED + math.hypot(target[0] - x, target[1] - y) / XY_SPEED + MOVE_OVERHEAD
+        self.position, self.top = target, command['top']
+        return seconds
+
+    def price(self, command):
+        name = command['command']
+        seconds = 0.0
+        if name in PIPETTE_COMMANDS and 'x' in command:
+            seconds += self.move(command)
+        if name in ('aspirate', 'dispense', 'air_gap'):
+            seconds += command['volume'] / command['flow_rate'] + PLUNGER_OVERHEAD
+        elif name == 'pick_up_tip':
+            seconds += PICK_UP_TIP
+        elif name in ('drop_tip', 'return_tip'):
+            seconds += DROP_TIP
+        elif name == 'blow_out':
+            seconds += BLOW_OUT
+        elif name == 'touch_tip':
+            seconds += TOUCH_TIP
+        elif name == 'home':
+            seconds += HOME
+            self.position = None
+        elif name == 'delay':
+            seconds += command['seconds']
+        elif name in ('open_lid', 'close_lid'):
+            seconds += LID_MOVE
+        elif name in ('engage', 'disengage'):
+            seconds += MAGNET_MOVE
+        elif name == 'set_lid_temperature':
+            seconds += lid_ramp(self.lid, command['temperature'])
+            self.lid = command['temperature']
+        elif name == 'set_block_temperature':
+            seconds += block_ramp(self.block, command['temperature'], command.get('ramp_rate'))
+            seconds += command['hold']
+            self.block = command['temperature']
+        elif name == 'execute_profile':
+            for _ in range(command['repetitions']):
+                for step in command['steps']:
+                    seconds += block_ramp(self.block, step['temperature']) + step['hold']
+                    self.block = step['temperature']
+        return seconds
+
+
+def estimate(commands):
+    """Returns an ``Estimate`` for a list of recorded commands."""
+    estimator = Estimator()
+    return Estimate(commands, [estimator.price(command) for command in commands])
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    return f'{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
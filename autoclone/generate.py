@@ -0,0 +1,305 @@
+"""Generates flattened protocols from a template in scripts/ and a parameter file.
+
+Usage::
+
+    python -m autoclone.generate plate3.json -o plate3.py
+
+The parameter file is JSON with the ``template`` protocol and the ``parameters`` replacing its
+settings, i.e. the assignments of plain values (numbers, strings, lists, None) at the top of
+``run``, e.g.::
+
+    {"template": "scripts/heat-shock_transformation_mixing.py",
+     "parameters": {"manifest": "well\\nA1:H6\\n"}}
+
+The template runs once against the stand-in API with these settings, and the generated protocol
+spells out the recorded run: labware, modules and pipettes are loaded as before, the wells of
+every labware are looked up once, and every command follows with its explicit tip, well and
+location instead of ``transfer`` calls and well lookups in loops. Locations are written the way the
+template built them (top, bottom or centre of the well, moves), which the stand-in records, so
+that they stay right for the real labware definitions and not just for the stand-in geometry. The generated file is written
+only if its own simulation records exactly the commands of the template.
+
+Protocols that look at the clock or behave differently on the robot than in a simulation (e.g.
+non-blocking holds, checkpoints, latency logs) cannot be fixed in advance and are refused.
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+
+from .benchmark import protocol_name
+from .robot import SimulationError, WellBottomClearance, load_script, simulate
+
+FLOW_RATES = ('aspirate', 'dispense', 'blow_out')
+CLEARANCES = ('aspirate', 'dispense')
+TOLERANCE = 0.01            # mm, µl and µl/s a generated command may differ from the template
+
+
+def read_parameters(path):
+    """Template path and parameters of a parameter file."""
+    with open(path, encoding='utf-8') as f:
+        content = json.load(f)
+    if 'template' not in content:
+        raise ValueError(f'{path} names no template')
+    return content['template'], content.get('parameters', {})
+
+
+def settings(source):
+    """Value nodes of the plain-value assignments at the top of ``run``, keyed by name."""
+    tree = ast.parse(source)
+    runs = [node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == 'run']
+    if not runs:
+        raise ValueError('the template has no run function')
+    values = {}
+    for node in runs[0].body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                ast.literal_eval(node.value)
+            except ValueError:
+                continue
+            values.setdefault(node.targets[0].id, node.value)
+    return values
+
+
+def with_parameters(source, parameters):
+    """Template source with the values of its settings replaced by ``parameters``."""
+    values = settings(source)
+    unknown = sorted(set(parameters) - set(values))
+    if unknown:
+        raise ValueError(f'unknown parameters {", ".join(unknown)}, the template has {", ".join(values)}')
+    # ast offsets count bytes, replacing from the end keeps the earlier offsets valid
+    data = source.encode('utf-8')
+    starts = [0]
+    for line in data.splitlines(keepends=True):
+        starts.append(starts[-1] + len(line))
+    for name in sorted(parameters, key=lambda name: (values[name].lineno, values[name].col_offset), reverse=True):
+        node = values[name]
+        begin = starts[node.lineno - 1] + node.col_offset
+        end = starts[node.end_lineno - 1] + node.end_col_offset
+        data = data[:begin] + repr(parameters[name]).encode('utf-8') + data[end:]
+    return data.decode('utf-8')
+
+
+def fixed_in_advance(path, source):
+    """Raises ValueError if the commands of a protocol depend on the clock or on the robot."""
+    module = load_script(path, source)
+    if getattr(module, 'time', None) is sys.modules['time']:
+        raise ValueError('the protocol measures time, its commands cannot be fixed in advance')
+    if 'is_simulating' in source:
+        raise ValueError('the protocol behaves differently on the robot than in a simulation')
+
+
+def number(value):
+    value = round(value, 4)
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Flattener:
+    """Turns the recorded run of a protocol into the source of a protocol repeating it command by command."""
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.modules = {}
+        for slot, module in protocol.loaded_modules.items():
+            if module.module_type in self.modules:
+                raise ValueError(f'more than one {module.name}, the recorded commands do not tell them apart')
+            self.modules[module.module_type] = (f'module_{module.module_type}', module)
+        self.labware = {slot: f'labware_{slot}' for slot in protocol.loaded_labwares}
+        self.pipettes = {mount: f'pipette_{mount}' for mount in protocol.loaded_instruments}
+        self.used_wells = set()
+
+    def loads(self):
+        lines = []
+        for variable, module in self.modules.values():
+            if module.module_type == 'thermocycler':
+                lines.append(f'{variable} = protocol.load_module({module.name!r})')
+            else:
+                lines.append(f'{variable} = protocol.load_module({module.name!r}, {module.slot!r})')
+        for slot in sorted(self.protocol.loaded_labwares, key=int):
+            labware = self.protocol.loaded_labwares[slot]
+            label = f', label={labware.label!r}' if labware.label else ''
+            if labware.parent is not None:
+                lines.append(f'{self.labware[slot]} = {self.modules[labware.parent.module_type][0]}.load_labware({labware.load_name!r}{label})')
+            else:
+                lines.append(f'{self.labware[slot]} = protocol.load_labware({labware.load_name!r}, {slot!r}{label})')
+        for mount, pipette in sorted(self.protocol.loaded_instruments.items()):
+            racks = ', '.join(self.labware[rack.slot] for rack in pipette.tip_racks)
+            lines.append(f'{self.pipettes[mount]} = protocol.load_instrument({pipette.name!r}, {mount!r}, tip_racks=[{racks}])')
+        return lines
+
+    def well(self, command):
+        labware = self.protocol.loaded_labwares[command['slot']]
+        if labware.name != command['labware']:
+            raise ValueError(f'{command["labware"]} does not stay in slot {command["slot"]}')
+        self.used_wells.add(command['slot'])
+        well = labware[command['well']]
+        return well, f'wells_{command["slot"]}[{labware.wells().index(well)}]'
+
+    def location(self, command):
+        # the location exactly as the template built it, the stand-in geometry only approximates the labware on the robot
+        _, location = self.well(command)
+        if command.get('reference') is None:
+            raise ValueError(f'command {command["index"]} ({command["command"]}) uses a location not derived from a well')
+        kind, z = command['reference']
+        if kind == 'center':
+            location += '.center()'
+        elif kind != 'well':
+            location += f'.{kind}({number(z)})'
+        if 'offset' in command:
+            offset = ', '.join(f'{axis}={number(value)}' for axis, value in zip('xyz', command['offset']) if value)
+            location += f'.move(types.Point({offset}))'
+        return location
+
+    def pipette_command(self, command, flow_rates, clearances):
+        pipette = self.pipettes[command['mount']]
+        name = command['command']
+        lines = []
+        kind = 'aspirate' if name == 'air_gap' else name
+        if kind in FLOW_RATES and abs(command['flow_rate'] - flow_rates[command['mount']][kind]) > 1e-9:
+            flow_rates[command['mount']][kind] = command['flow_rate']
+            lines.append(f'{pipette}.flow_rate.{kind} = {number(command["flow_rate"])}')
+        # a well passed as is is entered at the well bottom clearance of the pipette
+        reference = command.get('reference')
+        if name in CLEARANCES and reference and reference[0] == 'well' and abs(reference[1] - clearances[command['mount']][name]) > 1e-9:
+            clearances[command['mount']][name] = reference[1]
+            lines.append(f'{pipette}.well_bottom_clearance.{name} = {number(reference[1])}')
+        if name == 'pick_up_tip':
+            lines.append(f'{pipette}.pick_up_tip({self.well(command)[1]})')
+        elif name in ('drop_tip', 'return_tip'):
+            lines.append(f'{pipette}.{name}()')
+        elif name in ('aspirate', 'dispense'):
+            lines.append(f'{pipette}.{name}({number(command["volume"])}, {self.location(command)})')
+        elif name in ('blow_out', 'move_to'):
+            lines.append(f'{pipette}.{name}({self.location(command)})')
+        elif name == 'air_gap':
+            lines.append(f'{pipette}.air_gap({number(command["volume"])}, {number(command["reference"][1])})')
+        else:
+            raise ValueError(f'{name} cannot be flattened')
+        return lines
+
+    def module_command(self, command):
+        module = self.modules[command['module']][0]
+        name = command['command']
+        if name == 'set_block_temperature':
+            arguments = [number(command['temperature'])]
+            if command['hold']:
+                arguments.append(f'hold_time_seconds={number(command["hold"])}')
+            for key in ('ramp_rate', 'block_max_volume'):
+                if command[key] is not None:
+                    arguments.append(f'{key}={number(command[key])}')
+            return f'{module}.set_block_temperature({", ".join(arguments)})'
+        if name == 'execute_profile':
+            steps = ', '.join(f'{{"temperature": {number(step["temperature"])}, "hold_time_seconds": {number(step["hold"])}}}'
+                              for step in command['steps'])
+            volume = f', block_max_volume={number(command["block_max_volume"])}' if command['block_max_volume'] is not None else ''
+            return f'{module}.execute_profile(steps=[{steps}], repetitions={command["repetitions"]}{volume})'
+        if name in ('set_lid_temperature', 'set_temperature'):
+            return f'{module}.{name}({number(command["temperature"])})'
+        if name in ('open_lid', 'close_lid', 'deactivate_lid', 'deactivate_block', 'deactivate'):
+            return f'{module}.{name}()'
+        raise ValueError(f'{name} of the {command["module"]} cannot be flattened')
+
+    def commands(self):
+        flow_rates = {mount: {kind: pipette.definition[kind] for kind in FLOW_RATES}
+                      for mount, pipette in self.protocol.loaded_instruments.items()}
+        clearances = {mount: {kind: getattr(WellBottomClearance(), kind) for kind in CLEARANCES}
+                      for mount in self.protocol.loaded_instruments}
+        lines = []
+        for command in self.protocol.commands:
+            name = command['command']
+            if 'mount' in command:
+                lines += self.pipette_command(command, flow_rates, clearances)
+            elif 'module' in command:
+                lines.append(self.module_command(command))
+            elif name in ('comment', 'pause'):
+                lines.append(f'protocol.{name}({command["message"]!r})')
+            elif name == 'delay':
+                lines.append(f'protocol.delay(seconds={number(command["seconds"])}, msg={command["message"]!r})')
+            elif name == 'home':
+                lines.append('protocol.home()')
+            else:
+                raise ValueError(f'{name} cannot be flattened')
+        return lines
+
+    def render(self, metadata, header):
+        body = self.loads()
+        commands = self.commands()
+        body += [f'wells_{slot} = {self.labware[slot]}.wells()' for slot in sorted(self.used_wells, key=int)]
+        uses_types = any('types.Point' in line for line in commands)
+        lines = header + [
+            'from opentrons import protocol_api' + (', types' if uses_types else ''),
+            '',
+            'metadata = {',
+            ',\n'.join(f'    {key!r}: {value!r}' for key, value in metadata.items()) + '}',
+            '',
+            '',
+            'def run(protocol: protocol_api.ProtocolContext):']
+        lines += ['    ' + line for line in body] + [''] + ['    ' + line for line in commands]
+        return '\n'.join(lines) + '\n'
+
+
+def differences(template, generated):
+    """Descriptions of the commands in which two recorded runs differ."""
+    found = []
+    for a, b in zip(template, generated):
+        for key in sorted(set(a) | set(b)):
+            if key == 'index':
+                continue
+            x, y = a.get(key), b.get(key)
+            same = abs(x - y) <= TOLERANCE if isinstance(x, (int, float)) and isinstance(y, (int, float)) else x == y
+            if not same:
+                found.append(f'command {a["index"]} ({a["command"]}): {key} {x!r} in the template, {y!r} generated')
+                break
+    if len(template) != len(generated):
+        found.append(f'{len(template)} commands in the template, {len(generated)} generated')
+    return found
+
+
+def timed_simulation(path, source):
+    start = time.perf_counter()
+    protocol = simulate(path, source=source)
+    return protocol, time.perf_counter() - start
+
+
+def generate(template, parameters, output):
+    """Source of the flattened protocol, checked against the template; returns it with the simulation times."""
+    with open(template, encoding='utf-8') as f:
+        source = with_parameters(f.read(), parameters)
+    fixed_in_advance(template, source)
+    recorded, template_seconds = timed_simulation(template, source)
+    metadata = dict(load_script(template, source).metadata)
+    metadata['protocolName'] = f'{metadata.get("protocolName", protocol_name(template))} (generated)'
+    header = [
+        f'# Generated by `python -m autoclone.generate` from {os.path.basename(template)}, do not edit by hand.',
+        f'# Parameters: {json.dumps(parameters, ensure_ascii=False)}']
+    text = Flattener(recorded).render(metadata, header)
+    generated, generated_seconds = timed_simulation(output, text)
+    found = differences(recorded.commands, generated.commands)
+    if found:
+        raise ValueError('the generated protocol differs from the template:\n    ' + '\n    '.join(found[:10]))
+    return text, len(recorded.commands), template_seconds, generated_seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a flattened protocol from a template and a parameter file.')
+    parser.add_argument('parameters', help='JSON file with "template" and "parameters"')
+    parser.add_argument('-o', '--output', help='protocol file, defaults to <parameter file>.py')
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.parameters)[0] + '.py'
+    try:
+        template, parameters = read_parameters(args.parameters)
+        text, commands, template_seconds, generated_seconds = generate(template, parameters, output)
+    except (ValueError, SimulationError) as error:
+        parser.error(str(error))
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(text)
+    print(f'{output}: {commands} commands, same as {protocol_name(template)}; simulated in '
+          f'{1000 * generated_seconds:.1f} ms instead of {1000 * template_seconds:.1f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
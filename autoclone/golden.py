@@ -0,0 +1,153 @@
+"""Golden command traces of the protocols in scripts/.
+
+Usage::
+
+    python -m autoclone.golden              # compare every protocol against its golden trace
+    python -m autoclone.golden --update     # accept the current traces as golden
+    python -m autoclone.golden scripts/plasmid_purification.py
+
+A trace is a simulated run (see ``autoclone.robot``) reduced to what the liquid handling depends on:
+one JSON line per command with its phase, pipette, tips, labware, well, position, volume and flow
+rate, or with the module and its new state, after a header line with the estimated runtime and the
+tips used. Golden traces live in ``benchmarks/golden/<protocol>.jsonl``. A protocol fails the check
+if any command differs from the golden trace (volume, location, order, tips, module state) or if its
+estimated runtime differs by more than the tolerance in either direction. After an intended change,
+``--update`` rewrites the golden traces, which are then committed together with the change.
+``tests/test_golden.py`` runs the check for every protocol.
+"""
+import argparse
+import difflib
+import json
+import os
+import sys
+
+from .benchmark import ROOT, protocol_name, protocol_paths
+from .estimate import estimate, format_duration
+from .robot import simulate
+
+GOLDEN_DIR = os.path.join(ROOT, 'benchmarks', 'golden')
+TOLERANCE = 0.01            # allowed relative runtime change
+MAX_DIFFERENCES = 10        # command differences listed per protocol
+
+# derived from other fields (z from labware and height) or only bookkeeping
+IGNORED_FIELDS = ('index', 'z', 'top', 'reservoir')
+
+
+def _round(value):
+    if isinstance(value, float):
+        value = round(value, 2)
+        return int(value) if value.is_integer() else value
+    if isinstance(value, (list, tuple)):
+        return [_round(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _round(item) for key, item in value.items()}
+    return value
+
+
+def normalize(commands):
+    """Commands of a recorded run as trace entries, without derived fields and with floats rounded."""
+    return [{key: _round(value) for key, value in command.items() if key not in IGNORED_FIELDS} for command in commands]
+
+
+def record(path, source=None):
+    """Trace of a protocol as (header, entries); ``source`` is passed on to ``simulate``."""
+    commands = simulate(path, source=source).commands
+    summary = estimate(commands).summary()
+    header = {'protocol': protocol_name(path), 'total_seconds': summary['total_seconds'],
+              'tips': summary['tips'], 'tip_pickups': summary['tip_pickups'], 'commands': len(commands)}
+    return header, normalize(commands)
+
+
+def golden_path(path, directory=GOLDEN_DIR):
+    return os.path.join(directory, protocol_name(path) + '.jsonl')
+
+
+def load_trace(path):
+    with open(path, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    return lines[0], lines[1:]
+
+
+def save_trace(path, header, entries):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in [header] + entries:
+            f.write(json.dumps(line, ensure_ascii=False) + '\n')
+
+
+def _describe(entry):
+    parts = [entry['phase'], entry['command']]
+    if entry.get('labware'):
+        parts.append(f'{entry["labware"]} ({entry["slot"]}) {entry["well"] or ""}'.strip())
+    elif entry.get('module'):
+        parts.append(entry['module'])
+    return ' '.join(parts)
+
+
+def compare_traces(golden, trace, tolerance=TOLERANCE):
+    """Differences of ``trace`` from ``golden``, both (header, entries), as readable lines."""
+    (reference, expected), (header, entries) = golden, trace
+    differences = []
+    if header['tips'] != reference['tips']:
+        differences.append(f'tips {reference["tips"]} -> {header["tips"]}')
+    if abs(header['total_seconds'] - reference['total_seconds']) > reference['total_seconds'] * tolerance:
+        differences.append(f'runtime {format_duration(reference["total_seconds"])} -> {format_duration(header["total_seconds"])}')
+    if entries == expected:
+        return differences
+    # commands repeat a lot, so the matcher must not treat frequent lines as junk
+    lines = [json.dumps(entry, sort_keys=True) for entry in entries]
+    matcher = difflib.SequenceMatcher(None, [json.dumps(entry, sort_keys=True) for entry in expected], lines, autojunk=False)
+    changes = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        if tag == 'replace' and i2 - i1 == j2 - j1:
+            for old, new, index in zip(expected[i1:i2], entries[j1:j2], range(j1, j2)):
+                fields = [f'{key} {old.get(key)} -> {new.get(key)}' for key in dict.fromkeys(list(old) + list(new))
+                          if old.get(key) != new.get(key)]
+                changes.append(f'command {index + 1} ({_describe(new)}): {", ".join(fields)}')
+        else:
+            for old in expected[i1:i2]:
+                changes.append(f'command {j1 + 1} removed: {_describe(old)}')
+            for new, index in zip(entries[j1:j2], range(j1, j2)):
+                changes.append(f'command {index + 1} added: {_describe(new)}')
+    differences += changes[:MAX_DIFFERENCES]
+    if len(changes) > MAX_DIFFERENCES:
+        differences.append(f'... and {len(changes) - MAX_DIFFERENCES} more command differences')
+    return differences
+
+
+def check(path, directory=GOLDEN_DIR, tolerance=TOLERANCE, source=None):
+    """Differences of the current trace of a protocol from its golden trace."""
+    golden = golden_path(path, directory)
+    if not os.path.exists(golden):
+        return [f'no golden trace in {golden}, run python -m autoclone.golden --update']
+    return compare_traces(load_trace(golden), record(path, source), tolerance)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the simulated command traces of the protocols against golden traces.')
+    parser.add_argument('protocols', nargs='*', help='protocol files, defaults to all files in scripts/')
+    parser.add_argument('--golden', default=GOLDEN_DIR, help='directory of the golden traces')
+    parser.add_argument('--update', action='store_true', help='write the current traces as golden traces')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='allowed relative runtime change')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for path in args.protocols or protocol_paths():
+        name = protocol_name(path)
+        if args.update:
+            header, entries = record(path)
+            save_trace(golden_path(path, args.golden), header, entries)
+            print(f'{name}: {len(entries)} commands, {format_duration(header["total_seconds"])}, {header["tips"]} tips written')
+            continue
+        differences = check(path, args.golden, args.tolerance)
+        print(f'{name}: {"ok" if not differences else f"{len(differences)} differences"}')
+        for difference in differences:
+            print(f'    {difference}', file=sys.stderr)
+        failed += bool(differences)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""Deck-layout optimizer.
+
+Usage::
+
+    python -m autoclone.layout                      # all protocols in scripts/
+    python -m autoclone.layout scripts/restriction_digestion.py
+
+The recorded run of a protocol gives the sequence of gantry moves between labware (the transfer
+graph, including tip pickups and drops into the trash). Moving a labware to another slot only
+changes the horizontal part of the moves from and to it, so the travel of every pair of labware is
+tabulated for every pair of slots and a local search (swaps and moves into free slots, several
+restarts) looks for the assignment with the least travel. Modules, labware on modules and the fixed
+trash keep their slots, and so do pinned slots: neither is their labware moved nor is other labware
+moved onto them. Pinned are the slots of labware loaded below a comment saying ``do not occupy these
+positions``, the slots holding the same labware as in the stage before or after in the cloning
+pipeline (the protocols share the deck), the slots a protocol loads other labware into when one of
+its True/False settings is switched (e.g. the dual-plate mode) and the slots given with ``--pin``.
+The proposal is checked by re-pricing the whole run with the labware moved.
+"""
+import argparse
+import ast
+import collections
+import itertools
+import math
+import os
+import random
+import re
+import sys
+
+from . import deck
+from .benchmark import SCRIPTS_DIR, protocol_name, protocol_paths
+from .estimate import estimate, format_duration
+from .generate import settings, with_parameters
+from .pipeline import STAGES
+from .robot import simulate
+
+DECK_SLOTS = tuple(str(slot) for slot in range(1, 12))
+RESTARTS = 20
+PINNED_MARKER = 'do not occupy these positions'
+LOAD_SLOT = re.compile(r"load_labware\s*\([^)]*,\s*'(\d+)'")
+
+
+def pinned_slots(source):
+    """Slots of the labware loaded in the block of lines after a comment with ``PINNED_MARKER``."""
+    slots = set()
+    pinned = False
+    for line in source.splitlines():
+        if PINNED_MARKER in line:
+            pinned = True
+            continue
+        if not line.strip():
+            pinned = False
+        elif pinned:
+            slots.update(LOAD_SLOT.findall(line))
+    return slots
+
+
+def deck_labware(protocol):
+    """Load name of the labware in every deck slot, labware on modules excluded."""
+    return {slot: labware.name for slot, labware in protocol.loaded_labwares.items() if labware.parent is None}
+
+
+def shared_slots(path):
+    """Slots holding the same labware as in the stage before or after ``path`` in the cloning pipeline."""
+    scripts = [stage['script'] for stage in STAGES]
+    name = os.path.basename(path)
+    if name not in scripts:
+        return set()
+    index = scripts.index(name)
+    own = deck_labware(simulate(path))
+    slots = set()
+    for neighbour in scripts[max(index - 1, 0):index] + scripts[index + 1:index + 2]:
+        other = deck_labware(simulate(os.path.join(SCRIPTS_DIR, neighbour)))
+        slots.update(slot for slot, labware in own.items() if other.get(slot) == labware)
+    return slots
+
+
+def mode_slots(path, source):
+    """Slots that get other labware when one of the True/False settings of the protocol is switched."""
+    own = deck_labware(simulate(path, source=source))
+    slots = set()
+    for name, node in settings(source).items():
+        value = ast.literal_eval(node)
+        if not isinstance(value, bool):
+            continue
+        variant = deck_labware(simulate(path, source=with_parameters(source, {name: not value})))
+        slots.update(slot for slot, labware in variant.items() if own.get(slot) != labware)
+    return slots
+
+
+class Layout:
+    """Travel tables of one recorded run and the slots the movable labware may use."""
+
+    def __init__(self, protocol, pinned=()):
+        if any(command['command'] == 'move_labware' for command in protocol.commands):
+            raise ValueError('labware is moved during the run, the layout is not fixed')
+        self.commands = protocol.commands
+        self.pinned = sorted(set(pinned), key=int)
+        self.current = {slot: slot for slot, labware in protocol.loaded_labwares.items()
+                        if labware.parent is None and slot not in self.pinned}
+        self.names = {slot: labware.name for slot, labware in protocol.loaded_labwares.items()}
+        module_slots = {slot for slot, item in protocol.deck.items() if deck.MODULE_NAMES.get(item.lower())}
+        self.slots = [slot for slot in DECK_SLOTS if slot not in module_slots and slot not in self.pinned]
+        # (labware a, labware b) -> {(slot a, slot b): mm travelled in the horizontal}
+        self.tables = {}
+        pairs = collections.defaultdict(list)
+        previous = None
+        for command in self.commands:
+            if command['command'] == 'home':
+                previous = None
+            if 'x' not in command or command['slot'] is None:
+                continue
+            if previous is not None and previous['slot'] != command['slot']:
+                pairs[(previous['slot'], command['slot'])].append(
+                    (command['x'] - previous['x'], command['y'] - previous['y']))
+            previous = command
+        for (a, b), vectors in pairs.items():
+            self.tables[(a, b)] = {
+                (slot_a, slot_b): self._travel(vectors, a, slot_a, b, slot_b)
+                for slot_a in self._candidates(a) for slot_b in self._candidates(b) if slot_a != slot_b}
+
+    def _candidates(self, slot):
+        return self.slots if slot in self.current else [slot]
+
+    @staticmethod
+    def _travel(vectors, a, slot_a, b, slot_b):
+        # moving labware shifts the vector between two positions by the change of both slot origins
+        dx = (deck.SLOT_ORIGINS[slot_b][0] - deck.SLOT_ORIGINS[b][0]) - (deck.SLOT_ORIGINS[slot_a][0] - deck.SLOT_ORIGINS[a][0])
+        dy = (deck.SLOT_ORIGINS[slot_b][1] - deck.SLOT_ORIGINS[b][1]) - (deck.SLOT_ORIGINS[slot_a][1] - deck.SLOT_ORIGINS[a][1])
+        return sum(math.hypot(x + dx, y + dy) for x, y in vectors)
+
+    def travel(self, assignment):
+        """Horizontal travel (mm) between different labware for a labware -> slot assignment."""
+        total = 0.0
+        for (a, b), table in self.tables.items():
+            total += table[(assignment.get(a, a), assignment.get(b, b))]
+        return total
+
+    def _improve(self, assignment):
+        best = self.travel(assignment)
+        improved = True
+        while improved:
+            improved = False
+            for a, b in itertools.combinations(sorted(assignment), 2):
+                candidate = dict(assignment)
+                candidate[a], candidate[b] = assignment[b], assignment[a]
+                cost = self.travel(candidate)
+                if cost < best - 1e-6:
+                    assignment, best, improved = candidate, cost, True
+            for labware in sorted(assignment):
+                for slot in self.slots:
+                    if slot in assignment.values():
+                        continue
+                    candidate = dict(assignment)
+                    candidate[labware] = slot
+                    cost = self.travel(candidate)
+                    if cost < best - 1e-6:
+                        assignment, best, improved = candidate, cost, True
+        return assignment, best
+
+    def optimize(self, restarts=RESTARTS, seed=0):
+        """Best assignment found from the current layout and ``restarts`` random ones."""
+        best, cost = self._improve(dict(self.current))
+        rng = random.Random(seed)
+        labware = sorted(self.current)
+        for _ in range(restarts):
+            start = dict(zip(labware, rng.sample(self.slots, len(labware))))
+            candidate, candidate_cost = self._improve(start)
+            if candidate_cost < cost - 1e-6:
+                best, cost = candidate, candidate_cost
+        return best
+
+    def relocated(self, assignment):
+        """The recorded commands with every labware moved to its assigned slot."""
+        commands = []
+        for command in self.commands:
+            slot = command.get('slot')
+            target = assignment.get(slot, slot)
+            if 'x' in command and target != slot:
+                command = dict(command)
+                command['x'] += deck.SLOT_ORIGINS[target][0] - deck.SLOT_ORIGINS[slot][0]
+                command['y'] += deck.SLOT_ORIGINS[target][1] - deck.SLOT_ORIGINS[slot][1]
+                command['slot'] = target
+            commands.append(command)
+        return commands
+
+
+def propose(path, restarts=RESTARTS, pinned=()):
+    """Optimizes the deck layout of one protocol and returns a summary of the proposal.
+
+    ``pinned`` slots keep their labware and stay free of other labware, in addition to those marked in the script,
+    those shared with the neighbouring pipeline stages and those used in other modes of the protocol.
+    """
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    pinned = pinned_slots(source) | shared_slots(path) | mode_slots(path, source) | set(pinned)
+    layout = Layout(simulate(path), pinned)
+    assignment = layout.optimize(restarts)
+    before = estimate(layout.commands).total
+    after = estimate(layout.relocated(assignment)).total
+    return {
+        'moves': [(layout.names[slot], slot, target) for slot, target in sorted(assignment.items(), key=lambda item: int(item[0]))],
+        'pinned': [(layout.names[slot], slot) for slot in layout.pinned if slot in layout.names],
+        'travel_before': layout.travel(layout.current),
+        'travel_after': layout.travel(assignment),
+        'total_before': before,
+        'total_after': after}
+
+
+def format_proposal(name, proposal):
+    saved = proposal['total_before'] - proposal['total_after']
+    lines = [f'{name}: travel between labware {proposal["travel_before"] / 1000:.1f} m -> '
+             f'{proposal["travel_after"] / 1000:.1f} m, estimated time saved {format_duration(saved)} '
+             f'({format_duration(proposal["total_before"])} -> {format_duration(proposal["total_after"])})']
+    for labware, slot, target in proposal['moves']:
+        change = f'slot {slot} -> {target}' if slot != target else f'slot {slot} (keep)'
+        lines.append(f'    {labware:<40} {change}')
+    for labware, slot in proposal.get('pinned', []):
+        lines.append(f'    {labware:<40} slot {slot} (pinned)')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Propose deck layouts with less gantry travel.')
+    parser.add_argument('protocols', nargs='*', help='protocol files, defaults to all files in scripts/')
+    parser.add_argument('--restarts', type=int, default=RESTARTS, help='random restarts of the local search')
+    parser.add_argument('--pin', nargs='+', default=[], choices=DECK_SLOTS, metavar='SLOT',
+                        help='slots whose labware stays and that stay free of other labware')
+    args = parser.parse_args(argv)
+
+    for path in args.protocols or protocol_paths():
+        try:
+            proposal = propose(path, args.restarts, args.pin)
+        except ValueError as error:
+            print(f'{protocol_name(path)}: skipped, {error}')
+            continue
+        print(format_proposal(protocol_name(path), proposal))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Builds ``scripts/cloning_pipeline.py``, one protocol for the cloning workflow from Golden Gate mixing to plating.
+
+Usage::
+
+    python -m autoclone.pipeline            # (re)write the pipeline protocol
+    python -m autoclone.pipeline --check    # exit with status 1 if it is out of date
+
+The stage protocols are embedded unchanged and run one after the other on a shared deck (see
+``autoclone/pipeline_runtime.py``): labware staying on the deck is reused together with its tip
+tracking, the Thermocycler continues at the state the previous stage left, and the operator is only
+asked for what actually has to happen between two stages, all in one pause per stage. That pause replaces
+the plate-loading pause at the start of a stage, the hand-overs later in a stage still pause the robot.
+"""
+import argparse
+import math
+import os
+import sys
+
+from . import deck
+from .benchmark import ROOT, SCRIPTS_DIR
+from .robot import simulate
+
+RUNTIME = os.path.join(ROOT, 'autoclone', 'pipeline_runtime.py')
+OUTPUT = os.path.join(SCRIPTS_DIR, 'cloning_pipeline.py')
+
+# 'moves' are done before the stage loads its labware (None takes the labware off the deck), 'labware' replaces
+# load names of the stage and 'message' is shown to the operator in the pause before the stage.
+STAGES = [
+    {'script': 'golden_gate_assembly_mixing.py', 'label': 'Golden Gate mixing'},
+    {'script': 'golden_gate_assembly.py', 'label': 'Golden Gate assembly'},
+    {'script': 'heat-shock_transformation_mixing.py', 'label': 'transformation mixing',
+     # the assembled plate becomes the DNA plate of the transformation
+     'moves': [('4', None), ('thermocycler', '4')],
+     'labware': {'thermofisher_96_pcrplate_200ul': 'biorad_96_wellplate_200ul_pcr'},
+     'message': 'Place a PCR plate containing 20 µl competent cells per well into the Thermocycler Module. '
+                'Make sure that the cells are thawed.'},
+    {'script': 'heat-shock_transformation.py', 'label': 'heat-shock transformation'},
+    {'script': 'distributing_cells_on_agar_plates.py', 'label': 'additional plating',
+     'message': 'Replace the agar plates with fresh ones.'}]
+
+METADATA = {
+    'protocolName': 'cloning_pipeline',
+    'author': 'Carolin Müller, Vera Waffenschmidt',
+    'description': 'Golden Gate assembly, heat-shock transformation and plating in one run using the Opentrons OT-2 '
+                   'with Thermocycler Module.',
+    # manual labware moves between the stages need API level 2.15
+    'apiLevel': '2.15'}
+
+
+def tip_demand(path):
+    """Tip pickups with new tips per mount when the protocol in ``path`` runs on its own."""
+    demand = {}
+    for command in simulate(path).commands:
+        if command['command'] == 'pick_up_tip':
+            channels = deck.pipette_definition(command['pipette'])['channels']
+            demand[command['mount']] = demand.get(command['mount'], 0) + command['tips'] / channels
+    return {mount: math.ceil(pickups) for mount, pickups in sorted(demand.items())}
+
+
+def render(stages=STAGES):
+    with open(RUNTIME, encoding='utf-8') as f:
+        runtime = f.read()
+    # drop the header comment, the generated file gets its own
+    runtime = runtime[runtime.index('import time'):]
+    runtime = runtime.replace(
+        'from opentrons import protocol_api\n',
+        'from opentrons import protocol_api\n\nmetadata = {\n' + ',\n'.join(
+            f'    {key!r}: {value!r}' for key, value in METADATA.items()) + '}\n', 1)
+
+    lines = [
+        '# Generated by `python -m autoclone.pipeline` from the protocols in scripts/, do not edit by hand.',
+        '# Runs ' + ', '.join(stage['script'] for stage in stages) + ' one after the other on a shared deck.',
+        runtime.rstrip('\n'),
+        '',
+        '',
+        'STAGES = [']
+    for stage in stages:
+        path = os.path.join(SCRIPTS_DIR, stage['script'])
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+        if "'''" in source or '\\' in source:
+            raise ValueError(f'{stage["script"]} cannot be embedded as a plain string')
+        config = {key: value for key, value in stage.items() if key != 'script'}
+        config['name'] = os.path.splitext(stage['script'])[0]
+        config['tips'] = tip_demand(path)
+        lines.append('    {')
+        for key, value in config.items():
+            lines.append(f'        {key!r}: {value!r},')
+        lines.append("        'source': '''" + source.rstrip('\n') + "\n'''},")
+    lines[-1] = lines[-1][:-1]
+    lines += [
+        ']',
+        '',
+        '',
+        'def run(protocol: protocol_api.ProtocolContext):',
+        '    run_stages(protocol, STAGES)',
+        '']
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate the combined cloning protocol.')
+    parser.add_argument('--output', default=OUTPUT, help='protocol file to write')
+    parser.add_argument('--check', action='store_true', help='only check that the protocol file is up to date')
+    args = parser.parse_args(argv)
+
+    text = render()
+    if args.check:
+        current = open(args.output, encoding='utf-8').read() if os.path.exists(args.output) else None
+        if current != text:
+            print(f'{args.output} is out of date, run python -m autoclone.pipeline', file=sys.stderr)
+            return 1
+        return 0
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(text)
+    print(f'Pipeline written to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+# Runtime of the combined cloning protocol, copied verbatim into scripts/cloning_pipeline.py by autoclone.pipeline.
+# It runs on the robot, so it must not import anything from autoclone.
+import time
+
+from opentrons import protocol_api
+
+PHASE_PREFIX = 'Phase: '
+THERMOCYCLER = 'thermocycler'
+# pipette commands after which a pause of a stage is a hand-over in the middle of the stage
+LIQUID_HANDLING = ('pick_up_tip', 'aspirate', 'dispense', 'transfer', 'distribute', 'consolidate', 'mix')
+
+
+def available_pickups(rack, channels):
+    # number of tip pickups left in a rack, multichannel pipettes need a full column
+    if channels == 1:
+        return sum(1 for well in rack.wells() if well.has_tip)
+    return sum(1 for column in rack.columns() if all(well.has_tip for well in column))
+
+
+class Pipeline:
+    # Deck, pipettes and Thermocycler Module shared by all stages of the combined protocol.
+    # Labware is kept per location (deck slot or 'thermocycler'): a stage asking for the same labware on the same
+    # location gets the already loaded one (including its tip tracking), different labware replaces it by a manual move.
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.labware = {}
+        self.instruments = {}
+        self.modules = {}
+        self.thermocycler = None
+        self.stages = 0
+
+    def open_lid(self):
+        if self.thermocycler is not None and self.thermocycler.lid_position != 'open':
+            self.thermocycler.open_lid()
+
+    def move(self, source, target=None):
+        # moves labware to another deck slot or off the deck (target None), the OT-2 pauses for the operator
+        labware = self.labware.pop(source)
+        if source == THERMOCYCLER:
+            self.open_lid()
+        if target is None:
+            self.protocol.move_labware(labware, protocol_api.OFF_DECK, use_gripper=False)
+            for instrument in self.instruments.values():
+                if labware in instrument.tip_racks:
+                    instrument.tip_racks = [rack for rack in instrument.tip_racks if rack is not labware]
+        else:
+            self.protocol.move_labware(labware, target, use_gripper=False)
+            self.labware[target] = labware
+
+    def place(self, load_name, location, load):
+        # returns the labware on location and whether it was newly loaded
+        current = self.labware.get(location)
+        if current is not None:
+            if current.load_name == load_name:
+                return current, False
+            self.move(location)
+        labware = load(load_name)
+        self.labware[location] = labware
+        return labware, True
+
+    def refill(self, demand):
+        # replaces the emptiest tip racks of each pipette until the stage's tip pickups are covered
+        refilled = []
+        for mount, pickups in sorted(demand.items()):
+            instrument = self.instruments.get(mount)
+            if instrument is None:
+                continue
+            channels = instrument.channels
+            racks = sorted(instrument.tip_racks, key=lambda rack: available_pickups(rack, channels))
+            missing = pickups - sum(available_pickups(rack, channels) for rack in racks)
+            for rack in racks:
+                if missing <= 0:
+                    break
+                full = len(rack.wells()) if channels == 1 else len(rack.columns())
+                missing -= full - available_pickups(rack, channels)
+                rack.reset()
+                refilled.append(rack)
+        return refilled
+
+    def begin(self, stage, placed):
+        # everything the operator has to do before a stage is collected into a single pause
+        self.stages += 1
+        refilled = self.refill(stage.get('tips', {}))
+        slots = {}
+        for labware, location in placed:
+            if location != THERMOCYCLER:
+                slots.setdefault(labware.load_name, []).append(location)
+        placements = ['{} on slot {}'.format(load_name, ', '.join(locations)) for load_name, locations in slots.items()]
+        if self.stages == 1:
+            if placements:
+                self.protocol.comment('Deck setup: ' + '; '.join(placements))
+            return
+        instructions = []
+        if stage.get('message'):
+            instructions.append(stage['message'])
+        if placements:
+            instructions.append('Place ' + '; '.join(placements) + '.')
+        if refilled:
+            instructions.append('Replace the tip racks on slot {} with full ones.'.format(
+                ', '.join(self.location(rack) for rack in refilled)))
+        if instructions:
+            self.protocol.pause('Before {}: {}'.format(stage['label'], ' '.join(instructions)))
+
+    def location(self, labware):
+        for location, item in self.labware.items():
+            if item is labware:
+                return location
+        return None
+
+    def stage(self, stage):
+        self.protocol.comment(PHASE_PREFIX + stage['label'] + ': setup')
+        for source, target in stage.get('moves', []):
+            self.move(source, target)
+        return StageContext(self, stage)
+
+
+class StageContext:
+    # Stands in for the ProtocolContext of one stage: loads go through the shared deck, the plate-loading pause at the
+    # start of a single protocol is replaced by the pipeline's own hand-over and phases are prefixed with the stage label.
+
+    def __init__(self, pipeline, stage):
+        self._pipeline = pipeline
+        self._stage = stage
+        self._placed = []
+        self._started = False
+        self._loading = True        # no pause and no liquid handling of the stage yet
+
+    def _begin(self):
+        if not self._started:
+            self._started = True
+            self._pipeline.begin(self._stage, self._placed)
+
+    def _load_name(self, load_name):
+        return self._stage.get('labware', {}).get(load_name, load_name)
+
+    def load_labware(self, load_name, location, label=None):
+        slot = str(location)
+        labware, new = self._pipeline.place(
+            self._load_name(load_name), slot, lambda name: self._pipeline.protocol.load_labware(name, slot, label))
+        if new:
+            self._placed.append((labware, slot))
+        return labware
+
+    def load_module(self, module_name, location=None, configuration=None):
+        module = self._pipeline.modules.get(module_name)
+        if module is None:
+            module = self._pipeline.protocol.load_module(module_name, location)
+            self._pipeline.modules[module_name] = module
+            if 'thermocycler' in module_name.lower():
+                self._pipeline.thermocycler = module
+        if module is self._pipeline.thermocycler:
+            return StageThermocycler(self, module)
+        return module
+
+    def load_instrument(self, instrument_name, mount, tip_racks=None, replace=False):
+        instrument = self._pipeline.instruments.get(mount)
+        if instrument is None:
+            instrument = self._pipeline.protocol.load_instrument(instrument_name, mount, tip_racks=list(tip_racks or []))
+            self._pipeline.instruments[mount] = instrument
+        elif instrument.name != instrument_name:
+            raise ValueError('Stage {} needs {} on the {} mount, but {} is installed'.format(
+                self._stage['label'], instrument_name, mount, instrument.name))
+        else:
+            instrument.tip_racks = instrument.tip_racks + [rack for rack in tip_racks or [] if rack not in instrument.tip_racks]
+        return StageInstrument(self, instrument)
+
+    def pause(self, msg=None):
+        # plates stay on the deck between stages and the pipeline's setup pause asks for the rest, so only the first pause
+        # before any liquid handling (loading the plates) is dropped; the hand-overs later in a stage pause the robot
+        self._begin()
+        if self._loading:
+            self._loading = False
+            self._pipeline.protocol.comment('Not needed in the pipeline: {}'.format(msg))
+        else:
+            self._pipeline.protocol.pause(msg)
+
+    def comment(self, msg):
+        self._begin()
+        if msg.startswith(PHASE_PREFIX):
+            msg = PHASE_PREFIX + self._stage['label'] + ': ' + msg[len(PHASE_PREFIX):]
+        self._pipeline.protocol.comment(msg)
+
+    def __getattr__(self, name):
+        self._begin()
+        return getattr(self._pipeline.protocol, name)
+
+
+class StageInstrument:
+    # The shared pipette, the first command of a stage triggers the stage's setup.
+
+    def __init__(self, context, instrument):
+        object.__setattr__(self, '_context', context)
+        object.__setattr__(self, '_instrument', instrument)
+
+    def __getattr__(self, name):
+        self._context._begin()
+        if name in LIQUID_HANDLING:
+            self._context._loading = False
+        return getattr(self._instrument, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._instrument, name, value)
+
+
+class StageThermocycler:
+    # The shared Thermocycler Module, lid and block commands that would not change its state are skipped,
+    # so a stage continues at the temperatures the previous one left.
+
+    def __init__(self, context, module):
+        self._context = context
+        self._module = module
+
+    def load_labware(self, load_name, label=None):
+        labware, new = self._context._pipeline.place(
+            self._context._load_name(load_name), THERMOCYCLER, lambda name: self._module.load_labware(name, label))
+        if new:
+            self._context._placed.append((labware, THERMOCYCLER))
+        return labware
+
+    def open_lid(self):
+        self._context._begin()
+        if self._module.lid_position != 'open':
+            return self._module.open_lid()
+        return self._module.lid_position
+
+    def close_lid(self):
+        self._context._begin()
+        if self._module.lid_position != 'closed':
+            return self._module.close_lid()
+        return self._module.lid_position
+
+    def set_lid_temperature(self, temperature):
+        self._context._begin()
+        if self._module.lid_target_temperature != temperature:
+            self._module.set_lid_temperature(temperature)
+
+    def set_block_temperature(self, temperature, hold_time_seconds=None, hold_time_minutes=None, ramp_rate=None, block_max_volume=None):
+        self._context._begin()
+        if hold_time_seconds or hold_time_minutes or self._module.block_target_temperature != temperature:
+            self._module.set_block_temperature(temperature, hold_time_seconds=hold_time_seconds, hold_time_minutes=hold_time_minutes,
+                                               ramp_rate=ramp_rate, block_max_volume=block_max_volume)
+
+    def __getattr__(self, name):
+        self._context._begin()
+        return getattr(self._module, name)
+
+
+def run_stages(protocol, stages):
+    pipeline = Pipeline(protocol)
+    for stage in stages:
+        namespace = {'__name__': stage['name']}
+        exec(compile(stage['source'], stage['name'] + '.py', 'exec'), namespace)
+        # stages measuring elapsed time use the clock of the pipeline, which offline simulations replace
+        if 'time' in namespace:
+            namespace['time'] = time
+        namespace['run'](pipeline.stage(stage))
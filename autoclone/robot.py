@@ -0,0 +1,793 @@
+"""Recording stand-in for the OT-2 Python Protocol API.
+
+The scripts in scripts/ only need a small part of ``opentrons.protocol_api``. This module
+re-implements that part without any hardware or the ``opentrons`` package and records every
+call as a plain dict, so that runtimes, tip usage and reagent consumption can be worked out
+offline (see ``autoclone.estimate``).
+"""
+import contextlib
+import math
+import os
+import sys
+import types
+
+from . import deck
+from .estimate import Estimator
+
+# comments starting with this prefix mark the beginning of a named protocol phase
+PHASE_PREFIX = 'Phase: '
+
+# target of ProtocolContext.move_labware for labware taken off the deck (API level 2.15)
+OFF_DECK = 'off deck'
+
+
+class SimulationError(Exception):
+    pass
+
+
+class OutOfTipsError(SimulationError):
+    pass
+
+
+class Point:
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x, self.y, self.z = x, y, z
+
+    def __add__(self, other):
+        return Point(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def __repr__(self):
+        return f'Point({self.x:.1f}, {self.y:.1f}, {self.z:.1f})'
+
+
+class Location:
+    # ``reference`` records how the protocol got the location: ('top', z), ('bottom', z), ('center', 0.0), or
+    # ('well', clearance) for a well passed as is, and ``offset`` the sum of the moves applied to it since
+    def __init__(self, point, labware, reference=None, offset=None):
+        self.point = point
+        self.labware = labware
+        self.reference = reference
+        self.offset = offset or Point()
+
+    def move(self, point):
+        return Location(self.point + point, self.labware, self.reference, self.offset + point)
+
+    @property
+    def well(self):
+        return self.labware if isinstance(self.labware, Well) else None
+
+
+class Well:
+    def __init__(self, parent, name, row, column, x, y):
+        self.parent = parent
+        self.name = name
+        self.row = row
+        self.column = column
+        self.x = x
+        self.y = y
+
+    @property
+    def well_name(self):
+        return self.name
+
+    @property
+    def depth(self):
+        return self.parent.definition['depth']
+
+    @property
+    def max_volume(self):
+        return self.parent.definition['volume']
+
+    @property
+    def diameter(self):
+        return self.parent.definition['diameter']
+
+    @property
+    def has_tip(self):
+        return bool(self.parent._tips and self.parent._tips[self.name])
+
+    def bottom(self, z=0.0):
+        return Location(Point(self.x, self.y, self.parent.z_bottom + z), self, ('bottom', z))
+
+    def top(self, z=0.0):
+        return Location(Point(self.x, self.y, self.parent.z_top + z), self, ('top', z))
+
+    def center(self):
+        return Location(Point(self.x, self.y, self.parent.z_bottom + self.depth / 2), self, ('center', 0.0))
+
+    def __repr__(self):
+        return f'{self.name} of {self.parent}'
+
+
+class Labware:
+    def __init__(self, load_name, slot, parent=None, label=None):
+        self.load_name = load_name
+        self.definition = deck.labware_definition(load_name)
+        self.label = label
+        d = self.definition
+        self._wells = []
+        for column in range(d['columns']):
+            for row in range(d['rows']):
+                self._wells.append(Well(self, f'{"ABCDEFGH"[row]}{column + 1}', row, column, 0.0, 0.0))
+        self._by_name = {well.name: well for well in self._wells}
+        self._tips = {well.name: True for well in self._wells} if d['tiprack'] else None
+        self._used = set()
+        self._place(slot, parent)
+
+    def _place(self, slot, parent=None):
+        # (re)computes the well positions, labware moved off the deck keeps slot None
+        self.slot = slot
+        self.parent = parent
+        if slot is None:
+            return
+        d = self.definition
+        base_x, base_y = deck.SLOT_ORIGINS[slot]
+        base_z = deck.MODULE_HEIGHTS[parent.module_type] if parent is not None else 0.0
+        self.z_top = base_z + d['height']
+        self.z_bottom = self.z_top - d['depth']
+        for well in self._wells:
+            well.x = base_x + d['x0'] + well.column * d['pitch']
+            well.y = base_y + d['y0'] - well.row * d['pitch']
+
+    @property
+    def name(self):
+        return self.label or self.load_name
+
+    @property
+    def is_tiprack(self):
+        return self.definition['tiprack']
+
+    def wells(self):
+        return list(self._wells)
+
+    def wells_by_name(self):
+        return dict(self._by_name)
+
+    def well(self, idx):
+        if isinstance(idx, int):
+            return self._wells[idx]
+        return self._by_name[idx]
+
+    def __getitem__(self, name):
+        return self._by_name[name]
+
+    def columns(self):
+        rows = self.definition['rows']
+        return [self._wells[i:i + rows] for i in range(0, len(self._wells), rows)]
+
+    def columns_by_name(self):
+        return {str(i + 1): column for i, column in enumerate(self.columns())}
+
+    def rows(self):
+        return [[well for well in self._wells if well.row == row] for row in range(self.definition['rows'])]
+
+    def rows_by_name(self):
+        return {'ABCDEFGH'[i]: row for i, row in enumerate(self.rows())}
+
+    # tip tracking
+    def _tip_block(self, well, num_tips):
+        column = self.columns()[well.column]
+        block = column[well.row:well.row + num_tips]
+        return block if len(block) == num_tips else None
+
+    def next_tip(self, num_tips=1, starting_tip=None):
+        start = self._wells.index(starting_tip) if starting_tip is not None else 0
+        for well in self._wells[start:]:
+            block = self._tip_block(well, num_tips)
+            if block and all(self._tips[w.name] for w in block):
+                return well
+        return None
+
+    def use_tips(self, well, num_tips=1):
+        """Marks tips as picked up and returns how many of them had not been used before."""
+        fresh = 0
+        for w in self._tip_block(well, num_tips):
+            if not self._tips[w.name]:
+                raise SimulationError(f'Tip {w} is not in the tip rack')
+            self._tips[w.name] = False
+            if w.name not in self._used:
+                self._used.add(w.name)
+                fresh += 1
+        return fresh
+
+    def return_tips(self, well, num_tips=1):
+        for w in self._tip_block(well, num_tips):
+            self._tips[w.name] = True
+
+    def reset(self):
+        # resetting the tip tracking means the rack has been refilled with new tips
+        if self._tips is not None:
+            self._tips = {name: True for name in self._tips}
+            self._used = set()
+
+    def __repr__(self):
+        return f'{self.name} on {self.slot}'
+
+
+class FlowRates:
+    def __init__(self, definition):
+        self.aspirate = definition['aspirate']
+        self.dispense = definition['dispense']
+        self.blow_out = definition['blow_out']
+
+
+class WellBottomClearance:
+    def __init__(self):
+        self.aspirate = 1.0
+        self.dispense = 1.0
+
+
+class InstrumentContext:
+    def __init__(self, protocol, name, mount, tip_racks):
+        self._protocol = protocol
+        self.name = name
+        self.mount = mount
+        self.definition = deck.pipette_definition(name, protocol.api_level)
+        self.channels = self.definition['channels']
+        self.max_volume = self.definition['max_volume']
+        self.min_volume = self.definition['min_volume']
+        self.tip_racks = list(tip_racks or [])
+        self.flow_rate = FlowRates(self.definition)
+        self.well_bottom_clearance = WellBottomClearance()
+        self.starting_tip = None
+        self.current_volume = 0.0
+        self._tip_origin = None
+        self._location = None
+
+    @property
+    def has_tip(self):
+        return self._tip_origin is not None
+
+    @property
+    def hw_pipette(self):
+        return {'has_tip': self.has_tip, 'channels': self.channels}
+
+    def _record(self, command, location=None, **fields):
+        fields['pipette'] = self.name
+        fields['mount'] = self.mount
+        if location is not None:
+            fields.update(self._protocol._describe(location))
+            self._location = location
+        return self._protocol._record(command, **fields)
+
+    def _resolve(self, location, clearance):
+        if location is None:
+            if self._location is None:
+                raise SimulationError(f'{self.name} has no current location')
+            return self._location
+        if isinstance(location, (list, tuple)):
+            location = location[0]
+        if isinstance(location, Well):
+            location = location.bottom(clearance)
+            location.reference = ('well', clearance)
+        return location
+
+    def pick_up_tip(self, location=None):
+        if self.has_tip:
+            raise SimulationError(f'{self.name} already has a tip attached')
+        if location is None:
+            well = self._next_tip()
+        else:
+            well = location.well if isinstance(location, Location) else location
+        fresh = well.parent.use_tips(well, self.channels)
+        self._tip_origin = well
+        self._record('pick_up_tip', well.top(), tips=fresh)
+        return self
+
+    def _next_tip(self):
+        racks = self.tip_racks
+        start = self.starting_tip
+        if start is not None and start.parent in racks:
+            racks = racks[racks.index(start.parent):]
+        for rack in racks:
+            well = rack.next_tip(self.channels, start if start is not None and start.parent is rack else None)
+            if well is not None:
+                return well
+        raise OutOfTipsError(f'{self.name} ran out of tips')
+
+    def _release_tip(self):
+        if not self.has_tip:
+            raise SimulationError(f'{self.name} has no tip attached')
+        self._tip_origin = None
+        self.current_volume = 0.0
+
+    def drop_tip(self, location=None):
+        if location is not None:
+            target = location.well if isinstance(location, Location) else location
+            if isinstance(target, Well) and target.parent.is_tiprack:
+                return self.return_tip()
+        self._release_tip()
+        self._record('drop_tip', None, x=deck.TRASH_POSITION[0], y=deck.TRASH_POSITION[1],
+                     z=deck.TRASH_POSITION[2], top=deck.TRASH_POSITION[2], slot=deck.TRASH_SLOT, labware='trash', well=None)
+        return self
+
+    def return_tip(self, home_after=True):
+        origin = self._tip_origin
+        self._release_tip()
+        origin.parent.return_tips(origin, self.channels)
+        self._record('return_tip', origin.top())
+        return self
+
+    def reset_tipracks(self):
+        for rack in self.tip_racks:
+            rack.reset()
+
+    def _require_tip(self):
+        if not self.has_tip:
+            raise SimulationError(f'{self.name} has no tip attached')
+
+    def aspirate(self, volume=None, location=None, rate=1.0):
+        self._require_tip()
+        location = self._resolve(location, self.well_bottom_clearance.aspirate)
+        if volume is None or volume == 0:
+            volume = self.max_volume - self.current_volume
+        if self.current_volume + volume > self.max_volume + 1e-6:
+            raise SimulationError(f'Cannot aspirate {volume} µl into {self.name} holding {self.current_volume} µl')
+        self.current_volume += volume
+        self._record('aspirate', location, volume=volume, flow_rate=self.flow_rate.aspirate * rate,
+                     channels=self.channels)
+        return self
+
+    def dispense(self, volume=None, location=None, rate=1.0):
+        self._require_tip()
+        location = self._resolve(location, self.well_bottom_clearance.dispense)
+        if volume is None or volume == 0:
+            volume = self.current_volume
+        volume = min(volume, self.current_volume)
+        self.current_volume -= volume
+        self._record('dispense', location, volume=volume, flow_rate=self.flow_rate.dispense * rate,
+                     channels=self.channels)
+        return self
+
+    def mix(self, repetitions=1, volume=None, location=None, rate=1.0):
+        volume = volume or self.max_volume
+        for _ in range(repetitions):
+            self.aspirate(volume, location, rate)
+            self.dispense(volume, rate=rate)
+        return self
+
+    def blow_out(self, location=None):
+        self._require_tip()
+        location = self._resolve(location, 0) if location is not None else self._location
+        volume, self.current_volume = self.current_volume, 0.0
+        self._record('blow_out', location, flow_rate=self.flow_rate.blow_out, volume=volume, channels=self.channels)
+        return self
+
+    def touch_tip(self, location=None, radius=1.0, v_offset=-1.0, speed=60.0):
+        self._require_tip()
+        location = self._resolve(location, 0)
+        self._record('touch_tip', location, speed=speed)
+        return self
+
+    def air_gap(self, volume=None, height=None):
+        self._require_tip()
+        location = self._location.well.top(height or 5.0)
+        volume = volume or self.max_volume - self.current_volume
+        self.current_volume += volume
+        self._record('air_gap', location, volume=volume, flow_rate=self.flow_rate.aspirate, channels=self.channels)
+        return self
+
+    def move_to(self, location):
+        self._record('move_to', location)
+        return self
+
+    def home(self):
+        self._protocol._record('home')
+        return self
+
+    def transfer(self, volume, source, dest, **kwargs):
+        """Expands a transfer into its building blocks like ``InstrumentContext.transfer``."""
+        new_tip = kwargs.get('new_tip', 'once')
+        sources = _as_targets(source)
+        dests = _as_targets(dest)
+        if len(sources) == 1:
+            sources = sources * len(dests)
+        if len(dests) == 1:
+            dests = dests * len(sources)
+        if len(sources) != len(dests):
+            raise SimulationError('Sources and destinations must have equal length')
+        volumes = list(volume) if isinstance(volume, (list, tuple)) else [volume] * len(sources)
+        mix_before = kwargs.get('mix_before')
+        mix_after = kwargs.get('mix_after')
+        blow_out = kwargs.get('blow_out', False)
+        blowout_location = kwargs.get('blowout_location')
+        touch_tip = kwargs.get('touch_tip', False)
+        air_gap = kwargs.get('air_gap', 0)
+        keep = not kwargs.get('trash', True)
+
+        def finish_tip():
+            if keep:
+                self.return_tip()
+            else:
+                self.drop_tip()
+
+        if new_tip == 'once':
+            self.pick_up_tip()
+        for src, dst, vol in zip(sources, dests, volumes):
+            chunks = math.ceil(vol / (self.max_volume - air_gap))
+            for _ in range(chunks):
+                chunk = vol / chunks
+                if new_tip == 'always':
+                    self.pick_up_tip()
+                if mix_before:
+                    self.mix(mix_before[0], mix_before[1], src)
+                self.aspirate(chunk, src)
+                if touch_tip:
+                    self.touch_tip(src.top() if isinstance(src, Well) else src)
+                if air_gap:
+                    self.air_gap(air_gap)
+                self.dispense(chunk + air_gap, dst)
+                if mix_after:
+                    self.mix(mix_after[0], mix_after[1], dst)
+                if blow_out:
+                    if blowout_location == 'source well':
+                        self.blow_out(src.top())
+                    elif blowout_location == 'destination well':
+                        self.blow_out(dst.top())
+                    else:
+                        self.blow_out(dst.top())
+                if touch_tip:
+                    self.touch_tip(dst.top())
+                if new_tip == 'always':
+                    finish_tip()
+        if new_tip == 'once':
+            finish_tip()
+        return self
+
+    def distribute(self, volume, source, dest, **kwargs):
+        kwargs.setdefault('new_tip', 'once')
+        return self.transfer(volume, source, dest, **kwargs)
+
+    def consolidate(self, volume, source, dest, **kwargs):
+        kwargs.setdefault('new_tip', 'once')
+        return self.transfer(volume, source, dest, **kwargs)
+
+    def __repr__(self):
+        return f'{self.name} on {self.mount} mount'
+
+
+def _as_targets(target):
+    """Flattens wells, locations and lists of columns into a list of single targets."""
+    if isinstance(target, (Well, Location)):
+        return [target]
+    targets = []
+    for item in target:
+        if isinstance(item, (list, tuple)):
+            targets.append(item[0])
+        else:
+            targets.append(item)
+    return targets
+
+
+class ModuleContext:
+    module_type = None
+
+    def __init__(self, protocol, name, slot):
+        self._protocol = protocol
+        self.name = name
+        self.slot = slot
+        self.labware = None
+
+    def load_labware(self, load_name, label=None):
+        if self.labware is not None:
+            raise SimulationError(f'{self.name} already holds {self.labware}')
+        self.labware = self._protocol._add_labware(Labware(load_name, self.slot, self, label))
+        return self.labware
+
+    def _record(self, command, **fields):
+        fields['module'] = self.module_type
+        return self._protocol._record(command, **fields)
+
+
+class ThermocyclerContext(ModuleContext):
+    module_type = 'thermocycler'
+
+    def __init__(self, protocol, name, slot):
+        super().__init__(protocol, name, slot)
+        self.lid_position = 'open'
+        self.block_target_temperature = None
+        self.lid_target_temperature = None
+
+    @property
+    def block_temperature(self):
+        return self.block_target_temperature
+
+    @property
+    def lid_temperature(self):
+        return self.lid_target_temperature
+
+    def open_lid(self):
+        self.lid_position = 'open'
+        self._record('open_lid')
+        return self.lid_position
+
+    def close_lid(self):
+        self.lid_position = 'closed'
+        self._record('close_lid')
+        return self.lid_position
+
+    def set_lid_temperature(self, temperature):
+        self.lid_target_temperature = temperature
+        self._record('set_lid_temperature', temperature=temperature)
+
+    def set_block_temperature(self, temperature, hold_time_seconds=None, hold_time_minutes=None,
+                              ramp_rate=None, block_max_volume=None):
+        hold = (hold_time_seconds or 0) + 60 * (hold_time_minutes or 0)
+        self.block_target_temperature = temperature
+        self._record('set_block_temperature', temperature=temperature, hold=hold,
+                     ramp_rate=ramp_rate, block_max_volume=block_max_volume)
+
+    def execute_profile(self, steps, repetitions, block_max_volume=None):
+        steps = [
+            {'temperature': step['temperature'],
+             'hold': step.get('hold_time_seconds', 0) + 60 * step.get('hold_time_minutes', 0)}
+            for step in steps]
+        self.block_target_temperature = steps[-1]['temperature']
+        self._record('execute_profile', steps=steps, repetitions=repetitions, block_max_volume=block_max_volume)
+
+    def deactivate_lid(self):
+        self.lid_target_temperature = None
+        self._record('deactivate_lid')
+
+    def deactivate_block(self):
+        self.block_target_temperature = None
+        self._record('deactivate_block')
+
+    def deactivate(self):
+        self.lid_target_temperature = None
+        self.block_target_temperature = None
+        self._record('deactivate')
+
+
+class MagneticModuleContext(ModuleContext):
+    module_type = 'magdeck'
+
+    def __init__(self, protocol, name, slot):
+        super().__init__(protocol, name, slot)
+        self.status = 'disengaged'
+
+    def engage(self, height=None, offset=None, height_from_base=None):
+        self.status = 'engaged'
+        self._record('engage', height=height_from_base if height_from_base is not None else height)
+
+    def disengage(self):
+        self.status = 'disengaged'
+        self._record('disengage')
+
+
+class TemperatureModuleContext(ModuleContext):
+    module_type = 'tempdeck'
+
+    def __init__(self, protocol, name, slot):
+        super().__init__(protocol, name, slot)
+        self.target = None
+
+    @property
+    def temperature(self):
+        return self.target
+
+    def set_temperature(self, celsius):
+        self.target = celsius
+        self._record('set_temperature', temperature=celsius)
+
+    def deactivate(self):
+        self.target = None
+        self._record('deactivate')
+
+
+MODULE_CONTEXTS = {
+    'thermocycler': ThermocyclerContext,
+    'magdeck': MagneticModuleContext,
+    'tempdeck': TemperatureModuleContext}
+
+
+class ProtocolContext:
+    """Stand-in for ``opentrons.protocol_api.ProtocolContext`` that records every command."""
+
+    def __init__(self, api_level='2.8'):
+        self.api_level = api_level
+        self.commands = []
+        self.deck = {}
+        self.loaded_labwares = {}
+        self.loaded_modules = {}
+        self.loaded_instruments = {}
+        self.phase = 'setup'
+        self.fixed_trash = Labware(deck.FIXED_TRASH, deck.TRASH_SLOT)
+
+    def is_simulating(self):
+        return True
+
+    def _record(self, command, **fields):
+        entry = {'index': len(self.commands), 'command': command, 'phase': self.phase}
+        entry.update(fields)
+        self.commands.append(entry)
+        return entry
+
+    @staticmethod
+    def _describe(location):
+        well = location.well
+        x, y, z = location.point
+        if well is None:
+            return {'x': x, 'y': y, 'z': z, 'top': z, 'slot': None, 'labware': None, 'well': None}
+        labware = well.parent
+        described = {'x': x, 'y': y, 'z': z, 'top': labware.z_top, 'slot': labware.slot,
+                     'labware': labware.name, 'well': well.name, 'height': z - labware.z_bottom,
+                     'reservoir': labware.definition['rows'] == 1, 'reference': location.reference}
+        if any(location.offset):
+            described['offset'] = tuple(location.offset)
+        return described
+
+    def _occupy(self, slot, item):
+        if slot in self.deck:
+            raise SimulationError(f'Slot {slot} is already occupied by {self.deck[slot]}')
+        self.deck[slot] = item
+
+    def _add_labware(self, labware):
+        self.loaded_labwares[labware.slot] = labware
+        return labware
+
+    def _remove_labware(self, labware):
+        if isinstance(labware.parent, ModuleContext):
+            labware.parent.labware = None
+        else:
+            self.deck.pop(labware.slot, None)
+        self.loaded_labwares.pop(labware.slot, None)
+
+    def load_labware(self, load_name, location, label=None, namespace=None, version=None):
+        slot = str(location)
+        self._occupy(slot, load_name)
+        return self._add_labware(Labware(load_name, slot, None, label))
+
+    def load_module(self, module_name, location=None, configuration=None):
+        kind = deck.module_type(module_name)
+        if kind == 'thermocycler':
+            slots = deck.THERMOCYCLER_SLOTS
+        else:
+            if location is None:
+                raise SimulationError(f'{module_name} needs a deck slot')
+            slots = (str(location),)
+        module = MODULE_CONTEXTS[kind](self, module_name, slots[0])
+        for slot in slots:
+            self._occupy(slot, module_name)
+        self.loaded_modules[slots[0]] = module
+        return module
+
+    def load_instrument(self, instrument_name, mount, tip_racks=None, replace=False):
+        if mount in self.loaded_instruments and not replace:
+            raise SimulationError(f'An instrument is already loaded on the {mount} mount')
+        instrument = InstrumentContext(self, instrument_name, mount, tip_racks)
+        self.loaded_instruments[mount] = instrument
+        return instrument
+
+    def move_labware(self, labware, new_location, use_gripper=False):
+        # the OT-2 has no gripper, moves always pause for the operator
+        if use_gripper:
+            raise SimulationError('The OT-2 cannot move labware with a gripper')
+        source = labware.slot
+        self._remove_labware(labware)
+        if new_location == OFF_DECK:
+            labware._place(None)
+        elif isinstance(new_location, ModuleContext):
+            labware._place(new_location.slot, new_location)
+            new_location.labware = self._add_labware(labware)
+        else:
+            slot = str(new_location)
+            self._occupy(slot, labware.load_name)
+            labware._place(slot)
+            self._add_labware(labware)
+        self._record('move_labware', labware=labware.name, source=source,
+                     target=labware.slot or OFF_DECK, message=f'Move {labware.name} from {source} to {labware.slot or OFF_DECK}')
+
+    def pause(self, msg=None):
+        self._record('pause', message=msg)
+
+    def resume(self):
+        pass
+
+    def delay(self, seconds=0, minutes=0, msg=None):
+        self._record('delay', seconds=seconds + 60 * minutes, message=msg)
+
+    def comment(self, msg):
+        if msg.startswith(PHASE_PREFIX):
+            self.phase = msg[len(PHASE_PREFIX):].strip()
+        self._record('comment', message=msg)
+
+    def home(self):
+        self._record('home')
+
+
+def _fake_opentrons():
+    """Builds importable ``opentrons`` modules backed by this stand-in."""
+    opentrons = types.ModuleType('opentrons')
+    protocol_api = types.ModuleType('opentrons.protocol_api')
+    protocol_api.ProtocolContext = ProtocolContext
+    protocol_api.InstrumentContext = InstrumentContext
+    protocol_api.Labware = Labware
+    protocol_api.Well = Well
+    protocol_api.OFF_DECK = OFF_DECK
+    otypes = types.ModuleType('opentrons.types')
+    otypes.Location = Location
+    otypes.Point = Point
+    opentrons.protocol_api = protocol_api
+    opentrons.types = otypes
+    return {'opentrons': opentrons, 'opentrons.protocol_api': protocol_api, 'opentrons.types': otypes}
+
+
+@contextlib.contextmanager
+def stand_in_api():
+    """Temporarily makes ``import opentrons`` resolve to this stand-in."""
+    fakes = _fake_opentrons()
+    saved = {name: sys.modules.get(name) for name in fakes}
+    sys.modules.update(fakes)
+    try:
+        yield
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+def load_script(path, source=None):
+    """Executes a protocol file against the stand-in API and returns it as a module.
+
+    ``source`` replaces the content of the file, e.g. for generated protocols not written yet.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    module = types.ModuleType(name.replace('-', '_'))
+    module.__file__ = path
+    if source is None:
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+    code = compile(source, path, 'exec')
+    with stand_in_api():
+        exec(code, module.__dict__)
+    return module
+
+
+class VirtualClock:
+    """Replaces the ``time`` module of a protocol, the clock reads the estimated runtime so far.
+
+    Protocols that measure elapsed time (e.g. to fill incubations with other work) thereby behave
+    offline as they would on the robot.
+    """
+
+    def __init__(self, protocol):
+        self._protocol = protocol
+        self._estimator = Estimator()
+        self._priced = 0
+        self._total = 0.0
+
+    def monotonic(self):
+        # commands are priced once, in order, as the estimator keeps track of gantry and module state
+        commands = self._protocol.commands
+        while self._priced < len(commands):
+            self._total += self._estimator.price(commands[self._priced])
+            self._priced += 1
+        return self._total
+
+    time = monotonic
+    perf_counter = monotonic
+
+    def sleep(self, seconds):
+        pass
+
+
+def simulate(path, wrap=None, source=None):
+    """Runs the protocol in ``path`` and returns the ``ProtocolContext`` holding the recorded commands.
+
+    ``wrap`` may replace the context handed to the protocol, it is called with the context and a
+    ``VirtualClock`` of the run. ``source`` is passed on to ``load_script``.
+    """
+    module = load_script(path, source)
+    metadata = getattr(module, 'metadata', {})
+    protocol = ProtocolContext(api_level=metadata.get('apiLevel', '2.8'))
+    if getattr(module, 'time', None) is sys.modules['time']:
+        module.time = VirtualClock(protocol)
+    with stand_in_api():
+        module.run(wrap(protocol, VirtualClock(protocol)) if wrap is not None else protocol)
+    return protocol
@@ -0,0 +1,344 @@
+"""Column-order and reservoir-column planner for reagent steps.
+
+Usage::
+
+    python -m autoclone.routes                      # all protocols in scripts/
+    python -m autoclone.routes scripts/plasmid_purification.py
+
+A reagent step is a run of commands of one pipette that takes a reagent from one reservoir column and
+dispenses it into several plate columns, e.g. the SOC addition or an ethanol wash. It consists of
+trips, each starting with a visit to the reservoir (including the tip pickup and mixing before it)
+and ending before the next one. Steps are grouped by reagent (reservoir column), so a reagent whose
+steps span several phases moves as a whole. For every reagent the planner tries the recorded column
+order, the reversed order and the column nearest to the reservoir first, each with the recorded
+reservoir column, with a column of another reagent or one the run leaves unused, and with the
+reagent split between its column and one unused column (every trip draws from the nearer of the
+two). Trips that hold the reagent in the tip during a delay keep their place in the order. A
+reservoir column never has to hold more than its volume. Reagents that are mixed in their column
+(bead suspensions) or whose column is touched outside their steps keep their column, and a reagent
+only moves if its own steps get faster, so that every proposed change saves time.
+
+The protocol's per-column incubations stay intact: the time from the last dispense into a column to
+the next command touching it must not get shorter than the shortest such time of the recorded step.
+Every reagent is re-priced on its own, so the reported savings add up.
+"""
+import argparse
+import sys
+
+from .benchmark import protocol_name, protocol_paths
+from .estimate import estimate, format_duration
+from .robot import simulate
+
+INCUBATION_TOLERANCE = 0.5  # s a column's incubation may fall short of the shortest recorded one
+MIN_SAVING = 0.05           # s a change has to save
+
+
+def _place(command):
+    return command.get('slot'), command.get('well')
+
+
+def _mixes(commands, index, place):
+    # the aspiration at index is part of mixing place: it is there and the next liquid handling puts it back
+    if _place(commands[index]) != place:
+        return False
+    following = next((command for command in commands[index + 1:] if command['command'] in ('aspirate', 'dispense', 'blow_out')), None)
+    return following is not None and following['command'] == 'dispense' and _place(following) == place
+
+
+def find_steps(commands):
+    """Runs of trips from one reservoir column as dicts with ``start``, ``end`` (command indices), ``trips`` and ``source``.
+
+    A run ends at the first command of another pipette, an aspiration elsewhere (mixing a column right after the
+    dispense into it is part of the trip), a pause, a delay or a module command. Phase changes do not end it, and a
+    delay or module command with the reagent in the tip (e.g. waiting for the end of a hold after a pre-aspiration)
+    stays with its trip, which then keeps its position (``pinned``). ``mixed`` tells whether the run mixes the reagent
+    in its column, as for bead suspensions.
+    """
+    steps = []
+    i = 0
+    while i < len(commands):
+        command = commands[i]
+        if command['command'] != 'aspirate' or not command.get('reservoir'):
+            i += 1
+            continue
+        source, mount = _place(command), command['mount']
+        visits = [i]
+        pinned = set()
+        mixed = False
+        holding = True
+        destination = None
+        j = i + 1
+        while j < len(commands):
+            other = commands[j]
+            if (other['command'] == 'delay' or 'module' in other) and holding:
+                pinned.add(len(visits) - 1)
+                j += 1
+                continue
+            if other['command'] in ('delay', 'pause', 'move_labware', 'home'):
+                break
+            if other['command'] != 'comment':
+                if other.get('mount') != mount:
+                    break
+                at_source = _place(other) == source
+                # mixing a column after the dispense into it belongs to the trip, any other aspiration ends the run
+                if other['command'] == 'aspirate' and not at_source and not _mixes(commands, j, destination):
+                    break
+                if other['command'] == 'dispense' and other.get('reservoir') and not at_source:
+                    break
+                if other['command'] == 'aspirate' and at_source and _place(commands[j - 1]) != source:
+                    visits.append(j)
+                if other['command'] == 'dispense' and not at_source:
+                    destination = _place(other)
+                mixed = mixed or (other['command'] == 'dispense' and at_source)
+                holding = other['command'] == 'aspirate' or (holding and other['command'] != 'dispense')
+            j += 1
+        # a trip begins with the tip pickup and comments (e.g. mixing announcements) right before its visit
+        trips = []
+        for visit in visits:
+            start = visit
+            while start > (trips[-1] + 1 if trips else 0) and (
+                    commands[start - 1]['command'] == 'comment'
+                    or (commands[start - 1]['command'] == 'pick_up_tip' and commands[start - 1]['mount'] == mount)):
+                start -= 1
+            trips.append(start)
+        # trailing commands after the last dispense (e.g. mixing announcements of the next step) are not part of the step
+        end = j
+        while end > visits[-1] and commands[end - 1]['command'] == 'comment':
+            end -= 1
+        ranges = [(start, stop) for start, stop in zip(trips, trips[1:] + [end])]
+        dispenses = [c for c in commands[trips[0]:end] if c['command'] == 'dispense' and _place(c) != source]
+        if len({_place(c) for c in dispenses}) > 1 and (not steps or trips[0] >= steps[-1]['end']):
+            steps.append({'start': trips[0], 'end': end, 'trips': ranges, 'source': source, 'phase': dispenses[0]['phase'],
+                          'pinned': pinned, 'mixed': mixed})
+        i = max(j, i + 1)
+    return steps
+
+
+class Planner:
+    """Prices the alternatives of the reagent steps of one recorded run."""
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.commands = protocol.commands
+        timing = estimate(self.commands)
+        self.durations = timing.durations
+        self.starts = []
+        elapsed = 0.0
+        for duration in self.durations:
+            self.starts.append(elapsed)
+            elapsed += duration
+        used = {_place(command) for command in self.commands}
+        self.unused = {}
+        for slot, labware in protocol.loaded_labwares.items():
+            if labware.definition['rows'] == 1:
+                self.unused[slot] = [well for well in labware.wells() if (slot, well.name) not in used]
+
+    def _window(self, step, trips):
+        start, end = step['start'], step['end']
+        return self.commands[start - 1:start] + trips + self.commands[end:end + 1]
+
+    def _price(self, step, trips):
+        # the command before and after the step anchor the gantry, so that moves into and out of the step are priced
+        durations = estimate(self._window(step, trips)).durations
+        return durations[1:1 + len(trips)] if step['start'] > 0 else durations[:len(trips)], sum(durations)
+
+    def incubations(self, step, commands, durations, shift):
+        """Seconds from the last dispense into every column of the step to the next command touching it."""
+        last = {}
+        elapsed = self.starts[step['start']]
+        for command, duration in zip(commands, durations):
+            elapsed += duration
+            if command['command'] == 'dispense' and _place(command) != step['source']:
+                last[_place(command)] = elapsed
+        incubations = {}
+        for index in range(step['end'], len(self.commands)):
+            place = _place(self.commands[index])
+            if place in last and place not in incubations:
+                incubations[place] = self.starts[index] + shift - last[place]
+        return incubations
+
+    @staticmethod
+    def _relocate(trip, source, well):
+        commands = []
+        for command in trip:
+            if _place(command) == source:
+                command = dict(command, well=well.name, x=well.x)
+            commands.append(command)
+        return commands
+
+    def _assign(self, step, trips, columns):
+        # every trip draws from the column nearest to its first dispense, as long as the column holds the reagent
+        drawn = {well.name: 0.0 for well in columns}
+        capacity = self.protocol.loaded_labwares[step['source'][0]].definition['volume']
+        assigned = []
+        for trip in trips:
+            volume = 0.0
+            for command in trip:
+                if _place(command) == step['source'] and command['command'] in ('aspirate', 'dispense', 'blow_out'):
+                    volume += (1 if command['command'] == 'aspirate' else -1) * command['volume'] * command['channels']
+            target = next((c['x'] for c in trip if c['command'] == 'dispense' and _place(c) != step['source']), None)
+            for well in sorted(columns, key=lambda well: abs(well.x - target) if target is not None else 0):
+                if drawn[well.name] + volume <= capacity:
+                    drawn[well.name] += volume
+                    assigned += self._relocate(trip, step['source'], well)
+                    break
+            else:
+                return None
+        return assigned
+
+    def best(self, step, options):
+        """Fastest alternative of a step over the column orders and ``options`` (lists of reservoir columns), None if none keeps the incubations."""
+        trips = [self.commands[start:stop] for start, stop in step['trips']]
+        recorded = self.protocol.loaded_labwares[step['source'][0]][step['source'][1]]
+        before_durations, before = self._price(step, self.commands[step['start']:step['end']])
+        reference = self.incubations(step, self.commands[step['start']:step['end']], before_durations, 0.0)
+        shortest = min(reference.values()) if reference else None
+
+        def first_x(trip):
+            return next((c['x'] for c in trip if c['command'] == 'dispense' and _place(c) != step['source']), recorded.x)
+
+        def arrange(movable):
+            # pinned trips keep their positions, the others take the remaining ones in the given order
+            movable = iter(movable)
+            return [trip if k in step['pinned'] else next(movable) for k, trip in enumerate(trips)]
+
+        movable = [trip for k, trip in enumerate(trips) if k not in step['pinned']]
+        orders = {'as recorded': trips, 'reversed': arrange(movable[::-1]),
+                  'nearest first': arrange(sorted(movable, key=lambda trip: abs(first_x(trip) - recorded.x)))}
+        best = None
+        seen = set()
+        for name, ordered in orders.items():
+            key = tuple(trip[0]['index'] for trip in ordered)
+            if key in seen:
+                continue
+            seen.add(key)
+            for columns in options:
+                candidate = self._assign(step, ordered, columns)
+                if candidate is None:
+                    continue
+                durations, total = self._price(step, candidate)
+                if shortest is not None:
+                    incubations = self.incubations(step, candidate, durations, total - before)
+                    if min(incubations.values()) < shortest - INCUBATION_TOLERANCE:
+                        continue
+                if best is None or sum(durations) < best['after'] - MIN_SAVING:
+                    best = {'before': sum(before_durations), 'after': sum(durations), 'order': name,
+                            'recorded': recorded.name, 'columns': [well.name for well in columns]}
+        return best
+
+    def reagent(self, steps, columns):
+        """Fastest alternative of all steps of one reagent drawing from ``columns``, None if a step has none."""
+        plans = [self.best(step, [columns]) for step in steps]
+        if any(plan is None for plan in plans):
+            return None
+        orders = list(dict.fromkeys(plan['order'] for plan in plans))
+        return {'before': sum(plan['before'] for plan in plans), 'after': sum(plan['after'] for plan in plans),
+                'order': ', '.join(orders), 'recorded': steps[0]['source'][1], 'columns': [well.name for well in columns]}
+
+    def plan(self, steps):
+        """Best alternative of every reagent as (its steps, plan); reagents may swap reservoir columns or move to unused ones."""
+        # columns touched outside the steps of their reagent, and reagents mixed in their column (bead suspensions), stay where they are
+        inside = set()
+        for step in steps:
+            inside.update(range(step['start'], step['end']))
+        fixed = {_place(command) for index, command in enumerate(self.commands) if index not in inside}
+        reagents = {}
+        for step in steps:
+            reagents.setdefault(step['source'], []).append(step)
+        assignment = {}
+        free = {}
+        for slot in sorted({source[0] for source in reagents}):
+            labware = self.protocol.loaded_labwares[slot]
+            movable = [source for source in reagents if source[0] == slot and source not in fixed
+                       and not any(step['mixed'] for step in reagents[source])]
+            columns = [well for well in labware.wells() if (slot, well.name) in movable or well in self.unused[slot]]
+            cost = {}
+            for source in list(movable):
+                own = self.reagent(reagents[source], [labware[source[1]]])
+                if own is None:
+                    movable.remove(source)
+                    continue
+                cost[(source, source[1])] = own['after']
+                for well in columns:
+                    if well.name == source[1]:
+                        continue
+                    plan = self.reagent(reagents[source], [well])
+                    # a reagent only moves to a column in which its own steps get faster, so that every move saves time
+                    if plan is not None and plan['after'] < own['after'] - MIN_SAVING:
+                        cost[(source, well.name)] = plan['after']
+            assignment.update(best_assignment(movable, [well.name for well in columns], cost))
+            free[slot] = [well for well in columns if well.name not in assignment.values() and (slot, well.name) not in fixed]
+        results = []
+        for source, group in reagents.items():
+            slot = source[0]
+            column = self.protocol.loaded_labwares[slot][assignment.get(source, source[1])]
+            best = None
+            for columns in [[column]] + [[column, well] for well in free.get(slot, [])]:
+                plan = self.reagent(group, columns)
+                if plan is not None and (best is None or plan['after'] < best['after'] - MIN_SAVING):
+                    best = plan
+            before = sum(sum(self._price(step, self.commands[step['start']:step['end']])[0]) for step in group)
+            if best is None or best['after'] > before - MIN_SAVING:
+                best = {'before': before, 'after': before, 'order': 'as recorded', 'recorded': source[1], 'columns': [source[1]]}
+            elif len(best['columns']) > 1:
+                free[slot] = [well for well in free[slot] if well.name != best['columns'][1]]
+            results.append((group, best))
+        return results
+
+
+def best_assignment(reagents, columns, cost):
+    """Column per reagent with the least total cost, every column taking at most one reagent."""
+    # dynamic programming over the set of columns taken so far
+    states = {0: (0.0, {})}
+    for reagent in reagents:
+        following = {}
+        for taken, (total, chosen) in states.items():
+            for k, column in enumerate(columns):
+                if taken & 1 << k or (reagent, column) not in cost:
+                    continue
+                value = total + cost[(reagent, column)]
+                key = taken | 1 << k
+                if key not in following or value < following[key][0] - 1e-9:
+                    following[key] = (value, {**chosen, reagent: column})
+        states = following
+    return min(states.values(), key=lambda state: state[0])[1] if states else {}
+
+
+def describe(protocol, steps):
+    columns = {c['well'] for step in steps for c in protocol.commands[step['start']:step['end']]
+               if c['command'] == 'dispense' and _place(c) != step['source']}
+    source = steps[0]['source']
+    labware = protocol.loaded_labwares[source[0]]
+    return f'{steps[0]["phase"]}: {labware.name} ({source[0]}) {source[1]} -> {len(columns)} columns'
+
+
+def plan_routes(path):
+    """Reagents of a protocol with their best alternatives."""
+    protocol = simulate(path)
+    return [(describe(protocol, steps), plan) for steps, plan in Planner(protocol).plan(find_steps(protocol.commands))]
+
+
+def format_routes(name, routes):
+    saved = sum(plan['before'] - plan['after'] for _, plan in routes)
+    lines = [f'{name}: {len(routes)} reagents, estimated time saved {format_duration(saved)}']
+    for description, plan in routes:
+        if plan['columns'] != [plan['recorded']] or plan['order'] != 'as recorded':
+            change = f'reservoir {" + ".join(plan["columns"])}, order {plan["order"]}'
+        else:
+            change = 'keep'
+        lines.append(f'    {description:<64} {format_duration(plan["before"])} -> {format_duration(plan["after"])}  {change}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Propose column orders and reservoir columns for reagent steps.')
+    parser.add_argument('protocols', nargs='*', help='protocol files, defaults to all files in scripts/')
+    args = parser.parse_args(argv)
+
+    for path in args.protocols or protocol_paths():
+        print(format_routes(protocol_name(path), plan_routes(path)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Per-command traces of protocol runs.
+
+Usage::
+
+    python -m autoclone.trace simulate scripts/plasmid_purification.py -o estimated.jsonl
+    python -m autoclone.trace instrument scripts/plasmid_purification.py -o plasmid_purification_traced.py
+    python -m autoclone.trace analyze robot.jsonl --against estimated.jsonl
+
+``simulate`` traces a run against the stand-in API, its timestamps are the estimated times.
+``instrument`` writes a copy of a protocol with the tracing layer (``autoclone/trace_runtime.py``)
+appended. Uploaded to the robot, that copy writes the same kind of trace with real timestamps, one
+file per run (to ``/data/user_storage`` unless ``--trace-file`` says otherwise, ``{run}`` in the name
+is replaced by the start time of the run). Simulations of the copy, e.g. when uploading it to the
+app, write nothing. ``analyze`` sums up a trace by
+phase, labware and command type, optionally next to a second trace.
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+
+from .benchmark import ROOT, protocol_name
+from .estimate import format_duration
+from .robot import simulate
+from .trace_runtime import trace
+
+RUNTIME = os.path.join(ROOT, 'autoclone', 'trace_runtime.py')
+ROBOT_TRACE_DIR = '/data/user_storage'
+
+
+def simulate_trace(path, output):
+    """Traces a simulated run of the protocol in ``path`` into ``output``."""
+    tracers = []
+
+    def wrap(protocol, clock):
+        traced = trace(protocol, output, clock.monotonic, simulated=True)
+        tracers.append(traced._tracer)
+        return traced
+
+    simulate(path, wrap)
+    for tracer in tracers:
+        tracer.close()
+
+
+def instrument(path, trace_file):
+    """Source of the protocol in ``path`` with the tracing layer wrapped around its ``run``."""
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    with open(RUNTIME, encoding='utf-8') as f:
+        runtime = f.read()
+    runtime = runtime[runtime.index('import datetime'):]
+    return '\n'.join([
+        source.rstrip('\n'),
+        '',
+        '',
+        '# trace instrumentation, added by `python -m autoclone.trace instrument`',
+        runtime.rstrip('\n'),
+        '',
+        '',
+        f'TRACE_FILE = {trace_file!r}',
+        '_untraced_run = run',
+        '',
+        '',
+        'def run(protocol):',
+        '    _untraced_run(trace(protocol, TRACE_FILE))',
+        ''])
+
+
+def load_trace(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(events):
+    """Seconds per phase, per labware and per command type (object and command) of a trace."""
+    summary = {'phase': collections.OrderedDict(), 'labware': collections.OrderedDict(),
+               'command': collections.OrderedDict()}
+    for event in events:
+        keys = {'phase': event['phase'], 'labware': event['labware'] or '-',
+                'command': f'{event["object"]}.{event["command"]}'}
+        for group, key in keys.items():
+            summary[group][key] = summary[group].get(key, 0.0) + event['duration']
+    return summary
+
+
+def format_summary(summary, reference=None):
+    lines = []
+    for group, values in summary.items():
+        lines.append(f'per {group}:')
+        keys = list(values)
+        if reference is not None:
+            keys += [key for key in reference[group] if key not in values]
+        for key in keys:
+            line = f'    {key:<48} {format_duration(values.get(key, 0.0))}'
+            if reference is not None:
+                other = reference[group].get(key, 0.0)
+                delta = values.get(key, 0.0) - other
+                line += f'  vs {format_duration(other)} ({"+" if delta >= 0 else "-"}{format_duration(abs(delta))})'
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Trace protocol runs command by command and analyze the traces.')
+    commands = parser.add_subparsers(dest='action', required=True)
+    simulated = commands.add_parser('simulate', help='trace a simulated run with estimated timestamps')
+    simulated.add_argument('protocol')
+    simulated.add_argument('-o', '--output', help='trace file, defaults to <protocol>.jsonl')
+    instrumented = commands.add_parser('instrument', help='write a copy of a protocol that traces itself on the robot')
+    instrumented.add_argument('protocol')
+    instrumented.add_argument('-o', '--output', help='protocol file, defaults to <protocol>_traced.py')
+    instrumented.add_argument('--trace-file', help=f'trace file on the robot, {{run}} is replaced by the start time of the run, '
+                                   f'defaults to {ROBOT_TRACE_DIR}/<protocol>_{{run}}.jsonl')
+    analyzed = commands.add_parser('analyze', help='time per phase, labware and command type')
+    analyzed.add_argument('trace')
+    analyzed.add_argument('--against', help='second trace to compare with, e.g. the simulated one')
+    args = parser.parse_args(argv)
+
+    if args.action == 'simulate':
+        output = args.output or protocol_name(args.protocol) + '.jsonl'
+        simulate_trace(args.protocol, output)
+        print(f'Trace written to {output}')
+    elif args.action == 'instrument':
+        output = args.output or protocol_name(args.protocol) + '_traced.py'
+        trace_file = args.trace_file or f'{ROBOT_TRACE_DIR}/{protocol_name(args.protocol)}_{{run}}.jsonl'
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(instrument(args.protocol, trace_file))
+        print(f'Instrumented protocol written to {output}')
+    else:
+        reference = summarize(load_trace(args.against)) if args.against else None
+        print(format_summary(summarize(load_trace(args.trace)), reference))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# Trace instrumentation for protocols, appended verbatim to a protocol by `python -m autoclone.trace instrument`.
+# It runs on the robot, so it only uses the standard library and must not import anything from autoclone.
+import datetime
+import json
+import os
+import time
+
+TRACE_PHASE_PREFIX = 'Phase: '
+TRACE_VOLUME_COMMANDS = ('aspirate', 'dispense', 'air_gap', 'transfer', 'distribute', 'consolidate')
+TRACE_RUN_FIELD = '{run}'     # replaced in the trace file name by the start time of the run, so that every run gets its own file
+
+
+def trace_target(target):
+    # labware and well of the first location in the arguments of a call
+    if isinstance(target, (list, tuple)):
+        return trace_target(target[0]) if target else None
+    labware = getattr(target, 'labware', None)
+    if labware is not None and not hasattr(target, 'wells'):
+        # types.Location, the robot wraps the labware or well into a LabwareLike
+        target = getattr(labware, 'object', labware)
+    if hasattr(target, 'top') and hasattr(target, 'parent'):
+        return {'labware': str(target.parent), 'well': getattr(target, 'well_name', None) or getattr(target, 'name', None)}
+    if hasattr(target, 'wells'):
+        return {'labware': str(target), 'well': None}
+    return None
+
+
+class Tracer:
+    # Writes one JSON line per traced call: start time (s since the first event), duration, phase, object and command,
+    # plus labware, well and volume where the call has them. The file is opened with the first event in the given mode,
+    # 'a' keeps the events of earlier runs written to the same file.
+
+    def __init__(self, path, clock=None, mode='a'):
+        self.path = path
+        self.mode = mode
+        # looked up at run time, offline simulations replace the time module of the protocol
+        self.clock = clock or time.monotonic
+        self.phase = 'setup'
+        self.origin = None
+        self.file = None
+        self.depth = 0
+
+    def record(self, kind, name, command, args, kwargs, start, end):
+        if self.file is None:
+            self.path = self.path.replace(TRACE_RUN_FIELD, datetime.datetime.now().strftime('%Y%m%d-%H%M%S'))
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = open(self.path, self.mode, encoding='utf-8')
+        if self.origin is None:
+            self.origin = start
+        event = {'t': round(start - self.origin, 3), 'duration': round(end - start, 3), 'phase': self.phase,
+                 'object': kind, 'name': name, 'command': command, 'labware': None, 'well': None}
+        for value in (list(args) + list(kwargs.values()) if kind != 'protocol' else []):
+            target = trace_target(value)
+            if target is not None:
+                event.update(target)
+                break
+        if command in TRACE_VOLUME_COMMANDS:
+            volume = kwargs.get('volume', args[0] if args else None)
+            if isinstance(volume, (int, float)):
+                event['volume'] = volume
+        elif command == 'mix' and len(args) > 1:
+            event['volume'] = args[1]
+        elif command in ('delay', 'pause', 'comment'):
+            event['message'] = kwargs.get('msg', args[0] if args and isinstance(args[0], str) else None)
+        self.file.write(json.dumps(event) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class Traced:
+    # Proxy timing every method call of a protocol context, pipette or module.
+    # Nested calls (e.g. the aspirates of a transfer) are part of the outer event and not traced on their own.
+
+    def __init__(self, tracer, target, kind, name):
+        object.__setattr__(self, '_tracer', tracer)
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_kind', kind)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attribute):
+        value = getattr(self._target, attribute)
+        if not callable(value) or attribute.startswith('_') or attribute in ('load_labware', 'is_simulating'):
+            return value
+
+        def call(*args, **kwargs):
+            tracer = self._tracer
+            if attribute == 'comment' and args and str(args[0]).startswith(TRACE_PHASE_PREFIX):
+                tracer.phase = str(args[0])[len(TRACE_PHASE_PREFIX):].strip()
+            start = tracer.clock()
+            tracer.depth += 1
+            try:
+                result = value(*args, **kwargs)
+            finally:
+                tracer.depth -= 1
+            if tracer.depth == 0:
+                tracer.record(self._kind, self._name, attribute, args, kwargs, start, tracer.clock())
+            if result is self._target:
+                return self
+            if attribute == 'load_instrument':
+                return Traced(tracer, result, 'pipette', '{} ({})'.format(args[0] if args else kwargs.get('instrument_name'), result.mount))
+            if attribute == 'load_module':
+                return Traced(tracer, result, 'module', args[0] if args else kwargs.get('module_name'))
+            return result
+        return call
+
+    def __setattr__(self, attribute, value):
+        setattr(self._target, attribute, value)
+
+
+def trace(protocol, path, clock=None, simulated=False):
+    # wraps a protocol context so that all calls of the protocol, its pipettes and modules are written to path;
+    # a simulation (upload to the app, opentrons_simulate) writes nothing, unless it is an offline simulation that asks for
+    # the trace (simulated), which then replaces the file
+    if protocol.is_simulating() and not simulated:
+        return protocol
+    return Traced(Tracer(path, clock, 'w' if simulated else 'a'), protocol, 'protocol', 'protocol')
@@ -0,0 +1,1304 @@
+# Generated by `python -m autoclone.pipeline` from the protocols in scripts/, do not edit by hand.
+# Runs golden_gate_assembly_mixing.py, golden_gate_assembly.py, heat-shock_transformation_mixing.py, heat-shock_transformation.py, distributing_cells_on_agar_plates.py one after the other on a shared deck.
+import time
+
+from opentrons import protocol_api
+
+metadata = {
+    'protocolName': 'cloning_pipeline',
+    'author': 'Carolin Müller, Vera Waffenschmidt',
+    'description': 'Golden Gate assembly, heat-shock transformation and plating in one run using the Opentrons OT-2 with Thermocycler Module.',
+    'apiLevel': '2.15'}
+
+PHASE_PREFIX = 'Phase: '
+THERMOCYCLER = 'thermocycler'
+# pipette commands after which a pause of a stage is a hand-over in the middle of the stage
+LIQUID_HANDLING = ('pick_up_tip', 'aspirate', 'dispense', 'transfer', 'distribute', 'consolidate', 'mix')
+
+
+def available_pickups(rack, channels):
+    # number of tip pickups left in a rack, multichannel pipettes need a full column
+    if channels == 1:
+        return sum(1 for well in rack.wells() if well.has_tip)
+    return sum(1 for column in rack.columns() if all(well.has_tip for well in column))
+
+
+class Pipeline:
+    # Deck, pipettes and Thermocycler Module shared by all stages of the combined protocol.
+    # Labware is kept per location (deck slot or 'thermocycler'): a stage asking for the same labware on the same
+    # location gets the already loaded one (including its tip tracking), different labware replaces it by a manual move.
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.labware = {}
+        self.instruments = {}
+        self.modules = {}
+        self.thermocycler = None
+        self.stages = 0
+
+    def open_lid(self):
+        if self.thermocycler is not None and self.thermocycler.lid_position != 'open':
+            self.thermocycler.open_lid()
+
+    def move(self, source, target=None):
+        # moves labware to another deck slot or off the deck (target None), the OT-2 pauses for the operator
+        labware = self.labware.pop(source)
+        if source == THERMOCYCLER:
+            self.open_lid()
+        if target is None:
+            self.protocol.move_labware(labware, protocol_api.OFF_DECK, use_gripper=False)
+            for instrument in self.instruments.values():
+                if labware in instrument.tip_racks:
+                    instrument.tip_racks = [rack for rack in instrument.tip_racks if rack is not labware]
+        else:
+            self.protocol.move_labware(labware, target, use_gripper=False)
+            self.labware[target] = labware
+
+    def place(self, load_name, location, load):
+        # returns the labware on location and whether it was newly loaded
+        current = self.labware.get(location)
+        if current is not None:
+            if current.load_name == load_name:
+                return current, False
+            self.move(location)
+        labware = load(load_name)
+        self.labware[location] = labware
+        return labware, True
+
+    def refill(self, demand):
+        # replaces the emptiest tip racks of each pipette until the stage's tip pickups are covered
+        refilled = []
+        for mount, pickups in sorted(demand.items()):
+            instrument = self.instruments.get(mount)
+            if instrument is None:
+                continue
+            channels = instrument.channels
+            racks = sorted(instrument.tip_racks, key=lambda rack: available_pickups(rack, channels))
+            missing = pickups - sum(available_pickups(rack, channels) for rack in racks)
+            for rack in racks:
+                if missing <= 0:
+                    break
+                full = len(rack.wells()) if channels == 1 else len(rack.columns())
+                missing -= full - available_pickups(rack, channels)
+                rack.reset()
+                refilled.append(rack)
+        return refilled
+
+    def begin(self, stage, placed):
+        # everything the operator has to do before a stage is collected into a single pause
+        self.stages += 1
+        refilled = self.refill(stage.get('tips', {}))
+        slots = {}
+        for labware, location in placed:
+            if location != THERMOCYCLER:
+                slots.setdefault(labware.load_name, []).append(location)
+        placements = ['{} on slot {}'.format(load_name, ', '.join(locations)) for load_name, locations in slots.items()]
+        if self.stages == 1:
+            if placements:
+                self.protocol.comment('Deck setup: ' + '; '.join(placements))
+            return
+        instructions = []
+        if stage.get('message'):
+            instructions.append(stage['message'])
+        if placements:
+            instructions.append('Place ' + '; '.join(placements) + '.')
+        if refilled:
+            instructions.append('Replace the tip racks on slot {} with full ones.'.format(
+                ', '.join(self.location(rack) for rack in refilled)))
+        if instructions:
+            self.protocol.pause('Before {}: {}'.format(stage['label'], ' '.join(instructions)))
+
+    def location(self, labware):
+        for location, item in self.labware.items():
+            if item is labware:
+                return location
+        return None
+
+    def stage(self, stage):
+        self.protocol.comment(PHASE_PREFIX + stage['label'] + ': setup')
+        for source, target in stage.get('moves', []):
+            self.move(source, target)
+        return StageContext(self, stage)
+
+
+class StageContext:
+    # Stands in for the ProtocolContext of one stage: loads go through the shared deck, the plate-loading pause at the
+    # start of a single protocol is replaced by the pipeline's own hand-over and phases are prefixed with the stage label.
+
+    def __init__(self, pipeline, stage):
+        self._pipeline = pipeline
+        self._stage = stage
+        self._placed = []
+        self._started = False
+        self._loading = True        # no pause and no liquid handling of the stage yet
+
+    def _begin(self):
+        if not self._started:
+            self._started = True
+            self._pipeline.begin(self._stage, self._placed)
+
+    def _load_name(self, load_name):
+        return self._stage.get('labware', {}).get(load_name, load_name)
+
+    def load_labware(self, load_name, location, label=None):
+        slot = str(location)
+        labware, new = self._pipeline.place(
+            self._load_name(load_name), slot, lambda name: self._pipeline.protocol.load_labware(name, slot, label))
+        if new:
+            self._placed.append((labware, slot))
+        return labware
+
+    def load_module(self, module_name, location=None, configuration=None):
+        module = self._pipeline.modules.get(module_name)
+        if module is None:
+            module = self._pipeline.protocol.load_module(module_name, location)
+            self._pipeline.modules[module_name] = module
+            if 'thermocycler' in module_name.lower():
+                self._pipeline.thermocycler = module
+        if module is self._pipeline.thermocycler:
+            return StageThermocycler(self, module)
+        return module
+
+    def load_instrument(self, instrument_name, mount, tip_racks=None, replace=False):
+        instrument = self._pipeline.instruments.get(mount)
+        if instrument is None:
+            instrument = self._pipeline.protocol.load_instrument(instrument_name, mount, tip_racks=list(tip_racks or []))
+            self._pipeline.instruments[mount] = instrument
+        elif instrument.name != instrument_name:
+            raise ValueError('Stage {} needs {} on the {} mount, but {} is installed'.format(
+                self._stage['label'], instrument_name, mount, instrument.name))
+        else:
+            instrument.tip_racks = instrument.tip_racks + [rack for rack in tip_racks or [] if rack not in instrument.tip_racks]
+        return StageInstrument(self, instrument)
+
+    def pause(self, msg=None):
+        # plates stay on the deck between stages and the pipeline's setup pause asks for the rest, so only the first pause
+        # before any liquid handling (loading the plates) is dropped; the hand-overs later in a stage pause the robot
+        self._begin()
+        if self._loading:
+            self._loading = False
+            self._pipeline.protocol.comment('Not needed in the pipeline: {}'.format(msg))
+        else:
+            self._pipeline.protocol.pause(msg)
+
+    def comment(self, msg):
+        self._begin()
+        if msg.startswith(PHASE_PREFIX):
+            msg = PHASE_PREFIX + self._stage['label'] + ': ' + msg[len(PHASE_PREFIX):]
+        self._pipeline.protocol.comment(msg)
+
+    def __getattr__(self, name):
+        self._begin()
+        return getattr(self._pipeline.protocol, name)
+
+
+class StageInstrument:
+    # The shared pipette, the first command of a stage triggers the stage's setup.
+
+    def __init__(self, context, instrument):
+        object.__setattr__(self, '_context', context)
+        object.__setattr__(self, '_instrument', instrument)
+
+    def __getattr__(self, name):
+        self._context._begin()
+        if name in LIQUID_HANDLING:
+            self._context._loading = False
+        return getattr(self._instrument, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._instrument, name, value)
+
+
+class StageThermocycler:
+    # The shared Thermocycler Module, lid and block commands that would not change its state are skipped,
+    # so a stage continues at the temperatures the previous one left.
+
+    def __init__(self, context, module):
+        self._context = context
+        self._module = module
+
+    def load_labware(self, load_name, label=None):
+        labware, new = self._context._pipeline.place(
+            self._context._load_name(load_name), THERMOCYCLER, lambda name: self._module.load_labware(name, label))
+        if new:
+            self._context._placed.append((labware, THERMOCYCLER))
+        return labware
+
+    def open_lid(self):
+        self._context._begin()
+        if self._module.lid_position != 'open':
+            return self._module.open_lid()
+        return self._module.lid_position
+
+    def close_lid(self):
+        self._context._begin()
+        if self._module.lid_position != 'closed':
+            return self._module.close_lid()
+        return self._module.lid_position
+
+    def set_lid_temperature(self, temperature):
+        self._context._begin()
+        if self._module.lid_target_temperature != temperature:
+            self._module.set_lid_temperature(temperature)
+
+    def set_block_temperature(self, temperature, hold_time_seconds=None, hold_time_minutes=None, ramp_rate=None, block_max_volume=None):
+        self._context._begin()
+        if hold_time_seconds or hold_time_minutes or self._module.block_target_temperature != temperature:
+            self._module.set_block_temperature(temperature, hold_time_seconds=hold_time_seconds, hold_time_minutes=hold_time_minutes,
+                                               ramp_rate=ramp_rate, block_max_volume=block_max_volume)
+
+    def __getattr__(self, name):
+        self._context._begin()
+        return getattr(self._module, name)
+
+
+def run_stages(protocol, stages):
+    pipeline = Pipeline(protocol)
+    for stage in stages:
+        namespace = {'__name__': stage['name']}
+        exec(compile(stage['source'], stage['name'] + '.py', 'exec'), namespace)
+        # stages measuring elapsed time use the clock of the pipeline, which offline simulations replace
+        if 'time' in namespace:
+            namespace['time'] = time
+        namespace['run'](pipeline.stage(stage))
+
+
+STAGES = [
+    {
+        'label': 'Golden Gate mixing',
+        'name': 'golden_gate_assembly_mixing',
+        'tips': {'right': 13},
+        'source': '''import csv
+import io
+import json
+
+from opentrons import protocol_api
+
+metadata = {
+    'protocolName': 'golden_gate_assembly_mixing',
+    'author': 'Carolin Müller, Vera Waffenschmidt',
+    'description': 'Protocol for mixing plasmid DNA and reaction mix before Golden Gate assembly using the Opentrons OT-2 with Thermocycler Module. The reaction mix is pipetted first and the DNA is added to it and mixed (earlier versions added the DNA first).',
+    'apiLevel': '2.8'}
+
+# sample manifest, keep identical in all protocols that read a manifest
+# A manifest is CSV text with a header line or a JSON list of objects with one entry per sample:
+# 'well' (well of the sample plate, 'A1:H3' stands for all wells from A1 to H3), 'sample' (name, optional),
+# 'mix' (reaction mix, optional) and 'replicates' (optional, 1 if not given).
+def expand_wells (text):
+    text = text.strip ().upper ()
+    if ':' not in text:
+        return [text]
+    first, last = text.split (':')
+    letters = 'ABCDEFGH'
+    rows = letters [letters.index (first [0]):letters.index (last [0]) + 1]
+    return [row + str (column) for column in range (int (first [1:]), int (last [1:]) + 1) for row in rows]
+
+def read_manifest (text, path = None):
+    # a manifest file given by path replaces the text
+    if path is not None:
+        with open (path, encoding = 'utf-8') as f:
+            text = f.read ()
+    text = text.strip ()
+    rows = json.loads (text) if text.startswith ('[') else list (csv.DictReader (io.StringIO (text)))
+    samples = {}
+    for row in rows:
+        for well in expand_wells (str (row ['well'])):
+            if well in samples:
+                raise ValueError ('Well {} is listed twice in the manifest'.format (well))
+            samples [well] = {'well': well,
+                              'sample': row.get ('sample') or well,
+                              'mix': str (row.get ('mix') or '').strip () or None,
+                              'replicates': int (row.get ('replicates') or 1)}
+    if not samples:
+        raise ValueError ('The manifest lists no samples')
+    return list (samples.values ())
+
+def transfer_plan (samples, single_channel = True):
+    # samples are processed column by column, empty columns are skipped
+    # a full column with one reaction mix is a single multichannel transfer from row A, the samples of partial columns
+    # are transferred one by one with a single-channel pipette or, without one, together as a whole column
+    columns = {}
+    for sample in samples:
+        columns.setdefault (int (sample ['well'] [1:]), []).append (sample)
+    plan = []
+    for column in sorted (columns):
+        members = sorted (columns [column], key = lambda sample: sample ['well'] [0])
+        mixes = set (sample ['mix'] for sample in members)
+        replicates = max (sample ['replicates'] for sample in members)
+        if len (mixes) == 1 and (len (members) == 8 or not single_channel):
+            plan.append ({'column': str (column), 'well': 'A' + str (column), 'channels': 8, 'mix': members [0] ['mix'], 'replicates': replicates})
+        elif single_channel:
+            for sample in members:
+                plan.append ({'column': str (column), 'well': sample ['well'], 'channels': 1, 'mix': sample ['mix'], 'replicates': replicates})
+        else:
+            raise ValueError ('Column {} contains different reaction mixes, which needs a single-channel pipette'.format (column))
+    return plan
+
+def describe_plan (samples, plan):
+    multi = sum (1 for step in plan if step ['channels'] > 1)
+    return 'Manifest: {} samples in {} columns, {} multichannel and {} single-channel transfers per step'.format (
+        len (samples), len (set (step ['column'] for step in plan)), multi, len (plan) - multi)
+
+# reagent dispensing, keep identical in all protocols that dispense reagents
+# A reagent for wells that are still empty is dispensed with one tip: every aspiration takes up the reagent for as many wells as fit into the tip
+# together with a disposal volume and an air gap, the air gap is drawn again before every dispense so that nothing drips on the way, and the
+# disposal volume is blown out back into the source after the last well of an aspiration. The caller picks up and drops the tip.
+# prepare (optional) is called before every aspiration, e.g. to resuspend beads.
+def multi_dispense (pipette, volume, source, wells, disposal_volume, air_gap, prepare = None):
+    per_aspiration = int ((pipette.max_volume - disposal_volume - air_gap) // volume)
+    if per_aspiration < 1:
+        raise ValueError ('{} µl do not fit into the tip together with {} µl disposal volume and {} µl air gap'.format (volume, disposal_volume, air_gap))
+    for k in range (0, len (wells), per_aspiration):
+        batch = wells [k:k + per_aspiration]
+        if prepare is not None:
+            prepare ()
+        pipette.aspirate (volume * len (batch) + disposal_volume, source)
+        for well in batch:
+            if air_gap:
+                pipette.air_gap (air_gap)
+            pipette.dispense (volume + air_gap, well)
+        pipette.blow_out (source.top ())
+
+# wells_by_name () and indexing create new well objects, so wells are the same if they have the same labware and name
+def same_well (a, b):
+    return a.parent is b.parent and a.well_name == b.well_name
+
+# names of the destination wells of a step of a transfer plan
+def step_wells (step):
+    if step ['channels'] == 1:
+        return [step ['well']]
+    return [row + step ['column'] for row in 'ABCDEFGH']
+
+# adds volume of a reagent to the destination wells of the plan steps, source (step) gives the source well of a step
+# Steps whose wells are all still empty are served by multi_dispense with one tip per pipette and source well, the other steps get a transfer
+# with a fresh tip per step and the transfer_options. filled holds the names of the destination wells that already hold liquid and is updated.
+def dispense_reagent (pipettes, plan, volume, source, destination, filled, disposal_volume, air_gap, **transfer_options):
+    groups = []     # [channels, source well, destination wells] per multi-dispense
+    for step in plan:
+        if any (well in filled for well in step_wells (step)):
+            pipettes [step ['channels']].transfer (volume, source (step), destination [step ['well']], new_tip = 'always', **transfer_options)
+        else:
+            for group in groups:
+                if group [0] == step ['channels'] and same_well (group [1], source (step)):
+                    group [2].append (destination [step ['well']])
+                    break
+            else:
+                groups.append ([step ['channels'], source (step), [destination [step ['well']]]])
+        filled.update (step_wells (step))
+    for channels, well, wells in groups:
+        pipettes [channels].pick_up_tip ()
+        multi_dispense (pipettes [channels], volume, well, wells, disposal_volume, air_gap)
+        pipettes [channels].drop_tip ()
+
+def run(protocol: protocol_api.ProtocolContext):
+    
+    # load module
+    tc_mod = protocol.load_module ('Thermocycler Module')
+
+    # load labware, adjust if necessary
+    DNA_plate = protocol.load_labware ('biorad_96_wellplate_200ul_pcr', '4') # plate with appropriately diluted DNA samples
+    MM_plate = protocol.load_labware('nest_12_reservoir_15ml','9') # 12 column plate with reaction mix in column 1
+    tc_plate = tc_mod.load_labware ('biorad_96_wellplate_200ul_pcr')
+    tiprack_1 = protocol.load_labware ('opentrons_96_tiprack_20ul', '6')
+    tiprack_2 = protocol.load_labware ('opentrons_96_tiprack_20ul', '3')
+    
+    # samples on the DNA plate, CSV or JSON (see read_manifest), adjust if necessary
+    manifest = """
+well
+A1:H12
+"""
+    manifest_file = None        # path of a manifest file on the robot, e.g. '/data/user_storage/manifest.csv', replaces the manifest above
+    single_channel = None       # e.g. 'p20_single_gen2' on the left mount for samples in partial columns, None processes partial columns with the multichannel pipette
+
+    # reagent dispensing into empty wells (see multi_dispense), adjust if necessary
+    disposal_volume = 2         # µl
+    air_gap = 1                 # µl
+
+    # load pipettes
+    p20multi = protocol.load_instrument ('p20_multi_gen2', 'right', tip_racks = [tiprack_1, tiprack_2])
+    p20single = protocol.load_instrument (single_channel, 'left', tip_racks = [tiprack_1, tiprack_2]) if single_channel else None
+    pipettes = {8: p20multi, 1: p20single}
+
+    # compile the manifest into one transfer per full column and per sample of a partial column
+    samples = read_manifest (manifest, manifest_file)
+    plan = transfer_plan (samples, single_channel = p20single is not None)
+    protocol.comment (describe_plan (samples, plan))
+
+    # reaction mix first (earlier versions added the DNA first), the wells of the pcr plate are still empty, so one tip dispenses it to all of them (see dispense_reagent);
+    # 10 µl leave no room for a second column in a 20 µl tip, so every column still gets its own aspiration
+    protocol.comment('Phase: reaction mix')
+    filled = set ()
+    dispense_reagent (pipettes, plan, 10, lambda step: MM_plate.wells_by_name ()['A1'], tc_plate, filled, disposal_volume, air_gap, mix_after = (3, 10), blow_out = True, blowout_location='destination well')
+
+    # transfer plasmid DNA into the reaction mix in the pcr plate in Thermocycler Module and mixing, with a fresh tip per column
+    protocol.comment('Phase: DNA transfer')
+    for step in plan:
+        pipettes [step ['channels']].transfer (10, DNA_plate [step ['well']], tc_plate [step ['well']], mix_after = (3, 10), new_tip = 'always', blow_out = True, blowout_location='destination well' )
+'''},
+    {
+        'label': 'Golden Gate assembly',
+        'name': 'golden_gate_assembly',
+        'tips': {},
+        'source': '''from opentrons import protocol_api
+
+metadata = {
+    'protocolName': 'golden_gate_assembly',
+    'author': 'Carolin Müller, Vera Waffenschnmidt',
+    'description': 'Protocol for Golden Gate assembly using the Opentrons OT-2 with Thermocycler Module.',
+    'apiLevel': '2.2'}
+
+# ramp rates of the Thermocycler Module used for time estimates (same values as in autoclone/estimate.py)
+BLOCK_HEATING = 4.4     # °C/s
+BLOCK_COOLING = 2.2     # °C/s
+BLOCK_SETTLE = 5.0      # s until the block is within tolerance of the target
+LID_HEATING = 0.35      # °C/s
+LID_COOLING = 0.1       # °C/s
+AMBIENT = 23.0          # °C
+
+def block_ramp(start, end):
+    if start is None:
+        start = AMBIENT
+    if start == end:
+        return 0.0
+    return abs(end - start) / (BLOCK_HEATING if end > start else BLOCK_COOLING) + BLOCK_SETTLE
+
+def lid_ramp(start, end):
+    if start is None:
+        start = AMBIENT
+    return abs(end - start) / (LID_HEATING if end > start else LID_COOLING)
+
+def hold_seconds(step):
+    return step.get('hold_time_seconds', 0) + 60 * step.get('hold_time_minutes', 0)
+
+def format_time(seconds):
+    seconds = int(round(seconds))
+    return '{}:{:02d}:{:02d}'.format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+# Thermocycler profile compiler
+# A program is a list of segments, either a hold ('temperature', 'hold_time_minutes'/'hold_time_seconds') or a cycle ('profile', 'repetitions').
+# Every segment may set 'lid_temperature' (None switches the lid heating off) and a 'phase' name for the run log.
+# The compiler merges holds at the same temperature, moves lid temperature changes into the preceding hold where the lid ramp fits
+# and returns the lid and block temperature to set after the plate is loaded together with a list of operations and their estimated durations.
+def compile_program(program):
+    segments = []
+    for segment in program:
+        segment = dict(segment)
+        if 'profile' in segment:
+            steps = []
+            for step in segment['profile']:
+                if steps and steps[-1]['temperature'] == step['temperature']:
+                    steps[-1]['hold'] += hold_seconds(step)
+                else:
+                    steps.append({'temperature': step['temperature'], 'hold': hold_seconds(step)})
+            segment['profile'] = steps
+        else:
+            segment['hold'] = hold_seconds(segment)
+            previous = segments[-1] if segments else None
+            if (previous is not None and 'profile' not in previous and previous['temperature'] == segment['temperature']
+                    and segment.get('lid_temperature', previous.get('lid_temperature')) == previous.get('lid_temperature')):
+                previous['hold'] += segment['hold']
+                continue
+        segments.append(segment)
+
+    first = segments[0]
+    lid = first.get('lid_temperature')
+    block = first['profile'][0]['temperature'] if 'profile' in first else first['temperature']
+    preparation = {'lid_temperature': lid, 'block_temperature': block}
+    operations = []
+    for segment in segments:
+        phase = segment.get('phase')
+        if 'lid_temperature' in segment and segment['lid_temperature'] != lid:
+            target = segment['lid_temperature']
+            seconds = lid_ramp(lid, target) if target is not None else 0.0
+            previous = operations[-1] if operations else None
+            if target is not None and previous is not None and previous['operation'] == 'hold' and previous['hold'] >= seconds:
+                # heat or cool the lid while the block is still holding the previous temperature
+                previous['hold'] -= seconds
+                operations.insert(len(operations) - 1, {'operation': 'lid', 'temperature': target, 'seconds': seconds, 'phase': previous['phase']})
+                previous['seconds'] -= seconds
+            else:
+                operations.append({'operation': 'lid', 'temperature': target, 'seconds': seconds, 'phase': phase})
+            lid = target
+        if 'profile' in segment:
+            seconds = 0.0
+            for _ in range(segment['repetitions']):
+                for step in segment['profile']:
+                    seconds += block_ramp(block, step['temperature']) + step['hold']
+                    block = step['temperature']
+            operations.append({'operation': 'profile', 'steps': segment['profile'], 'repetitions': segment['repetitions'], 'seconds': seconds, 'phase': phase})
+        else:
+            ramp = block_ramp(block, segment['temperature'])
+            block = segment['temperature']
+            if segment['hold']:
+                # reach the temperature first, so that a lid change can be scheduled into the hold
+                operations.append({'operation': 'hold', 'temperature': block, 'hold': 0, 'seconds': ramp, 'phase': phase})
+                operations.append({'operation': 'hold', 'temperature': block, 'hold': segment['hold'], 'seconds': segment['hold'], 'phase': phase})
+            else:
+                operations.append({'operation': 'hold', 'temperature': block, 'hold': 0, 'seconds': ramp, 'phase': phase})
+    return preparation, operations
+
+def describe(operation):
+    if operation['operation'] == 'lid':
+        if operation['temperature'] is None:
+            return 'lid heating off'
+        return 'lid to {} °C'.format(operation['temperature'])
+    if operation['operation'] == 'profile':
+        steps = ', '.join('{} °C {}'.format(step['temperature'], format_time(step['hold'])) for step in operation['steps'])
+        return '{} x ({})'.format(operation['repetitions'], steps)
+    if operation['hold']:
+        return 'hold {} °C for {}'.format(operation['temperature'], format_time(operation['hold']))
+    return 'block to {} °C'.format(operation['temperature'])
+
+def run_program(protocol, tc_mod, operations, block_max_volume):
+    phase = None
+    for operation in operations:
+        if operation['phase'] is not None and operation['phase'] != phase:
+            phase = operation['phase']
+            protocol.comment('Phase: ' + phase)
+        if operation['operation'] == 'lid':
+            if operation['temperature'] is None:
+                tc_mod.deactivate_lid()
+            else:
+                tc_mod.set_lid_temperature(operation['temperature'])
+        elif operation['operation'] == 'profile':
+            profile = [{'temperature': step['temperature'], 'hold_time_seconds': step['hold']} for step in operation['steps']]
+            tc_mod.execute_profile(steps=profile, repetitions=operation['repetitions'], block_max_volume=block_max_volume)
+        elif operation['hold']:
+            tc_mod.set_block_temperature(operation['temperature'], hold_time_seconds=operation['hold'], block_max_volume=block_max_volume)
+        else:
+            tc_mod.set_block_temperature(operation['temperature'], block_max_volume=block_max_volume)
+
+def run(protocol: protocol_api.ProtocolContext):
+    
+    # load module
+    tc_mod = protocol.load_module('Thermocycler Module')
+
+    # load labware, adjust if necessary
+    plate = tc_mod.load_labware('biorad_96_wellplate_200ul_pcr')
+
+    # maximum volume of wells 
+    Vmax = 20
+
+    # temperature program for Golden Gate assembly, adjust if necessary
+    program = [
+        {'profile': [
+            {'temperature': 37, 'hold_time_minutes': 1},
+            {'temperature': 16, 'hold_time_minutes': 5}],
+         'repetitions': 30, 'lid_temperature': 40, 'phase': 'cycling'},
+        {'temperature': 37, 'hold_time_minutes': 10, 'phase': 'cycling'},
+        {'temperature': 80, 'hold_time_minutes': 20, 'lid_temperature': 85, 'phase': 'inactivation'},   # enzyme inactivation, adjust if necessary
+        {'temperature': 0, 'lid_temperature': None, 'phase': 'hold'}]                                   # hold temperature until plate is removed
+
+    preparation, operations = compile_program(program)
+    for operation in operations:
+        protocol.comment('{}: {} (estimated {})'.format(operation['phase'], describe(operation), format_time(operation['seconds'])))
+    protocol.comment('Estimated time after loading the plate: {}'.format(format_time(sum(operation['seconds'] for operation in operations))))
+
+    # the plate is loaded first, set_lid_temperature and set_block_temperature wait until the temperature is reached
+    protocol.comment('Phase: plate loading')
+    tc_mod.open_lid()
+    protocol.pause('Insert PCR plate into thermocycler. Proceed, if done')
+    tc_mod.close_lid()
+    tc_mod.set_lid_temperature(preparation['lid_temperature'])
+    tc_mod.set_block_temperature(preparation['block_temperature'], block_max_volume=Vmax)
+
+    run_program(protocol, tc_mod, operations, Vmax)
+'''},
+    {
+        'label': 'transformation mixing',
+        'moves': [('4', None), ('thermocycler', '4')],
+        'labware': {'thermofisher_96_pcrplate_200ul': 'biorad_96_wellplate_200ul_pcr'},
+        'message': 'Place a PCR plate containing 20 µl competent cells per well into the Thermocycler Module. Make sure that the cells are thawed.',
+        'name': 'heat-shock_transformation_mixing',
+        'tips': {'right': 12},
+        'source': '''import csv
+import io
+import json
+
+from opentrons import protocol_api
+
+metadata = {
+    'protocolName': 'heat-shock_transformation_mixing',
+    'author': 'Carolin Müller, Vera Waffenschnmidt',
+    'description': 'Protocol for mixing of competent cells and DNA before E. coli heat-shock transformation using the Opentrons OT-2 with Thermocycler Module.',
+    'apiLevel': '2.8'}
+
+# sample manifest, keep identical in all protocols that read a manifest
+# A manifest is CSV text with a header line or a JSON list of objects with one entry per sample:
+# 'well' (well of the sample plate, 'A1:H3' stands for all wells from A1 to H3), 'sample' (name, optional),
+# 'mix' (reaction mix, optional) and 'replicates' (optional, 1 if not given).
+def expand_wells (text):
+    text = text.strip ().upper ()
+    if ':' not in text:
+        return [text]
+    first, last = text.split (':')
+    letters = 'ABCDEFGH'
+    rows = letters [letters.index (first [0]):letters.index (last [0]) + 1]
+    return [row + str (column) for column in range (int (first [1:]), int (last [1:]) + 1) for row in rows]
+
+def read_manifest (text, path = None):
+    # a manifest file given by path replaces the text
+    if path is not None:
+        with open (path, encoding = 'utf-8') as f:
+            text = f.read ()
+    text = text.strip ()
+    rows = json.loads (text) if text.startswith ('[') else list (csv.DictReader (io.StringIO (text)))
+    samples = {}
+    for row in rows:
+        for well in expand_wells (str (row ['well'])):
+            if well in samples:
+                raise ValueError ('Well {} is listed twice in the manifest'.format (well))
+            samples [well] = {'well': well,
+                              'sample': row.get ('sample') or well,
+                              'mix': str (row.get ('mix') or '').strip () or None,
+                              'replicates': int (row.get ('replicates') or 1)}
+    if not samples:
+        raise ValueError ('The manifest lists no samples')
+    return list (samples.values ())
+
+def transfer_plan (samples, single_channel = True):
+    # samples are processed column by column, empty columns are skipped
+    # a full column with one reaction mix is a single multichannel transfer from row A, the samples of partial columns
+    # are transferred one by one with a single-channel pipette or, without one, together as a whole column
+    columns = {}
+    for sample in samples:
+        columns.setdefault (int (sample ['well'] [1:]), []).append (sample)
+    plan = []
+    for column in sorted (columns):
+        members = sorted (columns [column], key = lambda sample: sample ['well'] [0])
+        mixes = set (sample ['mix'] for sample in members)
+        replicates = max (sample ['replicates'] for sample in members)
+        if len (mixes) == 1 and (len (members) == 8 or not single_channel):
+            plan.append ({'column': str (column), 'well': 'A' + str (column), 'channels': 8, 'mix': members [0] ['mix'], 'replicates': replicates})
+        elif single_channel:
+            for sample in members:
+                plan.append ({'column': str (column), 'well': sample ['well'], 'channels': 1, 'mix': sample ['mix'], 'replicates': replicates})
+        else:
+            raise ValueError ('Column {} contains different reaction mixes, which needs a single-channel pipette'.format (column))
+    return plan
+
+def describe_plan (samples, plan):
+    multi = sum (1 for step in plan if step ['channels'] > 1)
+    return 'Manifest: {} samples in {} columns, {} multichannel and {} single-channel transfers per step'.format (
+        len (samples), len (set (step ['column'] for step in plan)), multi, len (plan) - multi)
+
+def run(protocol: protocol_api.ProtocolContext):
+    
+    # load module
+    tc_mod = protocol.load_module ('Thermocycler Module')
+
+    # load labware, adjust if necessary
+    DNA_plate = protocol.load_labware ('thermofisher_96_pcrplate_200ul', '4')   # plate with DNA samples, e.g., after Golden Gate assembly
+    tc_plate = tc_mod.load_labware ('thermofisher_96_pcrplate_200ul')   # plate with competent cells, placed into the Thermocycler Module during the experiment
+    tiprack_20 = protocol.load_labware ('vwr_96_tiprack_10ul_short', '6')
+    
+    # labware for heat-shock transformation only (do not occupy these positions)
+    tiprack_300 = protocol.load_labware ('vwr_96_tiprack_300ul', '3')
+    reservoir = protocol.load_labware ('agilent_12_reservoir_21ml', '9')
+    agarplate_1 = protocol.load_labware ('agarplate_96_wellplate_5ul', '1')
+
+    # load pipettes
+    p20multi = protocol.load_instrument ('p20_multi_gen2', 'right', tip_racks = [tiprack_20])
+    
+    # pipette for heat-shock transformation only (install before starting)
+    p300multi = protocol.load_instrument ('p300_multi_gen2', 'left', tip_racks=[tiprack_300])
+
+    # samples on the DNA plate, CSV or JSON (see read_manifest), adjust if necessary
+    manifest = """
+well
+A1:H12
+"""
+    manifest_file = None        # path of a manifest file on the robot, e.g. '/data/user_storage/manifest.csv', replaces the manifest above
+
+    # both mounts are taken, partial columns are processed as whole columns with the multichannel pipette
+    samples = read_manifest (manifest, manifest_file)
+    plan = transfer_plan (samples, single_channel = False)
+    protocol.comment (describe_plan (samples, plan))
+
+    # cooling of Thermocycler Module
+    protocol.comment('Phase: plate loading')
+    tc_mod.set_block_temperature(0)
+    protocol.pause('Place a PCR plate containing 20 µl competent cells per well into the Thermocycler Module. Make sure that cells and DNA are thawed.')
+
+    # transfer DNA into pcr plate with competent cells inside the Thermocycler Module
+    protocol.comment('Phase: DNA transfer')
+    p20multi.transfer (2, [DNA_plate [step ['well']] for step in plan], [tc_plate [step ['well']] for step in plan], mix_after = (5, 20), new_tip = 'always', blow_out = True, blowout_location='destination well' )
+'''},
+    {
+        'label': 'heat-shock transformation',
+        'name': 'heat-shock_transformation',
+        'tips': {'left': 12, 'right': 12},
+        'source': '''import csv
+import datetime
+import io
+import json
+import os
+import time
+
+from opentrons import protocol_api, types
+
+metadata= {
+    'protocolName':'heat-shock_transformation',
+    'author':'Carolin Müller, Vera Waffenschnmidt',
+    'description' : 'Protocol for E. coli heat-shock transformation using the Opentrons OT-2 with Thermocycler Module. Important note: All agar plates must have a uniform filling level. When teaching, the pipette tip must reach into the agar so that the cell suspension is dispensed onto the agar plate.',
+    'apiLevel':'2.1'}
+
+# sample manifest, keep identical in all protocols that read a manifest
+# A manifest is CSV text with a header line or a JSON list of objects with one entry per sample:
+# 'well' (well of the sample plate, 'A1:H3' stands for all wells from A1 to H3), 'sample' (name, optional),
+# 'mix' (reaction mix, optional) and 'replicates' (optional, 1 if not given).
+def expand_wells (text):
+    text = text.strip ().upper ()
+    if ':' not in text:
+        return [text]
+    first, last = text.split (':')
+    letters = 'ABCDEFGH'
+    rows = letters [letters.index (first [0]):letters.index (last [0]) + 1]
+    return [row + str (column) for column in range (int (first [1:]), int (last [1:]) + 1) for row in rows]
+
+def read_manifest (text, path = None):
+    # a manifest file given by path replaces the text
+    if path is not None:
+        with open (path, encoding = 'utf-8') as f:
+            text = f.read ()
+    text = text.strip ()
+    rows = json.loads (text) if text.startswith ('[') else list (csv.DictReader (io.StringIO (text)))
+    samples = {}
+    for row in rows:
+        for well in expand_wells (str (row ['well'])):
+            if well in samples:
+                raise ValueError ('Well {} is listed twice in the manifest'.format (well))
+            samples [well] = {'well': well,
+                              'sample': row.get ('sample') or well,
+                              'mix': str (row.get ('mix') or '').strip () or None,
+                              'replicates': int (row.get ('replicates') or 1)}
+    if not samples:
+        raise ValueError ('The manifest lists no samples')
+    return list (samples.values ())
+
+def transfer_plan (samples, single_channel = True):
+    # samples are processed column by column, empty columns are skipped
+    # a full column with one reaction mix is a single multichannel transfer from row A, the samples of partial columns
+    # are transferred one by one with a single-channel pipette or, without one, together as a whole column
+    columns = {}
+    for sample in samples:
+        columns.setdefault (int (sample ['well'] [1:]), []).append (sample)
+    plan = []
+    for column in sorted (columns):
+        members = sorted (columns [column], key = lambda sample: sample ['well'] [0])
+        mixes = set (sample ['mix'] for sample in members)
+        replicates = max (sample ['replicates'] for sample in members)
+        if len (mixes) == 1 and (len (members) == 8 or not single_channel):
+            plan.append ({'column': str (column), 'well': 'A' + str (column), 'channels': 8, 'mix': members [0] ['mix'], 'replicates': replicates})
+        elif single_channel:
+            for sample in members:
+                plan.append ({'column': str (column), 'well': sample ['well'], 'channels': 1, 'mix': sample ['mix'], 'replicates': replicates})
+        else:
+            raise ValueError ('Column {} contains different reaction mixes, which needs a single-channel pipette'.format (column))
+    return plan
+
+def describe_plan (samples, plan):
+    multi = sum (1 for step in plan if step ['channels'] > 1)
+    return 'Manifest: {} samples in {} columns, {} multichannel and {} single-channel transfers per step'.format (
+        len (samples), len (set (step ['column'] for step in plan)), multi, len (plan) - multi)
+
+# plating engine, keep identical in distributing_cells_on_agar_plates.py and heat-shock_transformation.py
+# It spots the steps of a manifest transfer plan (see transfer_plan): every column of samples gets as many neighbouring spot columns
+# as its replicates, agar plates are filled one after the other and a column of samples is never split over two agar plates.
+# Every agar well can take several spots at fixed offsets from its centre (offset grids of 96 spots), the spot columns of a plate
+# are then its columns times the offsets, and the replicates of a sample go around the same well first.
+def spot_layout (plan, spot_columns = 12):
+    # agar plate index and first spot column of every column of samples
+    layout = {}
+    plate, free = 0, 0
+    for step in plan:
+        if step ['column'] in layout:
+            continue
+        if step ['replicates'] > spot_columns:
+            raise ValueError ('{} replicate spots do not fit on one agar plate'.format (step ['replicates']))
+        if free + step ['replicates'] > spot_columns:
+            plate, free = plate + 1, 0
+        layout [step ['column']] = (plate, free)
+        free += step ['replicates']
+    return layout
+
+def agar_plates_needed (plan, spot_columns = 12):
+    return max (plate for plate, first in spot_layout (plan, spot_columns).values ()) + 1
+
+def check_spot_offsets (offsets, pitch, distance):
+    # spots must keep distance mm apart, from the other spots of their well and from the spots of the neighbouring wells
+    for k, (x, y) in enumerate (offsets):
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                for m, (u, v) in enumerate (offsets):
+                    if (i, j, m) != (0, 0, k) and ((u + i * pitch - x) ** 2 + (v + j * pitch - y) ** 2) ** 0.5 < distance:
+                        raise ValueError ('Spots at {} and {} mm from the well centres are closer than {} mm'.format ((x, y), (u + i * pitch, v + j * pitch), distance))
+
+def spot_location (well, offset):
+    # spots in the well centre use the default dispense height, offset spots are dispensed 1 mm above the agar surface as well
+    if tuple (offset) == (0, 0):
+        return well
+    return well.bottom (1).move (types.Point (x = offset [0], y = offset [1]))
+
+def plating_plan (plan, source_plate, agar_plates, offsets = ((0, 0),), distance = 0):
+    # every sample is spotted in its own row, multichannel steps start in row A
+    pitch = agar_plates [0] ['A2'].top ().point.x - agar_plates [0] ['A1'].top ().point.x
+    check_spot_offsets (offsets, pitch, distance)
+    layout = spot_layout (plan, len (agar_plates [0].columns ()) * len (offsets))
+    spotting = []
+    for step in plan:
+        plate, first = layout [step ['column']]
+        if plate >= len (agar_plates):
+            raise ValueError ('The samples need more than {} agar plates'.format (len (agar_plates)))
+        row = 'ABCDEFGH'.index (step ['well'] [0])
+        spots = [divmod (first + k, len (offsets)) for k in range (step ['replicates'])]
+        spotting.append ((step ['channels'], source_plate [step ['well']], [spot_location (agar_plates [plate].columns () [column] [row], offsets [grid]) for column, grid in spots]))
+    return spotting
+
+def plate_out (pipettes, spotting, spot_volume, excess_volume):
+    # one aspiration fills as many spots as fit into the tip, the excess volume stays in the tip so that no air is dispensed onto the agar
+    for channels, source, spots in spotting:
+        pipette = pipettes [channels]
+        spots_per_aspiration = int ((pipette.max_volume - excess_volume) // spot_volume)
+        if spots_per_aspiration < 1:
+            raise ValueError ('{} µl spots plus {} µl excess do not fit into the tip'.format (spot_volume, excess_volume))
+        pipette.pick_up_tip ()
+        for k in range (0, len (spots), spots_per_aspiration):
+            batch = spots [k:k + spots_per_aspiration]
+            pipette.aspirate (spot_volume * len (batch) + (excess_volume if k == 0 else 0), source)
+            for spot in batch:
+                pipette.dispense (spot_volume, spot)
+        pipette.drop_tip ()
+
+# plating in rounds, for fewer agar slots than agar plates needed
+# the steps of a transfer plan are split at the agar plate boundaries of spot_layout, every round fits onto plates_per_round agar plates
+def plating_rounds (plan, plates_per_round, spot_columns = 12):
+    layout = spot_layout (plan, spot_columns)
+    rounds = []
+    for step in plan:
+        index = layout [step ['column']] [0] // plates_per_round
+        while len (rounds) <= index:
+            rounds.append ([])
+        rounds [index].append (step)
+    return rounds
+
+# latency budgets, keep identical in all protocols with time-critical steps
+# A budget limits the time from one named event to a later one, e.g. {('cold hold', 'SOC'): 120} in seconds. Events may carry a detail
+# such as the column, the budget of 'SOC' applies to every column. Each latency with a budget is written to the run log and, on the robot,
+# appended to a CSV file, so that it can be compared with the transformation efficiency of the run.
+class Latencies:
+    def __init__ (self, protocol, budgets, path = None):
+        self.protocol = protocol
+        self.budgets = budgets
+        self.path = path
+        self.run_start = datetime.datetime.now ().isoformat (timespec = 'seconds')
+        self.events = {}
+
+    def mark (self, event, detail = None):
+        now = time.monotonic ()
+        self.events [event] = now
+        for (start, end), budget in self.budgets.items ():
+            if end == event and start in self.events:
+                self.log (start, event, detail, now - self.events [start], budget)
+
+    def log (self, start, event, detail, latency, budget):
+        name = event if detail is None else '{} {}'.format (event, detail)
+        if latency <= budget:
+            self.protocol.comment ('Latency: {} -> {}: {:.0f} s (budget {} s)'.format (start, name, latency, budget))
+        else:
+            self.protocol.comment ('Latency: {} -> {}: {:.0f} s, over the budget of {} s'.format (start, name, latency, budget))
+        if self.path is None or self.protocol.is_simulating ():
+            return
+        new = not os.path.exists (self.path)
+        with open (self.path, 'a', newline = '', encoding = 'utf-8') as f:
+            writer = csv.writer (f)
+            if new:
+                writer.writerow (['run', 'from', 'to', 'detail', 'seconds', 'budget'])
+            writer.writerow ([self.run_start, start, event, detail or '', round (latency, 1), budget])
+
+# non-blocking Thermocycler holds
+# start_hold brings the block to temperature and starts a timer instead of holding, the robot is free for other work until
+# await_hold waits for the rest of the hold time
+def start_hold (protocol, tc_mod, temperature, minutes, block_max_volume):
+    tc_mod.set_block_temperature (temperature, block_max_volume = block_max_volume)
+    protocol.comment ('Holding {} °C for {} min'.format (temperature, minutes))
+    return time.monotonic () + 60 * minutes
+
+def await_hold (protocol, end):
+    remaining = end - time.monotonic ()
+    if remaining > 0:
+        protocol.delay (seconds = remaining, msg = 'Waiting for the end of the hold')
+
+def run(protocol: protocol_api.ProtocolContext):
+
+    # load module
+    tc_mod = protocol.load_module ('Thermocycler Module')
+
+    # load labware, adjust if necessary
+    tc_plate = tc_mod.load_labware ('biorad_96_wellplate_200ul_pcr')                              
+    tiprack_300 = protocol.load_labware ('vwr_96_tiprack_300ul', '3')
+    tiprack_20 = protocol.load_labware ('vwr_96_tiprack_10ul_short', '6')   
+    reservoir = protocol.load_labware ('agilent_12_reservoir_21ml', '9')    # fill first column with SOC medium, the second one for plate B in dual-plate mode
+
+    # samples in the plate with competent cells, CSV or JSON (see read_manifest), adjust if necessary
+    # "replicates" is the number of spots per sample, samples of the same column get the same number of spots
+    manifest = """
+well,replicates
+A1:H12,4
+"""
+    manifest_file = None        # path of a manifest file on the robot, e.g. '/data/user_storage/manifest.csv', replaces the manifest above
+
+    # both mounts are taken, partial columns are processed as whole columns with the multichannel pipettes
+    samples = read_manifest (manifest, manifest_file)
+    plan = transfer_plan (samples, single_channel = False)
+    protocol.comment (describe_plan (samples, plan))
+
+    # define spotting, adjust if necessary
+    spot_volume = 8             # µl per spot
+    excess_volume = 1           # µl remaining in the tip
+    agar_slots = ['1', '2', '5', '4']   # agar plates are filled in this order, only as many plates as needed are used
+    spot_offsets = [(0, 0)]     # mm from the well centre (x to the right, y to the back) of the spots per agar well, e.g. four offset
+                                # 96-spot grids [(-2.25, 2.25), (2.25, 2.25), (-2.25, -2.25), (2.25, -2.25)] take four times the spots of a plate
+    spot_distance = 4           # mm, the least distance between the centres of two spots
+
+    # latency budgets in s (see Latencies), adjust if necessary
+    # SOC has to reach the cells soon after the cold hold following the heat shock
+    latency_budgets = {('cold hold', 'SOC'): 120}
+    latency_file = '/data/user_storage/heat-shock_transformation_latencies.csv'     # None to log in the run log only
+
+    # dual-plate mode, adjust if necessary
+    # a second plate (plate B, same manifest) gets its DNA and its time on ice on the deck while plate A recovers in the Thermocycler,
+    # then the plates are exchanged and plate A is plated out on the deck while plate B recovers; False handles one plate
+    second_plate = False
+    plate_b_ice = 30            # min plate B is kept on ice after its DNA transfer, as the single plate in the thermocycler block
+    plate_b_transfer = 8        # min for loading plate B and its DNA transfer
+    plate_b_exchange = 2        # min from the end of the recovery of plate A until plate B is in the cold thermocycler block
+
+    # labware for the dual-plate mode only, slots 4 and 5 are not available for agar plates then
+    if second_plate:
+        dna_plate_b = protocol.load_labware ('biorad_96_wellplate_200ul_pcr', '4')    # DNA for plate B, replaced by plate A for its plating, so both are the same PCR plate
+        cells_b = protocol.load_labware ('thermo_96_chilledpcr_200ul', '5')     # plate B with competent cells on 3D printed cooling carrier containing ice
+        agar_slots = [slot for slot in agar_slots if slot not in ('4', '5')]
+
+    # load agar plates
+    agar_plates = [protocol.load_labware ('agarplate_96_wellplate_5ul', slot) for slot in agar_slots [:agar_plates_needed (plan, 12 * len (spot_offsets))]]
+
+    # load pipettes
+    p300multi = protocol.load_instrument ('p300_multi_gen2', 'left', tip_racks=[tiprack_300])
+    p20multi = protocol.load_instrument ('p20_multi_gen2', 'right', tip_racks = [tiprack_20])
+
+    # heat shock of the plate in the thermocycler block, the staged SOC tip has to be on the pipette
+    # the SOC for the first column is aspirated during the cold hold, the lid stays closed until the hold is over
+    def heat_shock (soc):
+        tc_mod.set_block_temperature (42, hold_time_seconds=30, block_max_volume=22)
+        cold_hold = start_hold (protocol, tc_mod, 0, 2, 22)
+        p300multi.aspirate (178, soc)
+        await_hold (protocol, cold_hold)
+        latencies.mark ('cold hold')
+        tc_mod.open_lid ()
+
+    # transfer SOC medium into PCR plate for regeneration, with a fresh tip per column that dispenses into the well and mixes it,
+    # so that no tip touching the cultures goes on to the next column; the first column gets the staged tip with its SOC
+    def add_soc (soc, plate_name = None):
+        for k, step in enumerate (plan):
+            if k > 0:
+                p300multi.pick_up_tip ()
+                p300multi.aspirate (178, soc)
+            p300multi.dispense (178, tc_plate [step ['well']])
+            latencies.mark ('SOC', step ['well'] if plate_name is None else '{} of plate {}'.format (step ['well'], plate_name))
+            p300multi.mix (2, 190, tc_plate [step ['well']])
+            p300multi.drop_tip ()
+
+    # pause for the operator, the tip racks are to be refilled as well if their remaining tips do not suffice for the next pickups
+    def exchange (message, soc_pickups = 0, plating_pickups = 0):
+        refills = []
+        for pipette, rack, name, pickups in [(p300multi, tiprack_300, '300 µl tip rack in slot 3', soc_pickups), (p20multi, tiprack_20, '10 µl tip rack in slot 6', plating_pickups)]:
+            if sum (1 for column in rack.columns () if all (well.has_tip for well in column)) < pickups:
+                refills.append ((pipette, name))
+        if refills:
+            message += ' Please fill up the {}.'.format (' and the '.join (name for pipette, name in refills))
+        protocol.pause (message)
+        for pipette, name in refills:
+            pipette.reset_tipracks ()
+
+    # plating out in as many rounds as the agar slots need, fresh agar plates are requested before every round except a first one
+    # with the agar plates that are already on the deck
+    def plate_rounds (source_plate, plate_name, rounds, fresh):
+        for k, steps in enumerate (rounds):
+            if k > 0 or fresh:
+                exchange ('Please place fresh agar plates for plate {} into slots {}.'.format (plate_name, ', '.join (agar_slots [:len (agar_plates)])), plating_pickups = len (steps))
+            plate_out ({8: p20multi}, plating_plan (steps, source_plate, agar_plates, spot_offsets, spot_distance), spot_volume, excess_volume)
+
+    # cool down thermocycler
+    protocol.comment('Phase: plate loading')
+    tc_mod.set_block_temperature (0)
+
+    # insert plate and perform the heat-shock
+    tc_mod.open_lid ()
+    protocol.pause ('Please load PCR plate containing 2 µl DNA and 20 µl competent E. coli cells per well into the thermocycler block')
+    tc_mod.close_lid ()
+
+    # the tip for the SOC is picked up in advance, so that the SOC addition starts right after the cold hold
+    latencies = Latencies (protocol, latency_budgets, latency_file)
+    p300multi.pick_up_tip ()
+
+    # heat-shock transformation
+    protocol.comment('Phase: heat shock')
+    tc_mod.set_block_temperature (0, hold_time_minutes=30, block_max_volume=22)
+    heat_shock (reservoir.wells_by_name()['A1'])
+    protocol.comment('Phase: SOC addition')
+    add_soc (reservoir.wells_by_name()['A1'], 'A' if second_plate else None)
+    tc_mod.close_lid ()
+    protocol.comment('Phase: recovery')
+    tc_mod.set_lid_temperature(40)
+
+    if not second_plate:
+        tc_mod.set_block_temperature (37, hold_time_minutes=60, block_max_volume=200)
+
+        # pipette cell suspension onto the agar plates
+        protocol.comment('Phase: plating')
+        tc_mod.open_lid ()
+        tc_mod.deactivate_lid()
+        plate_out ({8: p20multi}, plating_plan (plan, tc_plate, agar_plates, spot_offsets, spot_distance), spot_volume, excess_volume)
+    else:
+        # plate B gets its DNA and is kept on ice on the deck while plate A recovers, requested such that its time on ice ends
+        # when it is in the cold block after the exchange
+        rounds = plating_rounds (plan, len (agar_plates), len (agar_plates [0].columns ()) * len (spot_offsets))
+        recovery = start_hold (protocol, tc_mod, 37, 60, 200)
+        await_hold (protocol, recovery - 60 * (plate_b_transfer + plate_b_ice - plate_b_exchange))
+        protocol.comment('Phase: plate B DNA transfer')
+        protocol.pause ('Please place the DNA plate for plate B into slot 4 and the PCR plate containing 20 µl competent cells per well for plate B onto the cooling carrier with ice in slot 5. Make sure that cells and DNA are thawed.')
+        p20multi.transfer (2, [dna_plate_b [step ['well']] for step in plan], [cells_b [step ['well']] for step in plan], mix_after = (5, 20), new_tip = 'always', blow_out = True, blowout_location='destination well')
+        ice = time.monotonic () + 60 * plate_b_ice
+        protocol.comment('Phase: recovery')
+        await_hold (protocol, recovery)
+
+        # exchange the plates: plate A leaves the block at 37 °C for slot 4 before the block cools down for plate B,
+        # and the lid cools down, so that plate B gets the heat shock of a single plate
+        protocol.comment('Phase: plate exchange')
+        tc_mod.open_lid ()
+        tc_mod.deactivate_lid ()
+        exchange ('Please move plate A from the thermocycler block to slot 4 (remove the DNA plate).',
+                  soc_pickups = len (plan), plating_pickups = len (rounds [0]))
+        tc_mod.set_block_temperature (0, block_max_volume=22)
+        protocol.pause ('Please move plate B from the cooling carrier into the thermocycler block.')
+        p300multi.pick_up_tip ()
+        tc_mod.close_lid ()
+
+        # plate B stays on ice (in the cold block) until its time on ice is over, also if the loading took longer than planned
+        await_hold (protocol, ice)
+        protocol.comment('Phase: plate B heat shock')
+        heat_shock (reservoir.wells_by_name()['A2'])
+        protocol.comment('Phase: plate B SOC addition')
+        add_soc (reservoir.wells_by_name()['A2'], 'B')
+        tc_mod.close_lid ()
+        recovery = start_hold (protocol, tc_mod, 37, 60, 200)
+
+        # plate A is plated out on the deck while plate B recovers
+        protocol.comment('Phase: plate A plating')
+        plate_rounds (dna_plate_b, 'A', rounds, False)
+        protocol.comment('Phase: plate B recovery')
+        await_hold (protocol, recovery)
+        protocol.comment('Phase: plate B plating')
+        tc_mod.open_lid ()
+        tc_mod.deactivate_lid()
+        plate_rounds (tc_plate, 'B', rounds, True)
+'''},
+    {
+        'label': 'additional plating',
+        'message': 'Replace the agar plates with fresh ones.',
+        'name': 'distributing_cells_on_agar_plates',
+        'tips': {'right': 12},
+        'source': '''import csv
+import io
+import json
+
+from opentrons import protocol_api, types
+
+metadata= {
+    'protocolName':'distributing_cells_on_agar_plates',
+    'author':'Carolin Müller, Vera Waffenschnmidt',
+    'description' : 'Protocol for distribution of cell suspension to agar plates using the Opentrons OT-2 with Thermocycler Module, e.g., to have more agar plates after E. coli heat-shock transformation. Important note: All agar plates must have a uniform filling level. When teaching, the pipette tip must reach into the agar so that the cell suspension is dispensed onto the agar plate.',
+    'apiLevel':'2.1'}
+
+# sample manifest, keep identical in all protocols that read a manifest
+# A manifest is CSV text with a header line or a JSON list of objects with one entry per sample:
+# 'well' (well of the sample plate, 'A1:H3' stands for all wells from A1 to H3), 'sample' (name, optional),
+# 'mix' (reaction mix, optional) and 'replicates' (optional, 1 if not given).
+def expand_wells (text):
+    text = text.strip ().upper ()
+    if ':' not in text:
+        return [text]
+    first, last = text.split (':')
+    letters = 'ABCDEFGH'
+    rows = letters [letters.index (first [0]):letters.index (last [0]) + 1]
+    return [row + str (column) for column in range (int (first [1:]), int (last [1:]) + 1) for row in rows]
+
+def read_manifest (text, path = None):
+    # a manifest file given by path replaces the text
+    if path is not None:
+        with open (path, encoding = 'utf-8') as f:
+            text = f.read ()
+    text = text.strip ()
+    rows = json.loads (text) if text.startswith ('[') else list (csv.DictReader (io.StringIO (text)))
+    samples = {}
+    for row in rows:
+        for well in expand_wells (str (row ['well'])):
+            if well in samples:
+                raise ValueError ('Well {} is listed twice in the manifest'.format (well))
+            samples [well] = {'well': well,
+                              'sample': row.get ('sample') or well,
+                              'mix': str (row.get ('mix') or '').strip () or None,
+                              'replicates': int (row.get ('replicates') or 1)}
+    if not samples:
+        raise ValueError ('The manifest lists no samples')
+    return list (samples.values ())
+
+def transfer_plan (samples, single_channel = True):
+    # samples are processed column by column, empty columns are skipped
+    # a full column with one reaction mix is a single multichannel transfer from row A, the samples of partial columns
+    # are transferred one by one with a single-channel pipette or, without one, together as a whole column
+    columns = {}
+    for sample in samples:
+        columns.setdefault (int (sample ['well'] [1:]), []).append (sample)
+    plan = []
+    for column in sorted (columns):
+        members = sorted (columns [column], key = lambda sample: sample ['well'] [0])
+        mixes = set (sample ['mix'] for sample in members)
+        replicates = max (sample ['replicates'] for sample in members)
+        if len (mixes) == 1 and (len (members) == 8 or not single_channel):
+            plan.append ({'column': str (column), 'well': 'A' + str (column), 'channels': 8, 'mix': members [0] ['mix'], 'replicates': replicates})
+        elif single_channel:
+            for sample in members:
+                plan.append ({'column': str (column), 'well': sample ['well'], 'channels': 1, 'mix': sample ['mix'], 'replicates': replicates})
+        else:
+            raise ValueError ('Column {} contains different reaction mixes, which needs a single-channel pipette'.format (column))
+    return plan
+
+def describe_plan (samples, plan):
+    multi = sum (1 for step in plan if step ['channels'] > 1)
+    return 'Manifest: {} samples in {} columns, {} multichannel and {} single-channel transfers per step'.format (
+        len (samples), len (set (step ['column'] for step in plan)), multi, len (plan) - multi)
+
+# plating engine, keep identical in distributing_cells_on_agar_plates.py and heat-shock_transformation.py
+# It spots the steps of a manifest transfer plan (see transfer_plan): every column of samples gets as many neighbouring spot columns
+# as its replicates, agar plates are filled one after the other and a column of samples is never split over two agar plates.
+# Every agar well can take several spots at fixed offsets from its centre (offset grids of 96 spots), the spot columns of a plate
+# are then its columns times the offsets, and the replicates of a sample go around the same well first.
+def spot_layout (plan, spot_columns = 12):
+    # agar plate index and first spot column of every column of samples
+    layout = {}
+    plate, free = 0, 0
+    for step in plan:
+        if step ['column'] in layout:
+            continue
+        if step ['replicates'] > spot_columns:
+            raise ValueError ('{} replicate spots do not fit on one agar plate'.format (step ['replicates']))
+        if free + step ['replicates'] > spot_columns:
+            plate, free = plate + 1, 0
+        layout [step ['column']] = (plate, free)
+        free += step ['replicates']
+    return layout
+
+def agar_plates_needed (plan, spot_columns = 12):
+    return max (plate for plate, first in spot_layout (plan, spot_columns).values ()) + 1
+
+def check_spot_offsets (offsets, pitch, distance):
+    # spots must keep distance mm apart, from the other spots of their well and from the spots of the neighbouring wells
+    for k, (x, y) in enumerate (offsets):
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                for m, (u, v) in enumerate (offsets):
+                    if (i, j, m) != (0, 0, k) and ((u + i * pitch - x) ** 2 + (v + j * pitch - y) ** 2) ** 0.5 < distance:
+                        raise ValueError ('Spots at {} and {} mm from the well centres are closer than {} mm'.format ((x, y), (u + i * pitch, v + j * pitch), distance))
+
+def spot_location (well, offset):
+    # spots in the well centre use the default dispense height, offset spots are dispensed 1 mm above the agar surface as well
+    if tuple (offset) == (0, 0):
+        return well
+    return well.bottom (1).move (types.Point (x = offset [0], y = offset [1]))
+
+def plating_plan (plan, source_plate, agar_plates, offsets = ((0, 0),), distance = 0):
+    # every sample is spotted in its own row, multichannel steps start in row A
+    pitch = agar_plates [0] ['A2'].top ().point.x - agar_plates [0] ['A1'].top ().point.x
+    check_spot_offsets (offsets, pitch, distance)
+    layout = spot_layout (plan, len (agar_plates [0].columns ()) * len (offsets))
+    spotting = []
+    for step in plan:
+        plate, first = layout [step ['column']]
+        if plate >= len (agar_plates):
+            raise ValueError ('The samples need more than {} agar plates'.format (len (agar_plates)))
+        row = 'ABCDEFGH'.index (step ['well'] [0])
+        spots = [divmod (first + k, len (offsets)) for k in range (step ['replicates'])]
+        spotting.append ((step ['channels'], source_plate [step ['well']], [spot_location (agar_plates [plate].columns () [column] [row], offsets [grid]) for column, grid in spots]))
+    return spotting
+
+def plate_out (pipettes, spotting, spot_volume, excess_volume):
+    # one aspiration fills as many spots as fit into the tip, the excess volume stays in the tip so that no air is dispensed onto the agar
+    for channels, source, spots in spotting:
+        pipette = pipettes [channels]
+        spots_per_aspiration = int ((pipette.max_volume - excess_volume) // spot_volume)
+        if spots_per_aspiration < 1:
+            raise ValueError ('{} µl spots plus {} µl excess do not fit into the tip'.format (spot_volume, excess_volume))
+        pipette.pick_up_tip ()
+        for k in range (0, len (spots), spots_per_aspiration):
+            batch = spots [k:k + spots_per_aspiration]
+            pipette.aspirate (spot_volume * len (batch) + (excess_volume if k == 0 else 0), source)
+            for spot in batch:
+                pipette.dispense (spot_volume, spot)
+        pipette.drop_tip ()
+
+def run(protocol: protocol_api.ProtocolContext):
+
+    # load module
+    tc_mod = protocol.load_module ('Thermocycler Module')
+
+    # load labware, adjust if necessary
+    tc_plate = tc_mod.load_labware ('biorad_96_wellplate_200ul_pcr')    # plate containing cell suspension
+    tiprack_20 = protocol.load_labware ('vwr_96_tiprack_10ul_short', '6')
+
+    # samples in the plate with cell suspension, CSV or JSON (see read_manifest), adjust if necessary
+    # "replicates" is the number of spots per sample, samples of the same column get the same number of spots
+    manifest = """
+well,replicates
+A1:H12,4
+"""
+    manifest_file = None        # path of a manifest file on the robot, e.g. '/data/user_storage/manifest.csv', replaces the manifest above
+    single_channel = None       # e.g. 'p20_single_gen2' on the left mount for samples in partial columns, None processes partial columns with the multichannel pipette
+
+    # define spotting, adjust if necessary
+    spot_volume = 8             # µl per spot
+    excess_volume = 1           # µl remaining in the tip
+    agar_slots = ['1', '2', '5', '4']   # agar plates are filled in this order, only as many plates as needed are used
+    spot_offsets = [(0, 0)]     # mm from the well centre (x to the right, y to the back) of the spots per agar well, e.g. four offset
+                                # 96-spot grids [(-2.25, 2.25), (2.25, 2.25), (-2.25, -2.25), (2.25, -2.25)] take four times the spots of a plate
+    spot_distance = 4           # mm, the least distance between the centres of two spots
+
+    # load pipette
+    p20multi = protocol.load_instrument ('p20_multi_gen2', 'right', tip_racks = [tiprack_20])
+    p20single = protocol.load_instrument (single_channel, 'left', tip_racks = [tiprack_20]) if single_channel else None
+    pipettes = {8: p20multi, 1: p20single}
+
+    # compile the manifest into one plating step per full column and per sample of a partial column
+    samples = read_manifest (manifest, manifest_file)
+    plan = transfer_plan (samples, single_channel = p20single is not None)
+    protocol.comment (describe_plan (samples, plan))
+
+    # load agar plates
+    agar_plates = [protocol.load_labware ('agarplate_96_wellplate_5ul', slot) for slot in agar_slots [:agar_plates_needed (plan, 12 * len (spot_offsets))]]
+    
+    # Load plate with cells
+    protocol.comment('Phase: plate loading')
+    tc_mod.open_lid ()
+    tc_mod.set_block_temperature (37) # adjust, if necessary
+    protocol.pause ('Please load PCR plate containing samples for plating out into the thermocycler block')
+
+    # pipette cell suspension onto the agar plates  
+    protocol.comment('Phase: plating')
+    plate_out (pipettes, plating_plan (plan, tc_plate, agar_plates, spot_offsets, spot_distance), spot_volume, excess_volume)
+'''}
+]
+
+
+def run(protocol: protocol_api.ProtocolContext):
+    run_stages(protocol, STAGES)
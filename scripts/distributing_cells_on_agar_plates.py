@@ -1,4 +1,8 @@
-from opentrons import protocol_api
+import csv
+import io
+import json
+
+from opentrons import protocol_api, types
 
 metadata= {
     'protocolName':'distributing_cells_on_agar_plates',
@@ -6,6 +10,133 @@ metadata= {
     'description' : 'Protocol for distribution of cell suspension to agar plates using the Opentrons OT-2 with Thermocycler Module, e.g., to have more agar plates after E. coli heat-shock transformation. Important note: All agar plates must have a uniform filling level. When teaching, the pipette tip must reach into the agar so that the cell suspension is dispensed onto the agar plate.',
     'apiLevel':'2.1'}
 
+# sample manifest, keep identical in all protocols that read a manifest
+# A manifest is CSV text with a header line or a JSON list of objects with one entry per sample:
+# 'well' (well of the sample plate, 'A1:H3' stands for all wells from A1 to H3), 'sample' (name, optional),
+# 'mix' (reaction mix, optional) and 'replicates' (optional, 1 if not given).
+def expand_wells (text):
+    text = text.strip ().upper ()
+    if ':' not in text:
+        return [text]
+    first, last = text.split (':')
+    letters = 'ABCDEFGH'
+    rows = letters [letters.index (first [0]):letters.index (last [0]) + 1]
+    return [row + str (column) for column in range (int (first [1:]), int (last [1:]) + 1) for row in rows]
+
+def read_manifest (text, path = None):
+    # a manifest file given by path replaces the text
+    if path is not None:
+        with open (path, encoding = 'utf-8') as f:
+            text = f.read ()
+    text = text.strip ()
+    rows = json.loads (text) if text.startswith ('[') else list (csv.DictReader (io.StringIO (text)))
+    samples = {}
+    for row in rows:
+        for well in expand_wells (str (row ['well'])):
+            if well in samples:
+                raise ValueError ('Well {} is listed twice in the manifest'.format (well))
+            samples [well] = {'well': well,
+                              'sample': row.get ('sample') or well,
+                              'mix': str (row.get ('mix') or '').strip () or None,
+                              'replicates': int (row.get ('replicates') or 1)}
+    if not samples:
+        raise ValueError ('The manifest lists no samples')
+    return list (samples.values ())
+
+def transfer_plan (samples, single_channel = True):
+    # samples are processed column by column, empty columns are skipped
+    # a full column with one reaction mix is a single multichannel transfer from row A, the samples of partial columns
+    # are transferred one by one with a single-channel pipette or, without one, together as a whole column
+    columns = {}
+    for sample in samples:
+        columns.setdefault (int (sample ['well'] [1:]), []).append (sample)
+    plan = []
+    for column in sorted (columns):
+        members = sorted (columns [column], key = lambda sample: sample ['well'] [0])
+        mixes = set (sample ['mix'] for sample in members)
+        replicates = max (sample ['replicates'] for sample in members)
+        if len (mixes) == 1 and (len (members) == 8 or not single_channel):
+            plan.append ({'column': str (column), 'well': 'A' + str (column), 'channels': 8, 'mix': members [0] ['mix'], 'replicates': replicates})
+        elif single_channel:
+            for sample in members:
+                plan.append ({'column': str (column), 'well': sample ['well'], 'channels': 1, 'mix': sample ['mix'], 'replicates': replicates})
+        else:
+            raise ValueError ('Column {} contains different reaction mixes, which needs a single-channel pipette'.format (column))
+    return plan
+
+def describe_plan (samples, plan):
+    multi = sum (1 for step in plan if step ['channels'] > 1)
+    return 'Manifest: {} samples in {} columns, {} multichannel and {} single-channel transfers per step'.format (
+        len (samples), len (set (step ['column'] for step in plan)), multi, len (plan) - multi)
+
+# plating engine, keep identical in distributing_cells_on_agar_plates.py and heat-shock_transformation.py
+# It spots the steps of a manifest transfer plan (see transfer_plan): every column of samples gets as many neighbouring spot columns
+# as its replicates, agar plates are filled one after the other and a column of samples is never split over two agar plates.
+# Every agar well can take several spots at fixed offsets from its centre (offset grids of 96 spots), the spot columns of a plate
+# are then its columns times the offsets, and the replicates of a sample go around the same well first.
+def spot_layout (plan, spot_columns = 12):
+    # agar plate index and first spot column of every column of samples
+    layout = {}
+    plate, free = 0, 0
+    for step in plan:
+        if step ['column'] in layout:
+            continue
+        if step ['replicates'] > spot_columns:
+            raise ValueError ('{} replicate spots do not fit on one agar plate'.format (step ['replicates']))
+        if free + step ['replicates'] > spot_columns:
+            plate, free = plate + 1, 0
+        layout [step ['column']] = (plate, free)
+        free += step ['replicates']
+    return layout
+
+def agar_plates_needed (plan, spot_columns = 12):
+    return max (plate for plate, first in spot_layout (plan, spot_columns).values ()) + 1
+
+def check_spot_offsets (offsets, pitch, distance):
+    # spots must keep distance mm apart, from the other spots of their well and from the spots of the neighbouring wells
+    for k, (x, y) in enumerate (offsets):
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                for m, (u, v) in enumerate (offsets):
+                    if (i, j, m) != (0, 0, k) and ((u + i * pitch - x) ** 2 + (v + j * pitch - y) ** 2) ** 0.5 < distance:
+                        raise ValueError ('Spots at {} and {} mm from the well centres are closer than {} mm'.format ((x, y), (u + i * pitch, v + j * pitch), distance))
+
+def spot_location (well, offset):
+    # spots in the well centre use the default dispense height, offset spots are dispensed 1 mm above the agar surface as well
+    if tuple (offset) == (0, 0):
+        return well
+    return well.bottom (1).move (types.Point (x = offset [0], y = offset [1]))
+
+def plating_plan (plan, source_plate, agar_plates, offsets = ((0, 0),), distance = 0):
+    # every sample is spotted in its own row, multichannel steps start in row A
+    pitch = agar_plates [0] ['A2'].top ().point.x - agar_plates [0] ['A1'].top ().point.x
+    check_spot_offsets (offsets, pitch, distance)
+    layout = spot_layout (plan, len (agar_plates [0].columns ()) * len (offsets))
+    spotting = []
+    for step in plan:
+        plate, first = layout [step ['column']]
+        if plate >= len (agar_plates):
+            raise ValueError ('The samples need more than {} agar plates'.format (len (agar_plates)))
+        row = 'ABCDEFGH'.index (step ['well'] [0])
+        spots = [divmod (first + k, len (offsets)) for k in range (step ['replicates'])]
+        spotting.append ((step ['channels'], source_plate [step ['well']], [spot_location (agar_plates [plate].columns () [column] [row], offsets [grid]) for column, grid in spots]))
+    return spotting
+
+def plate_out (pipettes, spotting, spot_volume, excess_volume):
+    # one aspiration fills as many spots as fit into the tip, the excess volume stays in the tip so that no air is dispensed onto the agar
+    for channels, source, spots in spotting:
+        pipette = pipettes [channels]
+        spots_per_aspiration = int ((pipette.max_volume - excess_volume) // spot_volume)
+        if spots_per_aspiration < 1:
+            raise ValueError ('{} µl spots plus {} µl excess do not fit into the tip'.format (spot_volume, excess_volume))
+        pipette.pick_up_tip ()
+        for k in range (0, len (spots), spots_per_aspiration):
+            batch = spots [k:k + spots_per_aspiration]
+            pipette.aspirate (spot_volume * len (batch) + (excess_volume if k == 0 else 0), source)
+            for spot in batch:
+                pipette.dispense (spot_volume, spot)
+        pipette.drop_tip ()
+
 def run(protocol: protocol_api.ProtocolContext):
 
     # load module
@@ -14,54 +145,43 @@ def run(protocol: protocol_api.ProtocolContext):
     # load labware, adjust if necessary
     tc_plate = tc_mod.load_labware ('biorad_96_wellplate_200ul_pcr')    # plate containing cell suspension
     tiprack_20 = protocol.load_labware ('vwr_96_tiprack_10ul_short', '6')
-    agarplate_1 = protocol.load_labware ('agarplate_96_wellplate_5ul', '1') # for every 3 columns of samples in the "tc_plate" one agar plate is needed
-    agarplate_2 = protocol.load_labware ('agarplate_96_wellplate_5ul', '2')
-    agarplate_3 = protocol.load_labware ('agarplate_96_wellplate_5ul', '5')
-    agarplate_4 = protocol.load_labware ('agarplate_96_wellplate_5ul', '4')
+
+    # samples in the plate with cell suspension, CSV or JSON (see read_manifest), adjust if necessary
+    # "replicates" is the number of spots per sample, samples of the same column get the same number of spots
+    manifest = """
+well,replicates
+A1:H12,4
+"""
+    manifest_file = None        # path of a manifest file on the robot, e.g. '/data/user_storage/manifest.csv', replaces the manifest above
+    single_channel = None       # e.g. 'p20_single_gen2' on the left mount for samples in partial columns, None processes partial columns with the multichannel pipette
+
+    # define spotting, adjust if necessary
+    spot_volume = 8             # µl per spot
+    excess_volume = 1           # µl remaining in the tip
+    agar_slots = ['1', '2', '5', '4']   # agar plates are filled in this order, only as many plates as needed are used
+    spot_offsets = [(0, 0)]     # mm from the well centre (x to the right, y to the back) of the spots per agar well, e.g. four offset
+                                # 96-spot grids [(-2.25, 2.25), (2.25, 2.25), (-2.25, -2.25), (2.25, -2.25)] take four times the spots of a plate
+    spot_distance = 4           # mm, the least distance between the centres of two spots
 
     # load pipette
     p20multi = protocol.load_instrument ('p20_multi_gen2', 'right', tip_racks = [tiprack_20])
+    p20single = protocol.load_instrument (single_channel, 'left', tip_racks = [tiprack_20]) if single_channel else None
+    pipettes = {8: p20multi, 1: p20single}
+
+    # compile the manifest into one plating step per full column and per sample of a partial column
+    samples = read_manifest (manifest, manifest_file)
+    plan = transfer_plan (samples, single_channel = p20single is not None)
+    protocol.comment (describe_plan (samples, plan))
 
-    # define columns with used wells (only complete columns possible)
-    well_list = ['A1', 'A2', 'A3', 'A4', 'A5', 'A6','A7', 'A8', 'A9', 'A10', 'A11', 'A12'] # change list to include all columns with samples.
+    # load agar plates
+    agar_plates = [protocol.load_labware ('agarplate_96_wellplate_5ul', slot) for slot in agar_slots [:agar_plates_needed (plan, 12 * len (spot_offsets))]]
     
     # Load plate with cells
+    protocol.comment('Phase: plate loading')
     tc_mod.open_lid ()
     tc_mod.set_block_temperature (37) # adjust, if necessary
     protocol.pause ('Please load PCR plate containing samples for plating out into the thermocycler block')
 
     # pipette cell suspension onto the agar plates  
-    spot_list = ['A1', 'A2', 'A3', 'A4', 'A5', 'A6','A7', 'A8', 'A9', 'A10', 'A11', 'A12'] # do not change!
-    i = 0
-    while i < len(well_list):
-        p20multi.pick_up_tip()  
-        if i <= 2:
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_1 [spot_list [i * 4]])
-            p20multi.dispense (8, agarplate_1 [spot_list [i * 4 + 1]])
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_1 [spot_list [i * 4 + 2]])
-            p20multi.dispense (8, agarplate_1 [spot_list [i * 4 + 3]])
-        if i > 2 and i <= 5:
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_2 [spot_list [(i - 3) * 4]])
-            p20multi.dispense (8, agarplate_2 [spot_list [(i - 3) * 4 + 1]])
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_2 [spot_list [(i - 3) * 4 + 2]])
-            p20multi.dispense (8, agarplate_2 [spot_list [(i - 3) * 4 + 3]])
-        if i > 5 and i <= 8:
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_3 [spot_list [(i - 6) * 4 ]])
-            p20multi.dispense (8, agarplate_3 [spot_list [(i - 6) * 4 + 1]])
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_3 [spot_list [(i - 6) * 4 + 2]])
-            p20multi.dispense (8, agarplate_3 [spot_list [(i - 6) * 4 + 3]])
-        if i > 8 and i <= 11:
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_4 [spot_list [(i - 9) * 4]])
-            p20multi.dispense (8, agarplate_4 [spot_list [(i - 9) * 4 + 1]])
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_4 [spot_list [(i - 9) * 4 + 2]])
-            p20multi.dispense (8, agarplate_4 [spot_list [(i - 9) * 4 + 3]])
-        p20multi.drop_tip()
-        i= i + 1
\ No newline at end of file
+    protocol.comment('Phase: plating')
+    plate_out (pipettes, plating_plan (plan, tc_plate, agar_plates, spot_offsets, spot_distance), spot_volume, excess_volume)
@@ -6,6 +6,127 @@ metadata = {
     'description': 'Protocol for Golden Gate assembly using the Opentrons OT-2 with Thermocycler Module.',
     'apiLevel': '2.2'}
 
+# ramp rates of the Thermocycler Module used for time estimates (same values as in autoclone/estimate.py)
+BLOCK_HEATING = 4.4     # °C/s
+BLOCK_COOLING = 2.2     # °C/s
+BLOCK_SETTLE = 5.0      # s until the block is within tolerance of the target
+LID_HEATING = 0.35      # °C/s
+LID_COOLING = 0.1       # °C/s
+AMBIENT = 23.0          # °C
+
+def block_ramp(start, end):
+    if start is None:
+        start = AMBIENT
+    if start == end:
+        return 0.0
+    return abs(end - start) / (BLOCK_HEATING if end > start else BLOCK_COOLING) + BLOCK_SETTLE
+
+def lid_ramp(start, end):
+    if start is None:
+        start = AMBIENT
+    return abs(end - start) / (LID_HEATING if end > start else LID_COOLING)
+
+def hold_seconds(step):
+    return step.get('hold_time_seconds', 0) + 60 * step.get('hold_time_minutes', 0)
+
+def format_time(seconds):
+    seconds = int(round(seconds))
+    return '{}:{:02d}:{:02d}'.format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+# Thermocycler profile compiler
+# A program is a list of segments, either a hold ('temperature', 'hold_time_minutes'/'hold_time_seconds') or a cycle ('profile', 'repetitions').
+# Every segment may set 'lid_temperature' (None switches the lid heating off) and a 'phase' name for the run log.
+# The compiler merges holds at the same temperature, moves lid temperature changes into the preceding hold where the lid ramp fits
+# and returns the lid and block temperature to set after the plate is loaded together with a list of operations and their estimated durations.
+def compile_program(program):
+    segments = []
+    for segment in program:
+        segment = dict(segment)
+        if 'profile' in segment:
+            steps = []
+            for step in segment['profile']:
+                if steps and steps[-1]['temperature'] == step['temperature']:
+                    steps[-1]['hold'] += hold_seconds(step)
+                else:
+                    steps.append({'temperature': step['temperature'], 'hold': hold_seconds(step)})
+            segment['profile'] = steps
+        else:
+            segment['hold'] = hold_seconds(segment)
+            previous = segments[-1] if segments else None
+            if (previous is not None and 'profile' not in previous and previous['temperature'] == segment['temperature']
+                    and segment.get('lid_temperature', previous.get('lid_temperature')) == previous.get('lid_temperature')):
+                previous['hold'] += segment['hold']
+                continue
+        segments.append(segment)
+
+    first = segments[0]
+    lid = first.get('lid_temperature')
+    block = first['profile'][0]['temperature'] if 'profile' in first else first['temperature']
+    preparation = {'lid_temperature': lid, 'block_temperature': block}
+    operations = []
+    for segment in segments:
+        phase = segment.get('phase')
+        if 'lid_temperature' in segment and segment['lid_temperature'] != lid:
+            target = segment['lid_temperature']
+            seconds = lid_ramp(lid, target) if target is not None else 0.0
+            previous = operations[-1] if operations else None
+            if target is not None and previous is not None and previous['operation'] == 'hold' and previous['hold'] >= seconds:
+                # heat or cool the lid while the block is still holding the previous temperature
+                previous['hold'] -= seconds
+                operations.insert(len(operations) - 1, {'operation': 'lid', 'temperature': target, 'seconds': seconds, 'phase': previous['phase']})
+                previous['seconds'] -= seconds
+            else:
+                operations.append({'operation': 'lid', 'temperature': target, 'seconds': seconds, 'phase': phase})
+            lid = target
+        if 'profile' in segment:
+            seconds = 0.0
+            for _ in range(segment['repetitions']):
+                for step in segment['profile']:
+                    seconds += block_ramp(block, step['temperature']) + step['hold']
+                    block = step['temperature']
+            operations.append({'operation': 'profile', 'steps': segment['profile'], 'repetitions': segment['repetitions'], 'seconds': seconds, 'phase': phase})
+        else:
+            ramp = block_ramp(block, segment['temperature'])
+            block = segment['temperature']
+            if segment['hold']:
+                # reach the temperature first, so that a lid change can be scheduled into the hold
+                operations.append({'operation': 'hold', 'temperature': block, 'hold': 0, 'seconds': ramp, 'phase': phase})
+                operations.append({'operation': 'hold', 'temperature': block, 'hold': segment['hold'], 'seconds': segment['hold'], 'phase': phase})
+            else:
+                operations.append({'operation': 'hold', 'temperature': block, 'hold': 0, 'seconds': ramp, 'phase': phase})
+    return preparation, operations
+
+def describe(operation):
+    if operation['operation'] == 'lid':
+        if operation['temperature'] is None:
+            return 'lid heating off'
+        return 'lid to {} °C'.format(operation['temperature'])
+    if operation['operation'] == 'profile':
+        steps = ', '.join('{} °C {}'.format(step['temperature'], format_time(step['hold'])) for step in operation['steps'])
+        return '{} x ({})'.format(operation['repetitions'], steps)
+    if operation['hold']:
+        return 'hold {} °C for {}'.format(operation['temperature'], format_time(operation['hold']))
+    return 'block to {} °C'.format(operation['temperature'])
+
+def run_program(protocol, tc_mod, operations, block_max_volume):
+    phase = None
+    for operation in operations:
+        if operation['phase'] is not None and operation['phase'] != phase:
+            phase = operation['phase']
+            protocol.comment('Phase: ' + phase)
+        if operation['operation'] == 'lid':
+            if operation['temperature'] is None:
+                tc_mod.deactivate_lid()
+            else:
+                tc_mod.set_lid_temperature(operation['temperature'])
+        elif operation['operation'] == 'profile':
+            profile = [{'temperature': step['temperature'], 'hold_time_seconds': step['hold']} for step in operation['steps']]
+            tc_mod.execute_profile(steps=profile, repetitions=operation['repetitions'], block_max_volume=block_max_volume)
+        elif operation['hold']:
+            tc_mod.set_block_temperature(operation['temperature'], hold_time_seconds=operation['hold'], block_max_volume=block_max_volume)
+        else:
+            tc_mod.set_block_temperature(operation['temperature'], block_max_volume=block_max_volume)
+
 def run(protocol: protocol_api.ProtocolContext):
     
     # load module
@@ -17,25 +138,27 @@ def run(protocol: protocol_api.ProtocolContext):
     # maximum volume of wells 
     Vmax = 20
 
-    tc_mod.set_lid_temperature(40)
+    # temperature program for Golden Gate assembly, adjust if necessary
+    program = [
+        {'profile': [
+            {'temperature': 37, 'hold_time_minutes': 1},
+            {'temperature': 16, 'hold_time_minutes': 5}],
+         'repetitions': 30, 'lid_temperature': 40, 'phase': 'cycling'},
+        {'temperature': 37, 'hold_time_minutes': 10, 'phase': 'cycling'},
+        {'temperature': 80, 'hold_time_minutes': 20, 'lid_temperature': 85, 'phase': 'inactivation'},   # enzyme inactivation, adjust if necessary
+        {'temperature': 0, 'lid_temperature': None, 'phase': 'hold'}]                                   # hold temperature until plate is removed
+
+    preparation, operations = compile_program(program)
+    for operation in operations:
+        protocol.comment('{}: {} (estimated {})'.format(operation['phase'], describe(operation), format_time(operation['seconds'])))
+    protocol.comment('Estimated time after loading the plate: {}'.format(format_time(sum(operation['seconds'] for operation in operations))))
+
+    # the plate is loaded first, set_lid_temperature and set_block_temperature wait until the temperature is reached
+    protocol.comment('Phase: plate loading')
     tc_mod.open_lid()
     protocol.pause('Insert PCR plate into thermocycler. Proceed, if done')
     tc_mod.close_lid()
+    tc_mod.set_lid_temperature(preparation['lid_temperature'])
+    tc_mod.set_block_temperature(preparation['block_temperature'], block_max_volume=Vmax)
 
-    # temperature profile for Golden Gate assembly, adjust if necessary
-    profile = [
-        {'temperature': 37, 'hold_time_minutes': 1},
-        {'temperature': 16, 'hold_time_minutes': 5}]
-    
-    tc_mod.execute_profile(steps=profile, repetitions=30, block_max_volume=Vmax) 
-    tc_mod.set_block_temperature(37, hold_time_minutes=10, block_max_volume=Vmax)
-    
-    # enzyme inactivation, adjust if necessary
-    tc_mod.set_lid_temperature(85)    
-    tc_mod.set_block_temperature(80, hold_time_minutes=20, block_max_volume=Vmax) 
-    
-    # hold temperature until plate is removed
-    tc_mod.deactivate_lid()
-    tc_mod.set_block_temperature(0) 
-    
-    
+    run_program(protocol, tc_mod, operations, Vmax)
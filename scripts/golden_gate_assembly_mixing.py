@@ -1,11 +1,125 @@
+import csv
+import io
+import json
+
 from opentrons import protocol_api
 
 metadata = {
     'protocolName': 'golden_gate_assembly_mixing',
     'author': 'Carolin Müller, Vera Waffenschmidt',
-    'description': 'Protocol for mixing plasmid DNA and reaction mix before Golden Gate assembly using the Opentrons OT-2 with Thermocycler Module.',
+    'description': 'Protocol for mixing plasmid DNA and reaction mix before Golden Gate assembly using the Opentrons OT-2 with Thermocycler Module. The reaction mix is pipetted first and the DNA is added to it and mixed (earlier versions added the DNA first).',
     'apiLevel': '2.8'}
 
+# sample manifest, keep identical in all protocols that read a manifest
+# A manifest is CSV text with a header line or a JSON list of objects with one entry per sample:
+# 'well' (well of the sample plate, 'A1:H3' stands for all wells from A1 to H3), 'sample' (name, optional),
+# 'mix' (reaction mix, optional) and 'replicates' (optional, 1 if not given).
+def expand_wells (text):
+    text = text.strip ().upper ()
+    if ':' not in text:
+        return [text]
+    first, last = text.split (':')
+    letters = 'ABCDEFGH'
+    rows = letters [letters.index (first [0]):letters.index (last [0]) + 1]
+    return [row + str (column) for column in range (int (first [1:]), int (last [1:]) + 1) for row in rows]
+
+def read_manifest (text, path = None):
+    # a manifest file given by path replaces the text
+    if path is not None:
+        with open (path, encoding = 'utf-8') as f:
+            text = f.read ()
+    text = text.strip ()
+    rows = json.loads (text) if text.startswith ('[') else list (csv.DictReader (io.StringIO (text)))
+    samples = {}
+    for row in rows:
+        for well in expand_wells (str (row ['well'])):
+            if well in samples:
+                raise ValueError ('Well {} is listed twice in the manifest'.format (well))
+            samples [well] = {'well': well,
+                              'sample': row.get ('sample') or well,
+                              'mix': str (row.get ('mix') or '').strip () or None,
+                              'replicates': int (row.get ('replicates') or 1)}
+    if not samples:
+        raise ValueError ('The manifest lists no samples')
+    return list (samples.values ())
+
+def transfer_plan (samples, single_channel = True):
+    # samples are processed column by column, empty columns are skipped
+    # a full column with one reaction mix is a single multichannel transfer from row A, the samples of partial columns
+    # are transferred one by one with a single-channel pipette or, without one, together as a whole column
+    columns = {}
+    for sample in samples:
+        columns.setdefault (int (sample ['well'] [1:]), []).append (sample)
+    plan = []
+    for column in sorted (columns):
+        members = sorted (columns [column], key = lambda sample: sample ['well'] [0])
+        mixes = set (sample ['mix'] for sample in members)
+        replicates = max (sample ['replicates'] for sample in members)
+        if len (mixes) == 1 and (len (members) == 8 or not single_channel):
+            plan.append ({'column': str (column), 'well': 'A' + str (column), 'channels': 8, 'mix': members [0] ['mix'], 'replicates': replicates})
+        elif single_channel:
+            for sample in members:
+                plan.append ({'column': str (column), 'well': sample ['well'], 'channels': 1, 'mix': sample ['mix'], 'replicates': replicates})
+        else:
+            raise ValueError ('Column {} contains different reaction mixes, which needs a single-channel pipette'.format (column))
+    return plan
+
+def describe_plan (samples, plan):
+    multi = sum (1 for step in plan if step ['channels'] > 1)
+    return 'Manifest: {} samples in {} columns, {} multichannel and {} single-channel transfers per step'.format (
+        len (samples), len (set (step ['column'] for step in plan)), multi, len (plan) - multi)
+
+# reagent dispensing, keep identical in all protocols that dispense reagents
+# A reagent for wells that are still empty is dispensed with one tip: every aspiration takes up the reagent for as many wells as fit into the tip
+# together with a disposal volume and an air gap, the air gap is drawn again before every dispense so that nothing drips on the way, and the
+# disposal volume is blown out back into the source after the last well of an aspiration. The caller picks up and drops the tip.
+# prepare (optional) is called before every aspiration, e.g. to resuspend beads.
+def multi_dispense (pipette, volume, source, wells, disposal_volume, air_gap, prepare = None):
+    per_aspiration = int ((pipette.max_volume - disposal_volume - air_gap) // volume)
+    if per_aspiration < 1:
+        raise ValueError ('{} µl do not fit into the tip together with {} µl disposal volume and {} µl air gap'.format (volume, disposal_volume, air_gap))
+    for k in range (0, len (wells), per_aspiration):
+        batch = wells [k:k + per_aspiration]
+        if prepare is not None:
+            prepare ()
+        pipette.aspirate (volume * len (batch) + disposal_volume, source)
+        for well in batch:
+            if air_gap:
+                pipette.air_gap (air_gap)
+            pipette.dispense (volume + air_gap, well)
+        pipette.blow_out (source.top ())
+
+# wells_by_name () and indexing create new well objects, so wells are the same if they have the same labware and name
+def same_well (a, b):
+    return a.parent is b.parent and a.well_name == b.well_name
+
+# names of the destination wells of a step of a transfer plan
+def step_wells (step):
+    if step ['channels'] == 1:
+        return [step ['well']]
+    return [row + step ['column'] for row in 'ABCDEFGH']
+
+# adds volume of a reagent to the destination wells of the plan steps, source (step) gives the source well of a step
+# Steps whose wells are all still empty are served by multi_dispense with one tip per pipette and source well, the other steps get a transfer
+# with a fresh tip per step and the transfer_options. filled holds the names of the destination wells that already hold liquid and is updated.
+def dispense_reagent (pipettes, plan, volume, source, destination, filled, disposal_volume, air_gap, **transfer_options):
+    groups = []     # [channels, source well, destination wells] per multi-dispense
+    for step in plan:
+        if any (well in filled for well in step_wells (step)):
+            pipettes [step ['channels']].transfer (volume, source (step), destination [step ['well']], new_tip = 'always', **transfer_options)
+        else:
+            for group in groups:
+                if group [0] == step ['channels'] and same_well (group [1], source (step)):
+                    group [2].append (destination [step ['well']])
+                    break
+            else:
+                groups.append ([step ['channels'], source (step), [destination [step ['well']]]])
+        filled.update (step_wells (step))
+    for channels, well, wells in groups:
+        pipettes [channels].pick_up_tip ()
+        multi_dispense (pipettes [channels], volume, well, wells, disposal_volume, air_gap)
+        pipettes [channels].drop_tip ()
+
 def run(protocol: protocol_api.ProtocolContext):
     
     # load module
@@ -18,15 +132,35 @@ def run(protocol: protocol_api.ProtocolContext):
     tiprack_1 = protocol.load_labware ('opentrons_96_tiprack_20ul', '6')
     tiprack_2 = protocol.load_labware ('opentrons_96_tiprack_20ul', '3')
     
+    # samples on the DNA plate, CSV or JSON (see read_manifest), adjust if necessary
+    manifest = """
+well
+A1:H12
+"""
+    manifest_file = None        # path of a manifest file on the robot, e.g. '/data/user_storage/manifest.csv', replaces the manifest above
+    single_channel = None       # e.g. 'p20_single_gen2' on the left mount for samples in partial columns, None processes partial columns with the multichannel pipette
+
+    # reagent dispensing into empty wells (see multi_dispense), adjust if necessary
+    disposal_volume = 2         # µl
+    air_gap = 1                 # µl
+
     # load pipettes
     p20multi = protocol.load_instrument ('p20_multi_gen2', 'right', tip_racks = [tiprack_1, tiprack_2])
-    
-    # define variables
-    column_list = ['1', '2', '3', '4', '5', '6','7', '8', '9', '10', '11', '12']
-    well_list = ['A1', 'A2', 'A3', 'A4', 'A5', 'A6','A7', 'A8', 'A9', 'A10', 'A11', 'A12'] 
+    p20single = protocol.load_instrument (single_channel, 'left', tip_racks = [tiprack_1, tiprack_2]) if single_channel else None
+    pipettes = {8: p20multi, 1: p20single}
+
+    # compile the manifest into one transfer per full column and per sample of a partial column
+    samples = read_manifest (manifest, manifest_file)
+    plan = transfer_plan (samples, single_channel = p20single is not None)
+    protocol.comment (describe_plan (samples, plan))
 
-    # transfer plasmid DNA into pcr plate in Thermocycler Module
-    p20multi.transfer (10, [DNA_plate.columns_by_name ()[column_name] for column_name in column_list],[tc_plate.columns_by_name ()[column_name] for column_name in column_list], new_tip = 'always', blow_out = True, blowout_location='destination well' )
+    # reaction mix first (earlier versions added the DNA first), the wells of the pcr plate are still empty, so one tip dispenses it to all of them (see dispense_reagent);
+    # 10 µl leave no room for a second column in a 20 µl tip, so every column still gets its own aspiration
+    protocol.comment('Phase: reaction mix')
+    filled = set ()
+    dispense_reagent (pipettes, plan, 10, lambda step: MM_plate.wells_by_name ()['A1'], tc_plate, filled, disposal_volume, air_gap, mix_after = (3, 10), blow_out = True, blowout_location='destination well')
 
-    # transfer reaction mix into pcr plate and mixing
-    p20multi.transfer (10, [MM_plate.wells_by_name ()['A1']],[tc_plate.wells_by_name ()[well_name] for well_name in well_list], mix_after = (3, 10), new_tip = 'always', blow_out = True, blowout_location='destination well' )
+    # transfer plasmid DNA into the reaction mix in the pcr plate in Thermocycler Module and mixing, with a fresh tip per column
+    protocol.comment('Phase: DNA transfer')
+    for step in plan:
+        pipettes [step ['channels']].transfer (10, DNA_plate [step ['well']], tc_plate [step ['well']], mix_after = (3, 10), new_tip = 'always', blow_out = True, blowout_location='destination well' )
@@ -1,4 +1,11 @@
-from opentrons import protocol_api
+import csv
+import datetime
+import io
+import json
+import os
+import time
+
+from opentrons import protocol_api, types
 
 metadata= {
     'protocolName':'heat-shock_transformation',
@@ -6,6 +13,192 @@ metadata= {
     'description' : 'Protocol for E. coli heat-shock transformation using the Opentrons OT-2 with Thermocycler Module. Important note: All agar plates must have a uniform filling level. When teaching, the pipette tip must reach into the agar so that the cell suspension is dispensed onto the agar plate.',
     'apiLevel':'2.1'}
 
+# sample manifest, keep identical in all protocols that read a manifest
+# A manifest is CSV text with a header line or a JSON list of objects with one entry per sample:
+# 'well' (well of the sample plate, 'A1:H3' stands for all wells from A1 to H3), 'sample' (name, optional),
+# 'mix' (reaction mix, optional) and 'replicates' (optional, 1 if not given).
+def expand_wells (text):
+    text = text.strip ().upper ()
+    if ':' not in text:
+        return [text]
+    first, last = text.split (':')
+    letters = 'ABCDEFGH'
+    rows = letters [letters.index (first [0]):letters.index (last [0]) + 1]
+    return [row + str (column) for column in range (int (first [1:]), int (last [1:]) + 1) for row in rows]
+
+def read_manifest (text, path = None):
+    # a manifest file given by path replaces the text
+    if path is not None:
+        with open (path, encoding = 'utf-8') as f:
+            text = f.read ()
+    text = text.strip ()
+    rows = json.loads (text) if text.startswith ('[') else list (csv.DictReader (io.StringIO (text)))
+    samples = {}
+    for row in rows:
+        for well in expand_wells (str (row ['well'])):
+            if well in samples:
+                raise ValueError ('Well {} is listed twice in the manifest'.format (well))
+            samples [well] = {'well': well,
+                              'sample': row.get ('sample') or well,
+                              'mix': str (row.get ('mix') or '').strip () or None,
+                              'replicates': int (row.get ('replicates') or 1)}
+    if not samples:
+        raise ValueError ('The manifest lists no samples')
+    return list (samples.values ())
+
+def transfer_plan (samples, single_channel = True):
+    # samples are processed column by column, empty columns are skipped
+    # a full column with one reaction mix is a single multichannel transfer from row A, the samples of partial columns
+    # are transferred one by one with a single-channel pipette or, without one, together as a whole column
+    columns = {}
+    for sample in samples:
+        columns.setdefault (int (sample ['well'] [1:]), []).append (sample)
+    plan = []
+    for column in sorted (columns):
+        members = sorted (columns [column], key = lambda sample: sample ['well'] [0])
+        mixes = set (sample ['mix'] for sample in members)
+        replicates = max (sample ['replicates'] for sample in members)
+        if len (mixes) == 1 and (len (members) == 8 or not single_channel):
+            plan.append ({'column': str (column), 'well': 'A' + str (column), 'channels': 8, 'mix': members [0] ['mix'], 'replicates': replicates})
+        elif single_channel:
+            for sample in members:
+                plan.append ({'column': str (column), 'well': sample ['well'], 'channels': 1, 'mix': sample ['mix'], 'replicates': replicates})
+        else:
+            raise ValueError ('Column {} contains different reaction mixes, which needs a single-channel pipette'.format (column))
+    return plan
+
+def describe_plan (samples, plan):
+    multi = sum (1 for step in plan if step ['channels'] > 1)
+    return 'Manifest: {} samples in {} columns, {} multichannel and {} single-channel transfers per step'.format (
+        len (samples), len (set (step ['column'] for step in plan)), multi, len (plan) - multi)
+
+# plating engine, keep identical in distributing_cells_on_agar_plates.py and heat-shock_transformation.py
+# It spots the steps of a manifest transfer plan (see transfer_plan): every column of samples gets as many neighbouring spot columns
+# as its replicates, agar plates are filled one after the other and a column of samples is never split over two agar plates.
+# Every agar well can take several spots at fixed offsets from its centre (offset grids of 96 spots), the spot columns of a plate
+# are then its columns times the offsets, and the replicates of a sample go around the same well first.
+def spot_layout (plan, spot_columns = 12):
+    # agar plate index and first spot column of every column of samples
+    layout = {}
+    plate, free = 0, 0
+    for step in plan:
+        if step ['column'] in layout:
+            continue
+        if step ['replicates'] > spot_columns:
+            raise ValueError ('{} replicate spots do not fit on one agar plate'.format (step ['replicates']))
+        if free + step ['replicates'] > spot_columns:
+            plate, free = plate + 1, 0
+        layout [step ['column']] = (plate, free)
+        free += step ['replicates']
+    return layout
+
+def agar_plates_needed (plan, spot_columns = 12):
+    return max (plate for plate, first in spot_layout (plan, spot_columns).values ()) + 1
+
+def check_spot_offsets (offsets, pitch, distance):
+    # spots must keep distance mm apart, from the other spots of their well and from the spots of the neighbouring wells
+    for k, (x, y) in enumerate (offsets):
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                for m, (u, v) in enumerate (offsets):
+                    if (i, j, m) != (0, 0, k) and ((u + i * pitch - x) ** 2 + (v + j * pitch - y) ** 2) ** 0.5 < distance:
+                        raise ValueError ('Spots at {} and {} mm from the well centres are closer than {} mm'.format ((x, y), (u + i * pitch, v + j * pitch), distance))
+
+def spot_location (well, offset):
+    # spots in the well centre use the default dispense height, offset spots are dispensed 1 mm above the agar surface as well
+    if tuple (offset) == (0, 0):
+        return well
+    return well.bottom (1).move (types.Point (x = offset [0], y = offset [1]))
+
+def plating_plan (plan, source_plate, agar_plates, offsets = ((0, 0),), distance = 0):
+    # every sample is spotted in its own row, multichannel steps start in row A
+    pitch = agar_plates [0] ['A2'].top ().point.x - agar_plates [0] ['A1'].top ().point.x
+    check_spot_offsets (offsets, pitch, distance)
+    layout = spot_layout (plan, len (agar_plates [0].columns ()) * len (offsets))
+    spotting = []
+    for step in plan:
+        plate, first = layout [step ['column']]
+        if plate >= len (agar_plates):
+            raise ValueError ('The samples need more than {} agar plates'.format (len (agar_plates)))
+        row = 'ABCDEFGH'.index (step ['well'] [0])
+        spots = [divmod (first + k, len (offsets)) for k in range (step ['replicates'])]
+        spotting.append ((step ['channels'], source_plate [step ['well']], [spot_location (agar_plates [plate].columns () [column] [row], offsets [grid]) for column, grid in spots]))
+    return spotting
+
+def plate_out (pipettes, spotting, spot_volume, excess_volume):
+    # one aspiration fills as many spots as fit into the tip, the excess volume stays in the tip so that no air is dispensed onto the agar
+    for channels, source, spots in spotting:
+        pipette = pipettes [channels]
+        spots_per_aspiration = int ((pipette.max_volume - excess_volume) // spot_volume)
+        if spots_per_aspiration < 1:
+            raise ValueError ('{} µl spots plus {} µl excess do not fit into the tip'.format (spot_volume, excess_volume))
+        pipette.pick_up_tip ()
+        for k in range (0, len (spots), spots_per_aspiration):
+            batch = spots [k:k + spots_per_aspiration]
+            pipette.aspirate (spot_volume * len (batch) + (excess_volume if k == 0 else 0), source)
+            for spot in batch:
+                pipette.dispense (spot_volume, spot)
+        pipette.drop_tip ()
+
+# plating in rounds, for fewer agar slots than agar plates needed
+# the steps of a transfer plan are split at the agar plate boundaries of spot_layout, every round fits onto plates_per_round agar plates
+def plating_rounds (plan, plates_per_round, spot_columns = 12):
+    layout = spot_layout (plan, spot_columns)
+    rounds = []
+    for step in plan:
+        index = layout [step ['column']] [0] // plates_per_round
+        while len (rounds) <= index:
+            rounds.append ([])
+        rounds [index].append (step)
+    return rounds
+
+# latency budgets, keep identical in all protocols with time-critical steps
+# A budget limits the time from one named event to a later one, e.g. {('cold hold', 'SOC'): 120} in seconds. Events may carry a detail
+# such as the column, the budget of 'SOC' applies to every column. Each latency with a budget is written to the run log and, on the robot,
+# appended to a CSV file, so that it can be compared with the transformation efficiency of the run.
+class Latencies:
+    def __init__ (self, protocol, budgets, path = None):
+        self.protocol = protocol
+        self.budgets = budgets
+        self.path = path
+        self.run_start = datetime.datetime.now ().isoformat (timespec = 'seconds')
+        self.events = {}
+
+    def mark (self, event, detail = None):
+        now = time.monotonic ()
+        self.events [event] = now
+        for (start, end), budget in self.budgets.items ():
+            if end == event and start in self.events:
+                self.log (start, event, detail, now - self.events [start], budget)
+
+    def log (self, start, event, detail, latency, budget):
+        name = event if detail is None else '{} {}'.format (event, detail)
+        if latency <= budget:
+            self.protocol.comment ('Latency: {} -> {}: {:.0f} s (budget {} s)'.format (start, name, latency, budget))
+        else:
+            self.protocol.comment ('Latency: {} -> {}: {:.0f} s, over the budget of {} s'.format (start, name, latency, budget))
+        if self.path is None or self.protocol.is_simulating ():
+            return
+        new = not os.path.exists (self.path)
+        with open (self.path, 'a', newline = '', encoding = 'utf-8') as f:
+            writer = csv.writer (f)
+            if new:
+                writer.writerow (['run', 'from', 'to', 'detail', 'seconds', 'budget'])
+            writer.writerow ([self.run_start, start, event, detail or '', round (latency, 1), budget])
+
+# non-blocking Thermocycler holds
+# start_hold brings the block to temperature and starts a timer instead of holding, the robot is free for other work until
+# await_hold waits for the rest of the hold time
+def start_hold (protocol, tc_mod, temperature, minutes, block_max_volume):
+    tc_mod.set_block_temperature (temperature, block_max_volume = block_max_volume)
+    protocol.comment ('Holding {} °C for {} min'.format (temperature, minutes))
+    return time.monotonic () + 60 * minutes
+
+def await_hold (protocol, end):
+    remaining = end - time.monotonic ()
+    if remaining > 0:
+        protocol.delay (seconds = remaining, msg = 'Waiting for the end of the hold')
+
 def run(protocol: protocol_api.ProtocolContext):
 
     # load module
@@ -15,20 +208,99 @@ def run(protocol: protocol_api.ProtocolContext):
     tc_plate = tc_mod.load_labware ('biorad_96_wellplate_200ul_pcr')                              
     tiprack_300 = protocol.load_labware ('vwr_96_tiprack_300ul', '3')
     tiprack_20 = protocol.load_labware ('vwr_96_tiprack_10ul_short', '6')   
-    reservoir = protocol.load_labware ('agilent_12_reservoir_21ml', '9')    # fill first column with SOC medium
-    agarplate_1 = protocol.load_labware ('agarplate_96_wellplate_5ul', '1') # for every 3 columns of samples in the "tc_plate" one agar plate is needed
-    agarplate_2 = protocol.load_labware ('agarplate_96_wellplate_5ul', '2')
-    agarplate_3 = protocol.load_labware ('agarplate_96_wellplate_5ul', '5')
-    agarplate_4 = protocol.load_labware ('agarplate_96_wellplate_5ul', '4')
+    reservoir = protocol.load_labware ('agilent_12_reservoir_21ml', '9')    # fill first column with SOC medium, the second one for plate B in dual-plate mode
+
+    # samples in the plate with competent cells, CSV or JSON (see read_manifest), adjust if necessary
+    # "replicates" is the number of spots per sample, samples of the same column get the same number of spots
+    manifest = """
+well,replicates
+A1:H12,4
+"""
+    manifest_file = None        # path of a manifest file on the robot, e.g. '/data/user_storage/manifest.csv', replaces the manifest above
+
+    # both mounts are taken, partial columns are processed as whole columns with the multichannel pipettes
+    samples = read_manifest (manifest, manifest_file)
+    plan = transfer_plan (samples, single_channel = False)
+    protocol.comment (describe_plan (samples, plan))
+
+    # define spotting, adjust if necessary
+    spot_volume = 8             # µl per spot
+    excess_volume = 1           # µl remaining in the tip
+    agar_slots = ['1', '2', '5', '4']   # agar plates are filled in this order, only as many plates as needed are used
+    spot_offsets = [(0, 0)]     # mm from the well centre (x to the right, y to the back) of the spots per agar well, e.g. four offset
+                                # 96-spot grids [(-2.25, 2.25), (2.25, 2.25), (-2.25, -2.25), (2.25, -2.25)] take four times the spots of a plate
+    spot_distance = 4           # mm, the least distance between the centres of two spots
+
+    # latency budgets in s (see Latencies), adjust if necessary
+    # SOC has to reach the cells soon after the cold hold following the heat shock
+    latency_budgets = {('cold hold', 'SOC'): 120}
+    latency_file = '/data/user_storage/heat-shock_transformation_latencies.csv'     # None to log in the run log only
+
+    # dual-plate mode, adjust if necessary
+    # a second plate (plate B, same manifest) gets its DNA and its time on ice on the deck while plate A recovers in the Thermocycler,
+    # then the plates are exchanged and plate A is plated out on the deck while plate B recovers; False handles one plate
+    second_plate = False
+    plate_b_ice = 30            # min plate B is kept on ice after its DNA transfer, as the single plate in the thermocycler block
+    plate_b_transfer = 8        # min for loading plate B and its DNA transfer
+    plate_b_exchange = 2        # min from the end of the recovery of plate A until plate B is in the cold thermocycler block
+
+    # labware for the dual-plate mode only, slots 4 and 5 are not available for agar plates then
+    if second_plate:
+        dna_plate_b = protocol.load_labware ('biorad_96_wellplate_200ul_pcr', '4')    # DNA for plate B, replaced by plate A for its plating, so both are the same PCR plate
+        cells_b = protocol.load_labware ('thermo_96_chilledpcr_200ul', '5')     # plate B with competent cells on 3D printed cooling carrier containing ice
+        agar_slots = [slot for slot in agar_slots if slot not in ('4', '5')]
+
+    # load agar plates
+    agar_plates = [protocol.load_labware ('agarplate_96_wellplate_5ul', slot) for slot in agar_slots [:agar_plates_needed (plan, 12 * len (spot_offsets))]]
 
     # load pipettes
     p300multi = protocol.load_instrument ('p300_multi_gen2', 'left', tip_racks=[tiprack_300])
     p20multi = protocol.load_instrument ('p20_multi_gen2', 'right', tip_racks = [tiprack_20])
 
-    # define columns with used wells (only complete columns possible)
-    well_list = ['A1', 'A2', 'A3', 'A4', 'A5', 'A6','A7', 'A8', 'A9', 'A10', 'A11', 'A12'] 
+    # heat shock of the plate in the thermocycler block, the staged SOC tip has to be on the pipette
+    # the SOC for the first column is aspirated during the cold hold, the lid stays closed until the hold is over
+    def heat_shock (soc):
+        tc_mod.set_block_temperature (42, hold_time_seconds=30, block_max_volume=22)
+        cold_hold = start_hold (protocol, tc_mod, 0, 2, 22)
+        p300multi.aspirate (178, soc)
+        await_hold (protocol, cold_hold)
+        latencies.mark ('cold hold')
+        tc_mod.open_lid ()
+
+    # transfer SOC medium into PCR plate for regeneration, with a fresh tip per column that dispenses into the well and mixes it,
+    # so that no tip touching the cultures goes on to the next column; the first column gets the staged tip with its SOC
+    def add_soc (soc, plate_name = None):
+        for k, step in enumerate (plan):
+            if k > 0:
+                p300multi.pick_up_tip ()
+                p300multi.aspirate (178, soc)
+            p300multi.dispense (178, tc_plate [step ['well']])
+            latencies.mark ('SOC', step ['well'] if plate_name is None else '{} of plate {}'.format (step ['well'], plate_name))
+            p300multi.mix (2, 190, tc_plate [step ['well']])
+            p300multi.drop_tip ()
+
+    # pause for the operator, the tip racks are to be refilled as well if their remaining tips do not suffice for the next pickups
+    def exchange (message, soc_pickups = 0, plating_pickups = 0):
+        refills = []
+        for pipette, rack, name, pickups in [(p300multi, tiprack_300, '300 µl tip rack in slot 3', soc_pickups), (p20multi, tiprack_20, '10 µl tip rack in slot 6', plating_pickups)]:
+            if sum (1 for column in rack.columns () if all (well.has_tip for well in column)) < pickups:
+                refills.append ((pipette, name))
+        if refills:
+            message += ' Please fill up the {}.'.format (' and the '.join (name for pipette, name in refills))
+        protocol.pause (message)
+        for pipette, name in refills:
+            pipette.reset_tipracks ()
+
+    # plating out in as many rounds as the agar slots need, fresh agar plates are requested before every round except a first one
+    # with the agar plates that are already on the deck
+    def plate_rounds (source_plate, plate_name, rounds, fresh):
+        for k, steps in enumerate (rounds):
+            if k > 0 or fresh:
+                exchange ('Please place fresh agar plates for plate {} into slots {}.'.format (plate_name, ', '.join (agar_slots [:len (agar_plates)])), plating_pickups = len (steps))
+            plate_out ({8: p20multi}, plating_plan (steps, source_plate, agar_plates, spot_offsets, spot_distance), spot_volume, excess_volume)
 
     # cool down thermocycler
+    protocol.comment('Phase: plate loading')
     tc_mod.set_block_temperature (0)
 
     # insert plate and perform the heat-shock
@@ -36,53 +308,68 @@ def run(protocol: protocol_api.ProtocolContext):
     protocol.pause ('Please load PCR plate containing 2 µl DNA and 20 µl competent E. coli cells per well into the thermocycler block')
     tc_mod.close_lid ()
 
+    # the tip for the SOC is picked up in advance, so that the SOC addition starts right after the cold hold
+    latencies = Latencies (protocol, latency_budgets, latency_file)
+    p300multi.pick_up_tip ()
+
     # heat-shock transformation
+    protocol.comment('Phase: heat shock')
     tc_mod.set_block_temperature (0, hold_time_minutes=30, block_max_volume=22)
-    tc_mod.set_block_temperature (42, hold_time_seconds=30, block_max_volume=22)
-    tc_mod.set_block_temperature (0, hold_time_minutes=2, block_max_volume=22)
-
-
-    # transfer SOC medium into PCR plate for regeneration
-    tc_mod.open_lid ()
-    p300multi.transfer(178,reservoir.wells_by_name()['A1'],[tc_plate.wells_by_name ()[well_name] for well_name in well_list], mix_after = (2, 190), new_tip = 'always')
+    heat_shock (reservoir.wells_by_name()['A1'])
+    protocol.comment('Phase: SOC addition')
+    add_soc (reservoir.wells_by_name()['A1'], 'A' if second_plate else None)
     tc_mod.close_lid ()
+    protocol.comment('Phase: recovery')
     tc_mod.set_lid_temperature(40)
-    tc_mod.set_block_temperature (37, hold_time_minutes=60, block_max_volume=200)
 
-    # pipette cell suspension onto the agar plates
-    tc_mod.open_lid ()
-    tc_mod.deactivate_lid()
-    spot_list = ['A1', 'A2', 'A3', 'A4', 'A5', 'A6','A7', 'A8', 'A9', 'A10', 'A11', 'A12'] # do not change!
-    i = 0
-    while i < len(well_list):
-        p20multi.pick_up_tip()  
-        if i <= 2:
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_1 [spot_list [i * 4]])
-            p20multi.dispense (8, agarplate_1 [spot_list [i * 4 + 1]])
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_1 [spot_list [i * 4 + 2]])
-            p20multi.dispense (8, agarplate_1 [spot_list [i * 4 + 3]])
-        if i > 2 and i <= 5:
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_2 [spot_list [(i - 3) * 4]])
-            p20multi.dispense (8, agarplate_2 [spot_list [(i - 3) * 4 + 1]])
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_2 [spot_list [(i - 3) * 4 + 2]])
-            p20multi.dispense (8, agarplate_2 [spot_list [(i - 3) * 4 + 3]])
-        if i > 5 and i <= 8:
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_3 [spot_list [(i - 6) * 4 ]])
-            p20multi.dispense (8, agarplate_3 [spot_list [(i - 6) * 4 + 1]])
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_3 [spot_list [(i - 6) * 4 + 2]])
-            p20multi.dispense (8, agarplate_3 [spot_list [(i - 6) * 4 + 3]])
-        if i > 8 and i <= 11:
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_4 [spot_list [(i - 9) * 4]])
-            p20multi.dispense (8, agarplate_4 [spot_list [(i - 9) * 4 + 1]])
-            p20multi.aspirate (17, tc_plate [well_list [i]]) 
-            p20multi.dispense (8, agarplate_4 [spot_list [(i - 9) * 4 + 2]])
-            p20multi.dispense (8, agarplate_4 [spot_list [(i - 9) * 4 + 3]])
-        p20multi.drop_tip()
-        i= i + 1
\ No newline at end of file
+    if not second_plate:
+        tc_mod.set_block_temperature (37, hold_time_minutes=60, block_max_volume=200)
+
+        # pipette cell suspension onto the agar plates
+        protocol.comment('Phase: plating')
+        tc_mod.open_lid ()
+        tc_mod.deactivate_lid()
+        plate_out ({8: p20multi}, plating_plan (plan, tc_plate, agar_plates, spot_offsets, spot_distance), spot_volume, excess_volume)
+    else:
+        # plate B gets its DNA and is kept on ice on the deck while plate A recovers, requested such that its time on ice ends
+        # when it is in the cold block after the exchange
+        rounds = plating_rounds (plan, len (agar_plates), len (agar_plates [0].columns ()) * len (spot_offsets))
+        recovery = start_hold (protocol, tc_mod, 37, 60, 200)
+        await_hold (protocol, recovery - 60 * (plate_b_transfer + plate_b_ice - plate_b_exchange))
+        protocol.comment('Phase: plate B DNA transfer')
+        protocol.pause ('Please place the DNA plate for plate B into slot 4 and the PCR plate containing 20 µl competent cells per well for plate B onto the cooling carrier with ice in slot 5. Make sure that cells and DNA are thawed.')
+        p20multi.transfer (2, [dna_plate_b [step ['well']] for step in plan], [cells_b [step ['well']] for step in plan], mix_after = (5, 20), new_tip = 'always', blow_out = True, blowout_location='destination well')
+        ice = time.monotonic () + 60 * plate_b_ice
+        protocol.comment('Phase: recovery')
+        await_hold (protocol, recovery)
+
+        # exchange the plates: plate A leaves the block at 37 °C for slot 4 before the block cools down for plate B,
+        # and the lid cools down, so that plate B gets the heat shock of a single plate
+        protocol.comment('Phase: plate exchange')
+        tc_mod.open_lid ()
+        tc_mod.deactivate_lid ()
+        exchange ('Please move plate A from the thermocycler block to slot 4 (remove the DNA plate).',
+                  soc_pickups = len (plan), plating_pickups = len (rounds [0]))
+        tc_mod.set_block_temperature (0, block_max_volume=22)
+        protocol.pause ('Please move plate B from the cooling carrier into the thermocycler block.')
+        p300multi.pick_up_tip ()
+        tc_mod.close_lid ()
+
+        # plate B stays on ice (in the cold block) until its time on ice is over, also if the loading took longer than planned
+        await_hold (protocol, ice)
+        protocol.comment('Phase: plate B heat shock')
+        heat_shock (reservoir.wells_by_name()['A2'])
+        protocol.comment('Phase: plate B SOC addition')
+        add_soc (reservoir.wells_by_name()['A2'], 'B')
+        tc_mod.close_lid ()
+        recovery = start_hold (protocol, tc_mod, 37, 60, 200)
+
+        # plate A is plated out on the deck while plate B recovers
+        protocol.comment('Phase: plate A plating')
+        plate_rounds (dna_plate_b, 'A', rounds, False)
+        protocol.comment('Phase: plate B recovery')
+        await_hold (protocol, recovery)
+        protocol.comment('Phase: plate B plating')
+        tc_mod.open_lid ()
+        tc_mod.deactivate_lid()
+        plate_rounds (tc_plate, 'B', rounds, True)
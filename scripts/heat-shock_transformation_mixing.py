@@ -1,3 +1,7 @@
+import csv
+import io
+import json
+
 from opentrons import protocol_api
 
 metadata = {
@@ -6,6 +10,65 @@ metadata = {
     'description': 'Protocol for mixing of competent cells and DNA before E. coli heat-shock transformation using the Opentrons OT-2 with Thermocycler Module.',
     'apiLevel': '2.8'}
 
+# sample manifest, keep identical in all protocols that read a manifest
+# A manifest is CSV text with a header line or a JSON list of objects with one entry per sample:
+# 'well' (well of the sample plate, 'A1:H3' stands for all wells from A1 to H3), 'sample' (name, optional),
+# 'mix' (reaction mix, optional) and 'replicates' (optional, 1 if not given).
+def expand_wells (text):
+    text = text.strip ().upper ()
+    if ':' not in text:
+        return [text]
+    first, last = text.split (':')
+    letters = 'ABCDEFGH'
+    rows = letters [letters.index (first [0]):letters.index (last [0]) + 1]
+    return [row + str (column) for column in range (int (first [1:]), int (last [1:]) + 1) for row in rows]
+
+def read_manifest (text, path = None):
+    # a manifest file given by path replaces the text
+    if path is not None:
+        with open (path, encoding = 'utf-8') as f:
+            text = f.read ()
+    text = text.strip ()
+    rows = json.loads (text) if text.startswith ('[') else list (csv.DictReader (io.StringIO (text)))
+    samples = {}
+    for row in rows:
+        for well in expand_wells (str (row ['well'])):
+            if well in samples:
+                raise ValueError ('Well {} is listed twice in the manifest'.format (well))
+            samples [well] = {'well': well,
+                              'sample': row.get ('sample') or well,
+                              'mix': str (row.get ('mix') or '').strip () or None,
+                              'replicates': int (row.get ('replicates') or 1)}
+    if not samples:
+        raise ValueError ('The manifest lists no samples')
+    return list (samples.values ())
+
+def transfer_plan (samples, single_channel = True):
+    # samples are processed column by column, empty columns are skipped
+    # a full column with one reaction mix is a single multichannel transfer from row A, the samples of partial columns
+    # are transferred one by one with a single-channel pipette or, without one, together as a whole column
+    columns = {}
+    for sample in samples:
+        columns.setdefault (int (sample ['well'] [1:]), []).append (sample)
+    plan = []
+    for column in sorted (columns):
+        members = sorted (columns [column], key = lambda sample: sample ['well'] [0])
+        mixes = set (sample ['mix'] for sample in members)
+        replicates = max (sample ['replicates'] for sample in members)
+        if len (mixes) == 1 and (len (members) == 8 or not single_channel):
+            plan.append ({'column': str (column), 'well': 'A' + str (column), 'channels': 8, 'mix': members [0] ['mix'], 'replicates': replicates})
+        elif single_channel:
+            for sample in members:
+                plan.append ({'column': str (column), 'well': sample ['well'], 'channels': 1, 'mix': sample ['mix'], 'replicates': replicates})
+        else:
+            raise ValueError ('Column {} contains different reaction mixes, which needs a single-channel pipette'.format (column))
+    return plan
+
+def describe_plan (samples, plan):
+    multi = sum (1 for step in plan if step ['channels'] > 1)
+    return 'Manifest: {} samples in {} columns, {} multichannel and {} single-channel transfers per step'.format (
+        len (samples), len (set (step ['column'] for step in plan)), multi, len (plan) - multi)
+
 def run(protocol: protocol_api.ProtocolContext):
     
     # load module
@@ -27,12 +90,23 @@ def run(protocol: protocol_api.ProtocolContext):
     # pipette for heat-shock transformation only (install before starting)
     p300multi = protocol.load_instrument ('p300_multi_gen2', 'left', tip_racks=[tiprack_300])
 
-    # define variables
-    column_list = ['1', '2', '3', '4', '5', '6','7', '8', '9', '10', '11', '12']
+    # samples on the DNA plate, CSV or JSON (see read_manifest), adjust if necessary
+    manifest = """
+well
+A1:H12
+"""
+    manifest_file = None        # path of a manifest file on the robot, e.g. '/data/user_storage/manifest.csv', replaces the manifest above
+
+    # both mounts are taken, partial columns are processed as whole columns with the multichannel pipette
+    samples = read_manifest (manifest, manifest_file)
+    plan = transfer_plan (samples, single_channel = False)
+    protocol.comment (describe_plan (samples, plan))
 
     # cooling of Thermocycler Module
+    protocol.comment('Phase: plate loading')
     tc_mod.set_block_temperature(0)
     protocol.pause('Place a PCR plate containing 20 µl competent cells per well into the Thermocycler Module. Make sure that cells and DNA are thawed.')
 
     # transfer DNA into pcr plate with competent cells inside the Thermocycler Module
-    p20multi.transfer (2, [DNA_plate.columns_by_name ()[column_name] for column_name in column_list],[tc_plate.columns_by_name ()[column_name] for column_name in column_list], mix_after = (5, 20), new_tip = 'always', blow_out = True, blowout_location='destination well' )
+    protocol.comment('Phase: DNA transfer')
+    p20multi.transfer (2, [DNA_plate [step ['well']] for step in plan], [tc_plate [step ['well']] for step in plan], mix_after = (5, 20), new_tip = 'always', blow_out = True, blowout_location='destination well' )
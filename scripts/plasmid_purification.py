@@ -1,3 +1,10 @@
+import csv
+import functools
+import io
+import json
+import os
+import time
+
 from opentrons import protocol_api
 
 metadata= {
@@ -6,6 +13,412 @@ metadata= {
     'description': 'Protocol for plasmid purification using the Opentrons OT-2 with Magnetic Module and the Promega Wizard® MagneSil® Plasmid DNA Purification System.',
     'apiLevel':'2.8'}
 
+# sample manifest, keep identical in all protocols that read a manifest
+# A manifest is CSV text with a header line or a JSON list of objects with one entry per sample:
+# 'well' (well of the sample plate, 'A1:H3' stands for all wells from A1 to H3), 'sample' (name, optional),
+# 'mix' (reaction mix, optional) and 'replicates' (optional, 1 if not given).
+def expand_wells (text):
+    text = text.strip ().upper ()
+    if ':' not in text:
+        return [text]
+    first, last = text.split (':')
+    letters = 'ABCDEFGH'
+    rows = letters [letters.index (first [0]):letters.index (last [0]) + 1]
+    return [row + str (column) for column in range (int (first [1:]), int (last [1:]) + 1) for row in rows]
+
+def read_manifest (text, path = None):
+    # a manifest file given by path replaces the text
+    if path is not None:
+        with open (path, encoding = 'utf-8') as f:
+            text = f.read ()
+    text = text.strip ()
+    rows = json.loads (text) if text.startswith ('[') else list (csv.DictReader (io.StringIO (text)))
+    samples = {}
+    for row in rows:
+        for well in expand_wells (str (row ['well'])):
+            if well in samples:
+                raise ValueError ('Well {} is listed twice in the manifest'.format (well))
+            samples [well] = {'well': well,
+                              'sample': row.get ('sample') or well,
+                              'mix': str (row.get ('mix') or '').strip () or None,
+                              'replicates': int (row.get ('replicates') or 1)}
+    if not samples:
+        raise ValueError ('The manifest lists no samples')
+    return list (samples.values ())
+
+def transfer_plan (samples, single_channel = True):
+    # samples are processed column by column, empty columns are skipped
+    # a full column with one reaction mix is a single multichannel transfer from row A, the samples of partial columns
+    # are transferred one by one with a single-channel pipette or, without one, together as a whole column
+    columns = {}
+    for sample in samples:
+        columns.setdefault (int (sample ['well'] [1:]), []).append (sample)
+    plan = []
+    for column in sorted (columns):
+        members = sorted (columns [column], key = lambda sample: sample ['well'] [0])
+        mixes = set (sample ['mix'] for sample in members)
+        replicates = max (sample ['replicates'] for sample in members)
+        if len (mixes) == 1 and (len (members) == 8 or not single_channel):
+            plan.append ({'column': str (column), 'well': 'A' + str (column), 'channels': 8, 'mix': members [0] ['mix'], 'replicates': replicates})
+        elif single_channel:
+            for sample in members:
+                plan.append ({'column': str (column), 'well': sample ['well'], 'channels': 1, 'mix': sample ['mix'], 'replicates': replicates})
+        else:
+            raise ValueError ('Column {} contains different reaction mixes, which needs a single-channel pipette'.format (column))
+    return plan
+
+def describe_plan (samples, plan):
+    multi = sum (1 for step in plan if step ['channels'] > 1)
+    return 'Manifest: {} samples in {} columns, {} multichannel and {} single-channel transfers per step'.format (
+        len (samples), len (set (step ['column'] for step in plan)), multi, len (plan) - multi)
+
+# step scheduler
+# A step runs once all steps listed in "after" have run and their incubation time (minutes) has passed.
+# While the next step waits for an incubation, "filler" steps whose estimated duration (seconds) fits into the remaining time are run instead of idling,
+# so incubations never get shorter. Fillers that did not fit anywhere run as soon as a later step requires them.
+# Steps finished in an earlier run (see Checkpoint) are skipped, an incubation that had not ended when the run stopped is restarted in full.
+def run_steps (protocol, steps, checkpoint = None):
+    incubating = {}     # step name -> time at which its incubation ends
+    finished = set ()
+    phases = {step ['name']: step.get ('phase', step ['name']) for step in steps}
+    pending = list (steps)
+
+    def incubation_over (name):
+        finished.add (name)
+        del incubating [name]
+        if checkpoint is not None:
+            checkpoint.mark (name + ' incubation')
+
+    if checkpoint is not None:
+        finished = set (step ['name'] for step in steps if step ['name'] in checkpoint.done)
+        pending = [step for step in steps if step ['name'] not in finished]
+        for step in steps:
+            if step ['name'] in finished and step.get ('incubation') and step ['name'] + ' incubation' not in checkpoint.done:
+                protocol.comment ('Restarting the interrupted incubation of {}. {}'.format (step ['name'], step ['message']))
+                finished.remove (step ['name'])
+                incubating [step ['name']] = time.monotonic () + 60 * step ['incubation']
+    while pending:
+        now = time.monotonic ()
+        for name, end in list (incubating.items ()):
+            if end <= now:
+                incubation_over (name)
+        ready = [step for step in pending if all (name in finished for name in step ['after'])]
+        remaining = min (incubating.values ()) - now if incubating else 0
+        main_steps = [step for step in ready if not step.get ('filler')]
+        fillers = [step for step in ready if step.get ('filler') and step ['duration'] <= remaining]
+        if main_steps or fillers or (ready and not incubating):
+            step = (main_steps or fillers or ready) [0]
+            protocol.comment ('Phase: ' + phases [step ['name']])
+            if checkpoint is not None:
+                checkpoint.run (step ['name'], step ['run'])
+            else:
+                step ['run'] ()
+            pending.remove (step)
+            if step.get ('incubation'):
+                protocol.comment (step ['message'])
+                incubating [step ['name']] = time.monotonic () + 60 * step ['incubation']
+            else:
+                finished.add (step ['name'])
+        elif incubating:
+            # nothing else to do, wait for the next incubation to end
+            name = min (incubating, key = incubating.get)
+            protocol.comment ('Phase: ' + phases [name])
+            protocol.delay (seconds = max (remaining, 0))
+            incubation_over (name)
+        else:
+            raise ValueError ('Steps {} require steps that do not exist'.format ([step ['name'] for step in pending]))
+
+# tip planner
+# Every step declares how many tip columns it needs, tip columns are handed out in this order from the tip racks.
+# The demands come in stages: every stage starts again at the first tip rack, and the tip racks it needs are replaced with full ones before
+# it (the caller asks for that at a pause the protocol makes anyway). Returns the plan and the racks to replace before each later stage.
+# The plan is written to the run log before anything is pipetted and the protocol stops right away if the tips of a stage do not suffice.
+def plan_tips (protocol, tipracks, stages):
+    available = [column [0] for rack in tipracks for column in rack.columns ()]
+    plan = {}
+    refills = []
+    for stage, demands in enumerate (stages):
+        needed = sum (count for _, count in demands)
+        if needed > len (available):
+            raise ValueError ('Stage {} of the protocol needs {} tip columns, but the tip racks only hold {}'.format (stage + 1, needed, len (available)))
+        k = 0
+        for name, count in demands:
+            plan [name] = available [k:k + count]
+            if count == 1:
+                protocol.comment ('Tips for {}: {}'.format (name, plan [name] [0]))
+            else:
+                protocol.comment ('Tips for {}: {} columns, {} to {}'.format (name, count, plan [name] [0], plan [name] [-1]))
+            k = k + count
+        refills.append ([rack for rack in tipracks if any (well.parent is rack for well in available [:needed])])
+        protocol.comment ('Tip plan stage {} uses {} of {} tip columns'.format (stage + 1, needed, len (available)))
+    return plan, refills [1:]
+
+# checkpoints
+# After every finished unit of work (a step, or one column of a step) the progress is written to a JSON file on the robot,
+# together with the tips missing from the tip racks, the magnet state, the aspiration flow rate of the pipette and the liquid levels.
+# Started again with resume switched on and the same samples, the protocol restores that state and skips all finished units, so a run
+# stopped by a fault continues at the column where it stopped. A unit that was interrupted halfway is repeated as a whole, and so is an
+# incubation (see run_steps). Checkpoints older than max_age hours are refused, a run started without resume removes the old checkpoint.
+# The file is removed when the protocol finishes, nothing is read or written while the protocol is simulated (e.g. in the Opentrons App).
+class Checkpoint:
+    def __init__ (self, protocol, path, key, tipracks, magnetic_module, mag_height, pipette, levels, max_age = 12):
+        self.protocol = protocol
+        self.path = path
+        self.key = key
+        self.max_age = max_age
+        self.tipracks = tipracks
+        self.magnetic_module = magnetic_module
+        self.mag_height = mag_height
+        self.pipette = pipette
+        self.levels = levels
+        self.done = []
+        self.started = None     # time.time () of the start of the run, identifies the run in the checkpoint
+        self.writing = path is not None and not protocol.is_simulating ()
+
+    def restore (self):
+        # loads the saved progress, returns False while simulating
+        if not self.writing:
+            return False
+        if not os.path.exists (self.path):
+            raise ValueError ('There is no checkpoint {} to resume from, set resume = False to start from the beginning'.format (self.path))
+        with open (self.path, encoding = 'utf-8') as f:
+            saved = json.load (f)
+        if saved ['key'] != self.key:
+            raise ValueError ('The checkpoint {} belongs to a run with other samples or tip racks, set resume = False to start from the beginning'.format (self.path))
+        age = (time.time () - saved ['saved']) / 3600
+        if age > self.max_age:
+            raise ValueError ('The checkpoint {} was saved {:.1f} h ago, which is too long to resume the run, set resume = False to start from the beginning'.format (self.path, age))
+        self.started = saved ['started']
+        self.done = saved ['done']
+        for rack, names in zip (self.tipracks, saved ['used tips']):
+            for name in names:
+                rack.use_tips (rack.wells_by_name () [name])
+        if saved ['magnet'] == 'engaged':
+            self.magnetic_module.engage (height_from_base = self.mag_height)
+        self.pipette.flow_rate.aspirate = saved ['aspirate flow rate']
+        self.levels.volumes = saved ['liquid volumes']
+        return True
+
+    def save (self):
+        if not self.writing:
+            return
+        if self.started is None:
+            self.started = time.time ()
+        state = {'key': self.key,
+                 'started': self.started,
+                 'saved': time.time (),
+                 'done': self.done,
+                 'used tips': [[name for name, well in rack.wells_by_name ().items () if not well.has_tip] for rack in self.tipracks],
+                 'magnet': self.magnetic_module.status,
+                 'aspirate flow rate': self.pipette.flow_rate.aspirate,
+                 'liquid volumes': self.levels.volumes}
+        # write a new file and replace the old one, so that a fault while writing never leaves a broken checkpoint
+        with open (self.path + '.tmp', 'w', encoding = 'utf-8') as f:
+            json.dump (state, f)
+        os.replace (self.path + '.tmp', self.path)
+
+    def mark (self, unit):
+        self.done.append (unit)
+        self.save ()
+
+    def run (self, unit, action, *args, **kwargs):
+        # runs action unless the unit has been finished before
+        if unit in self.done:
+            return
+        action (*args, **kwargs)
+        self.mark (unit)
+
+    def columns (self, unit, column_list):
+        # yields the index of every column whose part of the unit has not been finished yet, a column counts as finished when the loop body is done
+        for i, well_name in enumerate (column_list):
+            name = '{} {}'.format (unit, well_name)
+            if name not in self.done:
+                yield i
+                self.mark (name)
+
+    def clear (self):
+        # removes the checkpoint, at the end of the run and at the start of a run that is not resumed
+        if self.writing and os.path.exists (self.path):
+            os.remove (self.path)
+
+# liquid level tracking
+# The volume in every well of the tracked labware is booked on each aspirate and dispense, the height of the liquid surface follows from it
+# (wells are treated as straight-walled, which puts the surface too low near the bottom of conical and V-shaped wells, so the tip only goes deeper).
+# Wells filled by the operator (the reservoir columns) may hold less than they should, and a tip following a surface that is not there
+# aspirates air: their surface is taken fill_tolerance µl lower than booked, so the tip stays below the surface of an under-filled column.
+# aspirate holds the tip immersion mm below the surface the liquid will have after the aspiration, but never lower than clearance mm above the bottom.
+# With a fast_rate, the part of the volume above clearance + slow_zone mm is aspirated at that rate with the tip no lower than that, and only
+# the rest at the normal rate down to clearance, so only the liquid close to a bead pellet is aspirated slowly and the fast flow stays away from it.
+# A multichannel pipette takes the volume of all channels from a single-row reservoir.
+# Before an aspiration would leave less than the dead volume in a filled well (a reservoir column), the protocol pauses for a refill.
+class LiquidLevels:
+    def __init__ (self, protocol, labware, immersion, dead_volume, fill_tolerance = 0):
+        self.protocol = protocol
+        self.labware = labware      # name -> labware
+        self.immersion = immersion
+        self.dead_volume = dead_volume
+        self.fill_tolerance = fill_tolerance
+        self.volumes = {key: {name: 0 for name in plate.wells_by_name ()} for key, plate in labware.items ()}
+        self.filled = {key: {} for key in labware}
+
+    def locate (self, well):
+        # key and name of a well of the booked labware, None for other wells; wells_by_name () and indexing create new well objects,
+        # so a well is found by its labware and name
+        for key, plate in self.labware.items ():
+            if well.parent is plate:
+                return key, well.well_name
+        return None
+
+    def fill (self, key, volumes):
+        # start volumes in µl by well name, filled wells are refilled to them
+        self.volumes [key].update (volumes)
+        self.filled [key].update (volumes)
+
+    def exchange (self, source, destination):
+        # the plate at source is moved to destination by hand and a fresh, empty plate is placed at source
+        self.volumes [destination] = dict (self.volumes [source])
+        self.volumes [source] = {name: 0 for name in self.volumes [source]}
+
+    def wells (self, pipette, well):
+        # names of the wells reached by the channels of the pipette and the volume factor per well
+        key, name = self.locate (well)
+        if len (self.labware [key].rows ()) == 1:
+            return key, [name], pipette.channels
+        rows = 'ABCDEFGH'
+        start = rows.index (name [0])
+        return key, [row + name [1:] for row in rows [start:start + pipette.channels] if row + name [1:] in self.volumes [key]], 1
+
+    def height (self, well):
+        key, name = self.locate (well)
+        volume = self.volumes [key] [name]
+        if name in self.filled [key]:
+            volume = max (volume - self.fill_tolerance, 0)
+        return well.depth * volume / well.max_volume
+
+    def add (self, pipette, volume, well):
+        if self.locate (well) is not None:
+            key, names, factor = self.wells (pipette, well)
+            for name in names:
+                self.volumes [key] [name] = self.volumes [key] [name] + volume * factor
+
+    def remove (self, pipette, volume, well):
+        if self.locate (well) is None:
+            return
+        key, names, factor = self.wells (pipette, well)
+        for name in names:
+            full = self.filled [key].get (name)
+            if full is not None and self.volumes [key] [name] - volume * factor < self.dead_volume:
+                self.protocol.pause ('{} {} is about to run dry ({:.1f} ml left). Please fill it up to {:.1f} ml and press resume.'.format (key.capitalize (), name, self.volumes [key] [name] / 1000, full / 1000))
+                self.volumes [key] [name] = full
+            self.volumes [key] [name] = max (self.volumes [key] [name] - volume * factor, 0)
+
+    def aspirate (self, pipette, volume, well, rate = 1, clearance = 1, fast_rate = None, slow_zone = 0):
+        if self.locate (well) is None:
+            pipette.aspirate (volume, well, rate = rate)
+            return
+        fast = 0
+        if fast_rate is not None:
+            key, names, factor = self.wells (pipette, well)
+            above = self.volumes [key] [names [0]] - (clearance + slow_zone) * well.max_volume / well.depth
+            fast = min (volume, max (above / factor, 0))
+        # the fast part is taken with the tip above the slow zone, only the slow rest goes down to the clearance
+        for part, part_rate, lowest in [(fast, fast_rate, clearance + slow_zone), (volume - fast, rate, clearance)]:
+            if part > 0:
+                self.remove (pipette, part, well)
+                pipette.aspirate (part, well.bottom (max (self.height (well) - self.immersion, lowest)), rate = part_rate)
+
+# mixing
+# A mixing profile sets the repetitions, the volume (µl), the aspirate and dispense speeds (µl/s, independent of the flow rates set at the time)
+# and optionally the aspirate and dispense heights (mm above the well bottom, otherwise the default clearance).
+# Every mix is announced by a "Mixing: <profile>" comment, so that the offline benchmark reports the time spent per profile.
+def mix_well (protocol, pipette, name, profile, well):
+    protocol.comment ('Mixing: ' + name)
+    aspirate_location = well.bottom (profile ['aspirate height']) if profile.get ('aspirate height') is not None else well
+    dispense_location = well.bottom (profile ['dispense height']) if profile.get ('dispense height') is not None else well
+    for _ in range (profile ['repetitions']):
+        pipette.aspirate (profile ['volume'], aspirate_location, rate = profile ['aspirate'] / pipette.flow_rate.aspirate)
+        pipette.dispense (profile ['volume'], dispense_location, rate = profile ['dispense'] / pipette.flow_rate.dispense)
+
+# reagent dispensing, keep identical in all protocols that dispense reagents
+# A reagent for wells that are still empty is dispensed with one tip: every aspiration takes up the reagent for as many wells as fit into the tip
+# together with a disposal volume and an air gap, the air gap is drawn again before every dispense so that nothing drips on the way, and the
+# disposal volume is blown out back into the source after the last well of an aspiration. The caller picks up and drops the tip.
+# prepare (optional) is called before every aspiration, e.g. to resuspend beads.
+def multi_dispense (pipette, volume, source, wells, disposal_volume, air_gap, prepare = None):
+    per_aspiration = int ((pipette.max_volume - disposal_volume - air_gap) // volume)
+    if per_aspiration < 1:
+        raise ValueError ('{} µl do not fit into the tip together with {} µl disposal volume and {} µl air gap'.format (volume, disposal_volume, air_gap))
+    for k in range (0, len (wells), per_aspiration):
+        batch = wells [k:k + per_aspiration]
+        if prepare is not None:
+            prepare ()
+        pipette.aspirate (volume * len (batch) + disposal_volume, source)
+        for well in batch:
+            if air_gap:
+                pipette.air_gap (air_gap)
+            pipette.dispense (volume + air_gap, well)
+        pipette.blow_out (source.top ())
+
+# wells_by_name () and indexing create new well objects, so wells are the same if they have the same labware and name
+def same_well (a, b):
+    return a.parent is b.parent and a.well_name == b.well_name
+
+# names of the destination wells of a step of a transfer plan
+def step_wells (step):
+    if step ['channels'] == 1:
+        return [step ['well']]
+    return [row + step ['column'] for row in 'ABCDEFGH']
+
+# adds volume of a reagent to the destination wells of the plan steps, source (step) gives the source well of a step
+# Steps whose wells are all still empty are served by multi_dispense with one tip per pipette and source well, the other steps get a transfer
+# with a fresh tip per step and the transfer_options. filled holds the names of the destination wells that already hold liquid and is updated.
+def dispense_reagent (pipettes, plan, volume, source, destination, filled, disposal_volume, air_gap, **transfer_options):
+    groups = []     # [channels, source well, destination wells] per multi-dispense
+    for step in plan:
+        if any (well in filled for well in step_wells (step)):
+            pipettes [step ['channels']].transfer (volume, source (step), destination [step ['well']], new_tip = 'always', **transfer_options)
+        else:
+            for group in groups:
+                if group [0] == step ['channels'] and same_well (group [1], source (step)):
+                    group [2].append (destination [step ['well']])
+                    break
+            else:
+                groups.append ([step ['channels'], source (step), [destination [step ['well']]]])
+        filled.update (step_wells (step))
+    for channels, well, wells in groups:
+        pipettes [channels].pick_up_tip ()
+        multi_dispense (pipettes [channels], volume, well, wells, disposal_volume, air_gap)
+        pipettes [channels].drop_tip ()
+
+# adds the same reagent to several wells with one tip, the reagent is dispensed from the top of the wells so that the tip never touches a sample
+def add_from_top (pipette, levels, tip, volume, source, wells, keep_tip = False):
+    pipette.pick_up_tip (tip)
+    per_aspiration = int (pipette.max_volume // volume)
+    for k in range (0, len (wells), per_aspiration):
+        batch = wells [k:k + per_aspiration]
+        levels.aspirate (pipette, volume * len (batch), source)
+        for well in batch:
+            pipette.dispense (volume, well.top ())
+            levels.add (pipette, volume, well)
+        pipette.blow_out (batch [-1].top ())
+    if keep_tip:
+        pipette.return_tip ()
+    else:
+        pipette.drop_tip ()
+
+# removes liquid from every well with the tip planned for its column and discards it into the trash, the tips are kept for the same columns unless this is their last step
+# the liquid is aspirated from below its surface (see LiquidLevels), aspiration keyword arguments are passed on to LiquidLevels.aspirate
+def discard (pipette, levels, tips, volume, wells, trash, last_step = False, **aspiration):
+    for tip, well in zip (tips, wells):
+        pipette.pick_up_tip (tip)
+        levels.aspirate (pipette, volume, well, **aspiration)
+        if last_step:
+            pipette.drop_tip ()
+        else:
+            pipette.dispense (volume, trash.top ())
+            pipette.blow_out ()
+            pipette.return_tip ()
+
 def run(protocol: protocol_api.ProtocolContext):
 
     # load module
@@ -16,20 +429,31 @@ def run(protocol: protocol_api.ProtocolContext):
     deck_plate = protocol.load_labware ('greiner_96_wellplate_320ul', '2') 
     reservoir_plate = protocol.load_labware('agilent_12_reservoir_21ml', '3')
     square_plate = protocol.load_labware ('usascientific_96_wellplate_2.4ml_deep', '5')
-    tiprack_6 =  protocol.load_labware('vwr_96_tiprack_300ul', 6)
-    tiprack_7 =  protocol.load_labware('vwr_96_tiprack_300ul', 7)
-    tiprack_8 =  protocol.load_labware('vwr_96_tiprack_300ul', 8)
-    tiprack_9 =  protocol.load_labware('vwr_96_tiprack_300ul', 9)
-    tiprack_10 = protocol.load_labware('vwr_96_tiprack_300ul', 10)
-    tiprack_11 = protocol.load_labware('vwr_96_tiprack_300ul', 11)
-    # position 4 could be used for heating elution buffer, for heating the collection plate to dry the pellets after washing, 
-    # for an additional culture plate to allow using plates with fewer, but bigger wells or for an additional tiprack to avoid re-usage of tips   
+    # tip racks are used in this order, position 4 holds an additional tiprack so that the tips are only refilled while the pellet dries
+    tip_slots = ['6', '7', '8', '9', '10', '11', '4']
+    tipracks = [protocol.load_labware('vwr_96_tiprack_300ul', slot) for slot in tip_slots]
     
     # load pipette (do not change pipette to gen 2, because it affects the default aspirate and dispense speeds. Backwards compatibility should allow attaching a gen 2 pipette and treating it as gen 1
-    p_300 = protocol.load_instrument('p300_multi', 'left', tip_racks = [tiprack_6, tiprack_7, tiprack_8, tiprack_9, tiprack_10, tiprack_11])
+    p_300 = protocol.load_instrument('p300_multi', 'left', tip_racks = tipracks)
+
+    # samples in the square plate, CSV or JSON (see read_manifest), adjust if necessary
+    manifest = """
+well
+A1:H12
+"""
+    manifest_file = None        # path of a manifest file on the robot, e.g. '/data/user_storage/manifest.csv', replaces the manifest above
 
-    # define columns containing samples
-    column_list = ['A1','A2','A3','A4','A5','A6','A7','A8','A9','A10','A11','A12']
+    # progress file on the robot (see Checkpoint), None switches checkpoints off
+    # after a fault, start the protocol again with resume = True to continue where it stopped
+    checkpoint_file = '/data/user_storage/plasmid_purification_checkpoint.json'
+    resume = False
+    resume_max_age = 12         # h, older checkpoints are not resumed (the lysate and the beads do not keep)
+
+    # the magnetic bead steps need the multichannel pipette, partial columns are processed as whole columns and empty columns are skipped
+    samples = read_manifest (manifest, manifest_file)
+    plan = transfer_plan (samples, single_channel = False)
+    protocol.comment (describe_plan (samples, plan))
+    column_list = [step ['well'] for step in plan]
 
     #define aspiration and dispense speed. 
     p_300.flow_rate.aspirate = 150
@@ -38,178 +462,245 @@ def run(protocol: protocol_api.ProtocolContext):
     # define magnet height from base of plate
     mag_height = 5.3
 
+    # liquid levels (see LiquidLevels), adjust if necessary
+    reservoir_volumes = {'A1': 10500, 'A2': 13500, 'A3': 13500, 'A4': 4500, 'A5': 7000, 'A6': 11500, 'A7': 11500, 'A8': 11500, 'A9': 11500}    # µl filled into the reservoir columns
+    dead_volume = 1500          # µl that cannot be aspirated from a reservoir column
+    fill_tolerance = 3000       # µl a reservoir column may hold less than filled in, the tip goes that much deeper (about 5.6 mm)
+    immersion = 2               # mm the tip is held below the liquid surface
+    slow_zone = 2               # mm above the bottom clearance that are aspirated at the conservative rates on the magnetic module
+    fast_aspiration = 75        # µl/s for the liquid above the slow zone on the magnetic module
+
+    # reagent dispensing into empty wells (see multi_dispense), adjust if necessary
+    disposal_volume = 20        # µl
+    air_gap = 10                # µl
+    levels = LiquidLevels (protocol, {'reservoir': reservoir_plate, 'magnetic plate': magnetic_plate, 'deck plate': deck_plate}, immersion, dead_volume, fill_tolerance)
+    levels.fill ('reservoir', reservoir_volumes)
+
+    # mixing profiles (see mix_well), adjust if necessary
+    mixing_profiles = {
+        'lysate resuspension':      {'repetitions': 10, 'volume': 70, 'aspirate': 150, 'dispense': 300},
+        'gentle lysis':             {'repetitions': 7, 'volume': 150, 'aspirate': 150, 'dispense': 300},
+        'neutralization':           {'repetitions': 10, 'volume': 250, 'aspirate': 150, 'dispense': 300},
+        'MagnesilBlue suspension':  {'repetitions': 10, 'volume': 300, 'aspirate': 150, 'dispense': 300},     # in the reservoir before aspiration, distributes the beads evenly
+        'MagnesilBlue mixing':      {'repetitions': 15, 'volume': 250, 'aspirate': 150, 'dispense': 300},
+        'MagnesilRed suspension':   {'repetitions': 15, 'volume': 300, 'aspirate': 150, 'dispense': 300},
+        'bead binding':             {'repetitions': 15, 'volume': 250, 'aspirate': 100, 'dispense': 100},
+        'ethanol wash':             {'repetitions': 7, 'volume': 75, 'aspirate': 150, 'dispense': 300},
+        'bead resuspension':        {'repetitions': 15, 'volume': 100, 'aspirate': 25, 'dispense': 75}}     # elution
+
+    def mix (profile, well):
+        mix_well (protocol, p_300, profile, mixing_profiles [profile], well)
+
+    # aspiration from a well on the magnetic module, only the last slow_zone mm above the pellet are aspirated at the given rate
+    def above_pellet (rate = 1):
+        return {'rate': rate, 'fast_rate': fast_aspiration / p_300.flow_rate.aspirate, 'slow_zone': slow_zone}
+
+    # plan tips before anything is pipetted (see plan_tips), the tip racks emptied up to the washes are replaced while the pellet dries
+    # reagent tips only touch one reagent and are used for all columns, sample tips are used for several steps of the same column,
+    # every wash gets fresh tips for mixing and removing the ethanol, so that no lysate is carried into the washes
+    n = len (column_list)
+    tips, refills = plan_tips (protocol, tipracks, [[
+        ('resuspension solution', 1),
+        ('lysis solution', 1),
+        ('neutralization solution', 1),
+        ('lysate mixing (resuspension, lysis, neutralization)', n),
+        ('MagnesilBlue and clearing', n),
+        ('MagnesilRed', 1),
+        ('binding and supernatant removal', n),
+        ('ethanol', 1),
+        ('wash 1', n),
+        ('wash 2', n),
+        ('wash 3', n)], [
+        ('elution', n),
+        ('eluate collection', n),
+        ('eluate clearing', n)]])
+
+    # continue a run that was stopped by a fault
+    checkpoint = Checkpoint (protocol, checkpoint_file, {'columns': column_list, 'tip racks': tip_slots}, tipracks, magnetic_module, mag_height, p_300, levels, resume_max_age)
+    if not resume:
+        checkpoint.clear ()
+    elif checkpoint.restore ():
+        protocol.pause ('Resuming the run started {:.1f} h ago, {} finished units are skipped. Leave all plates where they were when the run stopped and put tips that were on the pipette back to their places in the tip racks. Press resume to continue protocol.'.format ((time.time () - checkpoint.started) / 3600, len (checkpoint.done)))
+
+    # the steps up to the plate exchange are run by the step scheduler (see run_steps), MagnesilRed is added to the binding plate while the lysate incubates and the clearing pellet forms
+    # reagents are added from the top of the wells with a single tip, afterwards every column is mixed with its own tip
+    def mix_lysate (unit, profile, last_step):
+        for i in checkpoint.columns (unit, column_list):
+            p_300.pick_up_tip (tips ['lysate mixing (resuspension, lysis, neutralization)'] [i])
+            mix (profile, square_plate [column_list [i]])
+            p_300.blow_out (square_plate [column_list [i]].top ())
+            if last_step:
+                p_300.drop_tip ()
+            else:
+                p_300.return_tip ()
+
     #cell resuspension solution ("Shaking at amplitude 8 for 5 min")
-    p_300.starting_tip = tiprack_6.well('A1') 
-    p_300.transfer (90, reservoir_plate.wells_by_name ()['A1'], [square_plate.wells_by_name ()[well_name] for well_name in column_list], mix_after = (10, 70), new_tip = 'always', blow_out = True, blowout_location='destination well')
+    def resuspension ():
+        checkpoint.run ('resuspension solution', add_from_top, p_300, levels, tips ['resuspension solution'] [0], 90, reservoir_plate.wells_by_name ()['A1'], [square_plate.wells_by_name ()[well_name] for well_name in column_list])
+        mix_lysate ('resuspension mixing', 'lysate resuspension', last_step = False)
 
     #cell lysis solution ("amplitude 6, 3 min")
-    p_300.starting_tip = tiprack_7.well('A1') 
-    p_300.transfer (120, reservoir_plate.wells_by_name ()['A2'], [square_plate.wells_by_name ()[well_name] for well_name in column_list], mix_after = (7, 150), new_tip = 'always', blow_out = True, blowout_location='destination well')
-    protocol.comment('Pausing operation for 3 minutes to improve lysis.')
-    protocol.delay(minutes=3)
+    def lysis ():
+        checkpoint.run ('lysis solution', add_from_top, p_300, levels, tips ['lysis solution'] [0], 120, reservoir_plate.wells_by_name ()['A2'], [square_plate.wells_by_name ()[well_name] for well_name in column_list])
+        mix_lysate ('lysis mixing', 'gentle lysis', last_step = False)
 
     # neutralization buffer ("amplitude 7, 3 min")
-    p_300.starting_tip = tiprack_8.well('A1') 
-    p_300.transfer (120, reservoir_plate.wells_by_name ()['A3'], [square_plate.wells_by_name ()[well_name] for well_name in column_list], mix_after = (10, 250), blow_out = True, blowout_location='destination well', new_tip = 'always')
-    protocol.comment('Pausing operation for 2 minutes to allow settling of debris.')
-    protocol.delay(minutes=2)
+    def neutralization ():
+        checkpoint.run ('neutralization solution', add_from_top, p_300, levels, tips ['neutralization solution'] [0], 120, reservoir_plate.wells_by_name ()['A3'], [square_plate.wells_by_name ()[well_name] for well_name in column_list])
+        mix_lysate ('neutralization mixing', 'neutralization', last_step = True)
 
     # MagnesilBlue ("amplitude 8, 1 min"), Mixing before aspiration to distribute beads evenly
     # transferring samples to clearing plate
     # Tips used for adding MagnesilBlue are also used to transfer samples to new plate
-    p_300.starting_tip = tiprack_9.well('A1') 
-    i = 0
-    while i < len(column_list): #len = number of columns
-        p_300.pick_up_tip()
-        p_300.transfer (25, reservoir_plate.wells_by_name ()['A4'], square_plate [column_list [i]], mix_before = (10, 300), mix_after = (15, 250), new_tip = "never") 
-        p_300.transfer (300, square_plate [column_list [i]], magnetic_plate [column_list [i]], blow_out = True, blowout_location='destination well', new_tip = "never") 
-        p_300.drop_tip()
-        i= i + 1
+    def clearing ():
+        for i in checkpoint.columns ('clearing', column_list):
+            p_300.pick_up_tip (tips ['MagnesilBlue and clearing'] [i])
+            levels.remove (p_300, 25, reservoir_plate.wells_by_name ()['A4'])
+            mix ('MagnesilBlue suspension', reservoir_plate.wells_by_name ()['A4'])
+            p_300.aspirate (25, reservoir_plate.wells_by_name ()['A4'])
+            p_300.dispense (25, square_plate [column_list [i]])
+            mix ('MagnesilBlue mixing', square_plate [column_list [i]])
+            p_300.transfer (300, square_plate [column_list [i]], magnetic_plate [column_list [i]], blow_out = True, blowout_location='destination well', new_tip = "never") 
+            levels.add (p_300, 300, magnetic_plate [column_list [i]])
+            p_300.drop_tip()
 
     # engage magnets and allow pellet to form for 10 min
-    magnetic_module.engage (height_from_base = mag_height)
-    protocol.comment ('Pausing operation for 7 minutes to allow pellets to form')
-    protocol.delay (minutes = 7)
+    def clearing_pellet ():
+        magnetic_module.engage (height_from_base = mag_height)
 
-    # MagnesilRed
-    p_300.starting_tip = tiprack_10.well('A1') 
-    p_300.transfer (50, reservoir_plate.wells_by_name ()['A5'], [deck_plate.wells_by_name ()[well_name] for well_name in column_list], mix_before = (15, 300), blow_out = True, blowout_location='destination well', new_tip = 'once', trash = False)
-    p_300.reset_tipracks()
+    # MagnesilRed goes into the empty binding plate, so every aspiration serves as many columns as fit into the tip (see multi_dispense)
+    # the beads are resuspended before the aspiration, the same tip is used for all batches and returned to its rack in between
+    red_batch = int ((p_300.max_volume - disposal_volume - air_gap) // 50)
+    red_batches = [column_list [k:k + red_batch] for k in range (0, len (column_list), red_batch)]
+    def magnesil_red (well_names):
+        p_300.pick_up_tip (tips ['MagnesilRed'] [0])
+        levels.remove (p_300, 50 * len (well_names), reservoir_plate.wells_by_name ()['A5'])
+        multi_dispense (p_300, 50, reservoir_plate.wells_by_name ()['A5'], [deck_plate [well_name] for well_name in well_names], disposal_volume, air_gap,
+                        prepare = functools.partial (mix, 'MagnesilRed suspension', reservoir_plate.wells_by_name ()['A5']))
+        for well_name in well_names:
+            levels.add (p_300, 50, deck_plate [well_name])
+        p_300.return_tip ()
 
     # carefully transfer samples without pellet to binding plate and mixing with MagnesilRed (2 x 2 min at amplitude 6)
-    p_300.starting_tip = tiprack_10.well('A1')
-    i = 0
-    while i < len(column_list): #len = number of columns
-        p_300.pick_up_tip()
-        p_300.aspirate (240, magnetic_plate [column_list [i]], rate = 0.16) # "rate" is the multiplication factor of the pipette's default aspirate flow rate (0.16 = 25 µl/s)
-        p_300.dispense (240, deck_plate [column_list [i]], rate = 1)        # "rate" is the multiplication factor of the pipette's default dispense flow rate (1 = 300 µl/s)
-        j = 0
-        for j in range (15): # mixing repetitions
-            p_300.aspirate (250, deck_plate [column_list [i]], rate = 0.66) # = 100 µl/s
-            p_300.dispense (250, deck_plate [column_list [i]], rate = 0.33) # = 100 µl/s
-        p_300.blow_out () # blow out at current position
-        p_300.drop_tip ()
-        i = i + 1
+    # the tips are kept for removing the supernatant from the same column later on
+    def binding ():
+        for i in checkpoint.columns ('binding', column_list):
+            p_300.pick_up_tip (tips ['binding and supernatant removal'] [i])
+            levels.aspirate (p_300, 240, magnetic_plate [column_list [i]], **above_pellet (rate = 0.16)) # "rate" is the multiplication factor of the pipette's default aspirate flow rate (0.16 = 25 µl/s)
+            p_300.dispense (240, deck_plate [column_list [i]], rate = 1)        # "rate" is the multiplication factor of the pipette's default dispense flow rate (1 = 300 µl/s)
+            levels.add (p_300, 240, deck_plate [column_list [i]])
+            mix ('bead binding', deck_plate [column_list [i]])
+            p_300.blow_out () # blow out at current position
+            p_300.return_tip ()
 
-    # pause protocol until binding plate is placed on magnetic module and tip racks are refilled
-    protocol.pause ('Please discard the clearing plate on the magnetic module and instead place the binding plate from position 2 on the magnetic module. Place a fresh collection plate on position 2. Please refill all tip racks. Press resume to continue protocol.')
-    
-    # reset tiprack tracking and start again with first tiprack
-    p_300.reset_tipracks()
+    red_steps = [{'name': 'MagnesilRed ' + ' '.join (batch), 'phase': 'binding', 'run': functools.partial (magnesil_red, batch), 'after': [], 'filler': True, 'duration': 60 + 8 * len (batch)} for batch in red_batches]
+    run_steps (protocol, [
+        {'name': 'resuspension', 'run': resuspension, 'after': []},
+        {'name': 'lysis', 'run': lysis, 'after': ['resuspension'], 'incubation': 3, 'message': 'Pausing operation for 3 minutes to improve lysis.'},
+        {'name': 'neutralization', 'run': neutralization, 'after': ['lysis'], 'incubation': 2, 'message': 'Pausing operation for 2 minutes to allow settling of debris.'},
+        {'name': 'clearing', 'run': clearing, 'after': ['neutralization']},
+        {'name': 'clearing pellet', 'run': clearing_pellet, 'after': ['clearing'], 'incubation': 7, 'message': 'Pausing operation for 7 minutes to allow pellets to form'}] + red_steps + [
+        {'name': 'binding', 'run': binding, 'after': ['clearing pellet'] + [step ['name'] for step in red_steps]}], checkpoint)
+
+    # pause protocol until binding plate is placed on magnetic module
+    protocol.comment('Phase: plate exchange')
+    def plate_exchange ():
+        protocol.pause ('Please discard the clearing plate on the magnetic module and instead place the binding plate from position 2 on the magnetic module. Place a fresh collection plate on position 2. Press resume to continue protocol.')
+        levels.exchange ('deck plate', 'magnetic plate')
+    checkpoint.run ('plate exchange', plate_exchange)
 
     # allow pellets to form (magnets still engaged)
+    protocol.comment('Phase: supernatant removal')
     protocol.comment ('Pausing operation for 1 minute to allow pellets to form')
-    protocol.delay (minutes = 1)
+    checkpoint.run ('supernatant pellet', protocol.delay, minutes = 1)
 
     # discard supernatant
-    i = 0
-    while i < len(column_list): #len = number of columns
-        p_300.starting_tip = tiprack_6.well('A1') 
-        p_300.pick_up_tip() 
-        p_300.aspirate(265, magnetic_plate [column_list[i]], rate = 0.16) # "rate" is the multiplication factor of the pipette's default aspirate flow rate (0.16 = 25 µl/s)
-        p_300.drop_tip()
-        i = i + 1
-
-    # Washing with 80% ethanol ("amplitude 4, 1 min")
-    p_300.flow_rate.dispense = 300
-    magnetic_module.disengage()
-    p_300.starting_tip = tiprack_7.well('A1')
-    p_300.flow_rate.aspirate = 150
-    p_300.transfer (100, reservoir_plate.wells_by_name ()['A6'], [magnetic_plate.wells_by_name ()[well_name] for well_name in column_list], mix_after = (7, 75), blow_out = True, blowout_location='destination well', new_tip = 'always', trash = False)
-    magnetic_module.engage (height_from_base = mag_height)
-    protocol.comment ('Pausing operation for 1 minute to allow pellets to form')
-    protocol.delay (minutes = 1)    
-    p_300.flow_rate.aspirate = 25
-    p_300.reset_tipracks()
-    p_300.starting_tip = tiprack_7.well('A1')
-    i = 0
-    while i < len(column_list): #len = number of columns
-        p_300.pick_up_tip()
-        p_300.aspirate(90, magnetic_plate [column_list[i]])
-        p_300.drop_tip()
-        i = i + 1
-
-    magnetic_module.disengage()
-    p_300.starting_tip = tiprack_8.well('A1')
-    p_300.flow_rate.aspirate = 150
-    p_300.transfer (100, reservoir_plate.wells_by_name ()['A7'], [magnetic_plate.wells_by_name ()[well_name] for well_name in column_list], mix_after = (7, 75), blow_out = True, blowout_location='destination well', new_tip = 'always', trash = False)
-    magnetic_module.engage (height_from_base = mag_height)
-    protocol.comment ('Pausing operation for 1 minute to allow pellets to form')
-    protocol.delay (minutes = 1)
-    p_300.flow_rate.aspirate = 25
-    p_300.reset_tipracks()
-    p_300.starting_tip = tiprack_8.well('A1')
-    i = 0
-    while i < len(column_list): #len = number of columns
-        p_300.pick_up_tip()
-        p_300.aspirate(90, magnetic_plate [column_list[i]])
-        p_300.drop_tip()
-        i = i + 1
-
-    magnetic_module.disengage()
-    p_300.starting_tip = tiprack_9.well('A1')
-    p_300.flow_rate.aspirate = 150
-    p_300.transfer (100, reservoir_plate.wells_by_name ()['A8'], [magnetic_plate.wells_by_name ()[well_name] for well_name in column_list], mix_after = (7, 75), blow_out = True, blowout_location='destination well', new_tip = 'always', trash = False)
-    magnetic_module.engage (height_from_base = mag_height)
-    protocol.comment ('Pausing operation for 1 minutes to allow pellets to form')
-    protocol.delay (minutes = 1)
-    p_300.flow_rate.aspirate = 25
-    p_300.reset_tipracks()
-    p_300.starting_tip = tiprack_9.well('A1')
-    i = 0
-    while i < len(column_list): #len = number of columns
-        p_300.pick_up_tip()
-        p_300.aspirate(110, magnetic_plate [column_list[i]])
-        p_300.drop_tip()
-        i = i + 1
-
-    # drying for at least 10 min
-    magnetic_module.disengage()
-    protocol.pause ('Pausing protocol execution until pellet has dried. Please press resume when residual ethanol has evaporated (approx. 45 min with air drying, can be accelerated by placing the plate in a drying oven)')
+    for i in checkpoint.columns ('supernatant removal', column_list):
+        discard (p_300, levels, [tips ['binding and supernatant removal'] [i]], 265, [magnetic_plate [column_list [i]]], protocol.fixed_trash ['A1'], last_step = True, **above_pellet (rate = 0.16)) # "rate" is the multiplication factor of the pipette's default aspirate flow rate (0.16 = 25 µl/s)
+
+    # Washing with 80% ethanol ("amplitude 4, 1 min"), ethanol is added from the top with one tip, mixing and removal use the tips of the wash
+    # magnet and flow rate changes belong to the unit that follows them, so that a resumed run restores them from the checkpoint instead of repeating them
+    def add_ethanol (reservoir_well):
+        magnetic_module.disengage()
+        p_300.flow_rate.aspirate = 150
+        add_from_top (p_300, levels, tips ['ethanol'] [0], 100, reservoir_plate.wells_by_name ()[reservoir_well], [magnetic_plate.wells_by_name ()[well_name] for well_name in column_list], keep_tip = True)
+
+    def wash_pellet ():
+        magnetic_module.engage (height_from_base = mag_height)
+        protocol.comment ('Pausing operation for 1 minute to allow pellets to form')
+        protocol.delay (minutes = 1)
+        p_300.flow_rate.aspirate = 25
+
+    for wash, (reservoir_well, removal_volume) in enumerate ([('A6', 90), ('A7', 90), ('A8', 110)]):
+        protocol.comment('Phase: wash {}'.format (wash + 1))
+        checkpoint.run ('wash {} ethanol'.format (wash + 1), add_ethanol, reservoir_well)
+        for i in checkpoint.columns ('wash {} mixing'.format (wash + 1), column_list):
+            p_300.pick_up_tip (tips ['wash {}'.format (wash + 1)] [i])
+            mix ('ethanol wash', magnetic_plate [column_list [i]])
+            p_300.blow_out (magnetic_plate [column_list [i]].top ())
+            p_300.return_tip ()
+        checkpoint.run ('wash {} pellet'.format (wash + 1), wash_pellet)
+        for i in checkpoint.columns ('wash {} removal'.format (wash + 1), column_list):
+            discard (p_300, levels, [tips ['wash {}'.format (wash + 1)] [i]], removal_volume, [magnetic_plate [column_list [i]]], protocol.fixed_trash ['A1'], last_step = True, **above_pellet ())
+
+    # drying for at least 10 min, the emptied tip racks are replaced meanwhile (see plan_tips)
+    protocol.comment('Phase: drying')
+    def drying ():
+        magnetic_module.disengage()
+        protocol.pause ('Pausing protocol execution until pellet has dried. Please replace the tip racks in slots {} with full ones and press resume when residual ethanol has evaporated (approx. 45 min with air drying, can be accelerated by placing the plate in a drying oven)'.format (', '.join (tip_slots [tipracks.index (rack)] for rack in refills [0])))
+        for rack in refills [0]:
+            rack.reset ()
+    checkpoint.run ('drying', drying)
     
     # elution of DNA ("amplitude 6, 2 min")
-    p_300.starting_tip = tiprack_10.well('A1')
-    i = 0
-    while i < len(column_list): #len = number of columns
-        p_300.pick_up_tip()
-        p_300.aspirate (100, reservoir_plate.wells_by_name ()['A9'], rate = 1) # = 150 µl/s)
+    protocol.comment('Phase: elution')
+    for i in checkpoint.columns ('elution', column_list):
+        p_300.pick_up_tip (tips ['elution'] [i])
+        levels.aspirate (p_300, 100, reservoir_plate.wells_by_name ()['A9'], rate = 1)
         p_300.dispense (100, magnetic_plate [column_list [i]], rate = 1)    # = 300 µl/s)
-        j = 0
-        for j in range (15): # mixing repetitions
-            p_300.aspirate (100, magnetic_plate [column_list [i]], rate = 1) # = 150 µl/s
-            p_300.dispense (100, magnetic_plate [column_list [i]], rate = 0.25) # = 75 µl/s
+        levels.add (p_300, 100, magnetic_plate [column_list [i]])
+        mix ('bead resuspension', magnetic_plate [column_list [i]])
         p_300.blow_out () # blow out at current position
         p_300.return_tip ()
-        i = i + 1
     protocol.comment('Pausing operation for 5 minutes to improve elution.')
-    protocol.delay(minutes=5)
-
-    p_300.reset_tipracks()
-    p_300.starting_tip = tiprack_10.well('A1')
-    i = 0
-    while i < len(column_list):
-        p_300.pick_up_tip()
-        j = 0
-        for j in range (15): # mixing repetitions
-            p_300.aspirate (100, magnetic_plate [column_list [i]], rate = 1) # = 150 µl/s
-            p_300.dispense (100, magnetic_plate [column_list [i]], rate = 0.25) # = 75 µl/s
+    checkpoint.run ('elution incubation', protocol.delay, minutes = 5)
+
+    for i in checkpoint.columns ('elution mixing', column_list):
+        p_300.pick_up_tip (tips ['elution'] [i])
+        mix ('bead resuspension', magnetic_plate [column_list [i]])
         p_300.blow_out () # blow out at current position
         p_300.drop_tip ()
-        i = i + 1
-    magnetic_module.engage (height_from_base = mag_height)
 
     # pausing to pellet residual particles
-    protocol.comment ('Pausing operation for 10 minutes to remove residual particles')
-    protocol.delay (minutes = 10) 
+    def elution_pellet ():
+        magnetic_module.engage (height_from_base = mag_height)
+        protocol.comment ('Pausing operation for 10 minutes to remove residual particles')
+        protocol.delay (minutes = 10) 
+    checkpoint.run ('elution pellet', elution_pellet)
 
     # collecting eluate (80 µl - 90 µl) 
-    p_300.starting_tip = tiprack_11.well('A1')
+    protocol.comment('Phase: eluate collection')
+    # the eluate is moved from the magnetic module to the same well of the plate on position 2, aspirated from below its surface
+    def collect_eluate (volume, well_name):
+        levels.aspirate (p_300, volume, magnetic_plate [well_name], **above_pellet ())
+        p_300.dispense (volume, deck_plate [well_name])
+        levels.add (p_300, volume, deck_plate [well_name])
+        p_300.blow_out (deck_plate [well_name].top ())
+
     p_300.flow_rate.aspirate = 25
-    p_300.transfer (80, [magnetic_plate.wells_by_name ()[well_name] for well_name in column_list], [deck_plate.wells_by_name ()[well_name] for well_name in column_list], blow_out = True, blowout_location='destination well', new_tip = 'always')
+    for i in checkpoint.columns ('eluate collection', column_list):
+        p_300.pick_up_tip (tips ['eluate collection'] [i])
+        collect_eluate (80, column_list [i])
+        p_300.drop_tip ()
 
     # additional step in case collected eluate is not yet clear
-    protocol.pause ('Please check if brown residue can be seen in collection plate on position 2. If this is not the case, you can now stop the protocol and use the purified plasmids in the collection plate. If you do see residue, place the plate from position 2 on the magnetic module and provide a fresh plate for position 2. Fill up tiprack on position 11 and resume.')
-    p_300.reset_tipracks()
-    p_300.starting_tip = tiprack_11.well('A1') 
-    p_300.flow_rate.aspirate = 25
-    p_300.transfer (75, [magnetic_plate.wells_by_name ()[well_name] for well_name in column_list], [deck_plate.wells_by_name ()[well_name] for well_name in column_list], blow_out = True, blowout_location='destination well', new_tip = 'always')
+    protocol.comment('Phase: eluate clearing')
+    def eluate_check ():
+        protocol.pause ('Please check if brown residue can be seen in collection plate on position 2. If this is not the case, you can now stop the protocol and use the purified plasmids in the collection plate. If you do see residue, place the plate from position 2 on the magnetic module and provide a fresh plate for position 2 and resume.')
+        levels.exchange ('deck plate', 'magnetic plate')
+    checkpoint.run ('eluate check', eluate_check)
+    for i in checkpoint.columns ('eluate clearing', column_list):
+        p_300.pick_up_tip (tips ['eluate clearing'] [i])
+        collect_eluate (75, column_list [i])
+        p_300.drop_tip ()
+    checkpoint.clear ()
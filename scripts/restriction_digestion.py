@@ -1,11 +1,139 @@
+import csv
+import io
+import json
+import time
+
 from opentrons import protocol_api
 
 metadata = {
     'protocolName': 'restriction_digestion',
     'author': 'Carolin Müller, Vera Waffenschmidt',
-    'description': 'Protocol for restriction digestion using the Opentrons OT-2 with Thermocycler Module. In this example, two different reaction mixes are added depending on the sample',
+    'description': 'Protocol for restriction digestion using the Opentrons OT-2 with Thermocycler Module. In this example, two different reaction mixes are added depending on the sample. The reaction mix is pipetted first and the DNA is added to it and mixed (earlier versions added the DNA first)',
     'apiLevel': '2.8'}
 
+# sample manifest, keep identical in all protocols that read a manifest
+# A manifest is CSV text with a header line or a JSON list of objects with one entry per sample:
+# 'well' (well of the sample plate, 'A1:H3' stands for all wells from A1 to H3), 'sample' (name, optional),
+# 'mix' (reaction mix, optional) and 'replicates' (optional, 1 if not given).
+def expand_wells (text):
+    text = text.strip ().upper ()
+    if ':' not in text:
+        return [text]
+    first, last = text.split (':')
+    letters = 'ABCDEFGH'
+    rows = letters [letters.index (first [0]):letters.index (last [0]) + 1]
+    return [row + str (column) for column in range (int (first [1:]), int (last [1:]) + 1) for row in rows]
+
+def read_manifest (text, path = None):
+    # a manifest file given by path replaces the text
+    if path is not None:
+        with open (path, encoding = 'utf-8') as f:
+            text = f.read ()
+    text = text.strip ()
+    rows = json.loads (text) if text.startswith ('[') else list (csv.DictReader (io.StringIO (text)))
+    samples = {}
+    for row in rows:
+        for well in expand_wells (str (row ['well'])):
+            if well in samples:
+                raise ValueError ('Well {} is listed twice in the manifest'.format (well))
+            samples [well] = {'well': well,
+                              'sample': row.get ('sample') or well,
+                              'mix': str (row.get ('mix') or '').strip () or None,
+                              'replicates': int (row.get ('replicates') or 1)}
+    if not samples:
+        raise ValueError ('The manifest lists no samples')
+    return list (samples.values ())
+
+def transfer_plan (samples, single_channel = True):
+    # samples are processed column by column, empty columns are skipped
+    # a full column with one reaction mix is a single multichannel transfer from row A, the samples of partial columns
+    # are transferred one by one with a single-channel pipette or, without one, together as a whole column
+    columns = {}
+    for sample in samples:
+        columns.setdefault (int (sample ['well'] [1:]), []).append (sample)
+    plan = []
+    for column in sorted (columns):
+        members = sorted (columns [column], key = lambda sample: sample ['well'] [0])
+        mixes = set (sample ['mix'] for sample in members)
+        replicates = max (sample ['replicates'] for sample in members)
+        if len (mixes) == 1 and (len (members) == 8 or not single_channel):
+            plan.append ({'column': str (column), 'well': 'A' + str (column), 'channels': 8, 'mix': members [0] ['mix'], 'replicates': replicates})
+        elif single_channel:
+            for sample in members:
+                plan.append ({'column': str (column), 'well': sample ['well'], 'channels': 1, 'mix': sample ['mix'], 'replicates': replicates})
+        else:
+            raise ValueError ('Column {} contains different reaction mixes, which needs a single-channel pipette'.format (column))
+    return plan
+
+def describe_plan (samples, plan):
+    multi = sum (1 for step in plan if step ['channels'] > 1)
+    return 'Manifest: {} samples in {} columns, {} multichannel and {} single-channel transfers per step'.format (
+        len (samples), len (set (step ['column'] for step in plan)), multi, len (plan) - multi)
+
+# reagent dispensing, keep identical in all protocols that dispense reagents
+# A reagent for wells that are still empty is dispensed with one tip: every aspiration takes up the reagent for as many wells as fit into the tip
+# together with a disposal volume and an air gap, the air gap is drawn again before every dispense so that nothing drips on the way, and the
+# disposal volume is blown out back into the source after the last well of an aspiration. The caller picks up and drops the tip.
+# prepare (optional) is called before every aspiration, e.g. to resuspend beads.
+def multi_dispense (pipette, volume, source, wells, disposal_volume, air_gap, prepare = None):
+    per_aspiration = int ((pipette.max_volume - disposal_volume - air_gap) // volume)
+    if per_aspiration < 1:
+        raise ValueError ('{} µl do not fit into the tip together with {} µl disposal volume and {} µl air gap'.format (volume, disposal_volume, air_gap))
+    for k in range (0, len (wells), per_aspiration):
+        batch = wells [k:k + per_aspiration]
+        if prepare is not None:
+            prepare ()
+        pipette.aspirate (volume * len (batch) + disposal_volume, source)
+        for well in batch:
+            if air_gap:
+                pipette.air_gap (air_gap)
+            pipette.dispense (volume + air_gap, well)
+        pipette.blow_out (source.top ())
+
+# wells_by_name () and indexing create new well objects, so wells are the same if they have the same labware and name
+def same_well (a, b):
+    return a.parent is b.parent and a.well_name == b.well_name
+
+# names of the destination wells of a step of a transfer plan
+def step_wells (step):
+    if step ['channels'] == 1:
+        return [step ['well']]
+    return [row + step ['column'] for row in 'ABCDEFGH']
+
+# adds volume of a reagent to the destination wells of the plan steps, source (step) gives the source well of a step
+# Steps whose wells are all still empty are served by multi_dispense with one tip per pipette and source well, the other steps get a transfer
+# with a fresh tip per step and the transfer_options. filled holds the names of the destination wells that already hold liquid and is updated.
+def dispense_reagent (pipettes, plan, volume, source, destination, filled, disposal_volume, air_gap, **transfer_options):
+    groups = []     # [channels, source well, destination wells] per multi-dispense
+    for step in plan:
+        if any (well in filled for well in step_wells (step)):
+            pipettes [step ['channels']].transfer (volume, source (step), destination [step ['well']], new_tip = 'always', **transfer_options)
+        else:
+            for group in groups:
+                if group [0] == step ['channels'] and same_well (group [1], source (step)):
+                    group [2].append (destination [step ['well']])
+                    break
+            else:
+                groups.append ([step ['channels'], source (step), [destination [step ['well']]]])
+        filled.update (step_wells (step))
+    for channels, well, wells in groups:
+        pipettes [channels].pick_up_tip ()
+        multi_dispense (pipettes [channels], volume, well, wells, disposal_volume, air_gap)
+        pipettes [channels].drop_tip ()
+
+# non-blocking Thermocycler holds
+# start_hold brings the block to temperature and starts a timer instead of holding, the robot is free for other work until
+# await_hold waits for the rest of the hold time
+def start_hold (protocol, tc_mod, temperature, minutes, block_max_volume):
+    tc_mod.set_block_temperature (temperature, block_max_volume = block_max_volume)
+    protocol.comment ('Holding {} °C for {} min'.format (temperature, minutes))
+    return time.monotonic () + 60 * minutes
+
+def await_hold (protocol, end):
+    remaining = end - time.monotonic ()
+    if remaining > 0:
+        protocol.delay (seconds = remaining, msg = 'Waiting for the end of the hold')
+
 def run(protocol: protocol_api.ProtocolContext):
     
     # load module
@@ -20,47 +148,84 @@ def run(protocol: protocol_api.ProtocolContext):
     tiprack_1 = protocol.load_labware ('vwr_96_tiprack_10ul_short', '3')
     tiprack_2 = protocol.load_labware ('vwr_96_tiprack_10ul_short', '6')
 
+    # samples on the plasmid plate, CSV or JSON (see read_manifest), adjust if necessary
+    # "mix" is the column of the reaction mix plate holding the reaction mix for the sample, samples without mix only get DNA
+    manifest = """
+well,mix
+A1:H3,1
+A4:H4,
+A5:H6,2
+A7:H7,1
+"""
+    manifest_file = None        # path of a manifest file on the robot, e.g. '/data/user_storage/manifest.csv', replaces the manifest above
+    single_channel = None       # e.g. 'p20_single_gen2' on the left mount for samples in partial columns, None processes partial columns with the multichannel pipette
+
+    # reagent dispensing into empty wells (see multi_dispense), adjust if necessary
+    disposal_volume = 2         # µl
+    air_gap = 1                 # µl
+
     #load pipette
     p_20multi = protocol.load_instrument ('p20_multi_gen2', 'right', tip_racks = [tiprack_1, tiprack_2])
+    p_20single = protocol.load_instrument (single_channel, 'left', tip_racks = [tiprack_1, tiprack_2]) if single_channel else None
+    pipettes = {8: p_20multi, 1: p_20single}
 
-    #define columns
-    column_list = ['A1', 'A2', 'A3', 'A4', 'A5', 'A6','A7'] # all columns used
-    master_list_1 = ['A1', 'A2', 'A3', 'A7']    # columns where first reaction mix is added
-    master_list_2 = ['A5', 'A6']        # columns where second reaction mix is added
-    
-    # transfer 3 µl DNA from plasmid_plate into tc_plate    
-    tc_mod.open_lid ()
-    p_20multi.transfer (3, [plasmid_plate.wells_by_name ()[well_name] for well_name in column_list], [tc_plate.wells_by_name ()[well_name] for well_name in column_list], new_tip = 'always', blow_out = True, blowout_location='destination well')
+    # compile the manifest into one transfer per full column and per sample of a partial column
+    samples = read_manifest (manifest, manifest_file)
+    plan = transfer_plan (samples, single_channel = p_20single is not None)
+    protocol.comment (describe_plan (samples, plan))
 
     # cool down thermocycler and add plate with reaction mix(es)
+    protocol.comment('Phase: reaction mix')
+    tc_mod.open_lid ()
     tc_mod.set_block_temperature (0)
     protocol.pause ('Please place PCR plate containing reaction mixes on cooling carrier')     
 
-    # transfer 7 µl reaction mix from first column in first set of samples
-    p_20multi.transfer (7, mastermix.wells_by_name ()['A1'], [tc_plate.wells_by_name ()[column_name] for column_name in master_list_1], mix_after = (3, 10), new_tip = 'always', blow_out = True, blowout_location='destination well')
+    # 7 µl reaction mix first (earlier versions added the DNA first), from the same row of the reaction mix column, the wells of tc_plate are still empty,
+    # so one tip per reaction mix dispenses it to all of its wells (see dispense_reagent)
+    filled = set ()
+    dispense_reagent (pipettes, [step for step in plan if step ['mix'] is not None], 7, lambda step: mastermix [step ['well'] [0] + step ['mix']], tc_plate, filled, disposal_volume, air_gap, mix_after = (3, 10), blow_out = True, blowout_location='destination well')
 
-    # transfer 7 µl reaction mix from second column in second set of samples
-    p_20multi.transfer (7, mastermix.wells_by_name ()['A2'], [tc_plate.wells_by_name ()[column_name] for column_name in master_list_2], mix_after = (3, 10), new_tip = 'always', blow_out = True, blowout_location='destination well')
+    # transfer 3 µl DNA from plasmid_plate into tc_plate and mix it with the reaction mix
+    protocol.comment('Phase: DNA transfer')
+    for step in plan:
+        mix_after = (3, 10) if step ['mix'] is not None else None
+        pipettes [step ['channels']].transfer (3, plasmid_plate [step ['well']], tc_plate [step ['well']], mix_after = mix_after, new_tip = 'always', blow_out = True, blowout_location='destination well')
 
     # start digestion, adjust if necessary
+    protocol.comment('Phase: digestion')
     tc_mod.close_lid ()
     tc_mod.set_lid_temperature(40)
-    tc_mod.set_block_temperature (37, hold_time_minutes=60, block_max_volume=10)
+    digestion = start_hold (protocol, tc_mod, 37, 60, 10)
+
+    # dispense water into dilution plate for a 3x dilution of DNA samples for capillary electrophoresis during the digestion, adjust if necessary
+    protocol.comment('Phase: water for dilution')
+    for channels, pipette in pipettes.items ():
+        targets = [dilution_plate [step ['well']] for step in plan if step ['channels'] == channels]
+        if targets:
+            pipette.transfer (6, water_plate.wells_by_name ()['A1'], targets, new_tip = 'once', blow_out = True, blowout_location='destination well')
+    protocol.comment('Phase: digestion')
+    await_hold (protocol, digestion)
 
     # heat inactivation, adjust if necessary
+    protocol.comment('Phase: inactivation')
     tc_mod.set_lid_temperature(85)
     tc_mod.set_block_temperature (80, hold_time_minutes=20, block_max_volume=10)
     tc_mod.set_block_temperature (20)
     tc_mod.deactivate()
     tc_mod.open_lid ()
 
-    # fill up tip racks for dilution of digested DNA for capillary electrophoresis
-    protocol.pause ('Please fill up tip racks. Press resume to proceed to sample dilution.')
-    p_20multi.reset_tipracks()
-    p_20multi.starting_tip = tiprack_1.well('A1')
-  
-    # dispense water into dilution plate for a 3x dilution of DNA samples for capillary electrophoresis, adjust if necessary
-    p_20multi.transfer (6, water_plate.wells_by_name ()['A1'], [dilution_plate.wells_by_name ()[well_name] for well_name in column_list], new_tip = 'once', blow_out = True, blowout_location='destination well')
+    # fill up tip racks for dilution of digested DNA for capillary electrophoresis, only if the remaining tips do not suffice
+    # (every transfer is counted as a full tip column, single-channel pickups may break one)
+    protocol.comment('Phase: dilution')
+    remaining = sum (1 for rack in [tiprack_1, tiprack_2] for column in rack.columns () if all (well.has_tip for well in column))
+    if remaining < len (plan):
+        protocol.pause ('Please fill up tip racks. Press resume to proceed to sample dilution.')
+        # both pipettes share the tip racks, so both have to forget the tips they used
+        for pipette in pipettes.values ():
+            if pipette is not None:
+                pipette.reset_tipracks()
+                pipette.starting_tip = tiprack_1.well('A1')
 
     # dispense DNA samples into dilution plate for a 3x dilution for capillary electrophoresis, adjust if necessary
-    p_20multi.transfer (3, [tc_plate.wells_by_name ()[well_name] for well_name in column_list], [dilution_plate.wells_by_name ()[well_name] for well_name in column_list], mix_after = (3, 10), new_tip = 'always', blow_out = True, blowout_location='destination well')
+    for step in plan:
+        pipettes [step ['channels']].transfer (3, tc_plate [step ['well']], dilution_plate [step ['well']], mix_after = (3, 10), new_tip = 'always', blow_out = True, blowout_location='destination well')
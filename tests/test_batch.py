@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+
+from autoclone import batch
+from autoclone.benchmark import SCRIPTS_DIR
+
+DIGESTION = os.path.join(SCRIPTS_DIR, 'restriction_digestion.py')
+
+
+def samples(count, mix=None, replicates=1):
+    return [{'sample': f'{mix or "s"}{k}', 'mix': mix, 'replicates': replicates} for k in range(count)]
+
+
+class ColumnPlanner(batch.Planner):
+    # a minute per column and plate, so that the partition does not need simulations
+    def plate_runtime(self, columns):
+        return 60.0 * (len(columns) + 1)
+
+
+class BatchTest(unittest.TestCase):
+    def test_read_batch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'batch.csv')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('sample,mix,replicates\npUC19,1,2\n,,\n')
+            self.assertEqual(batch.read_batch(path), [
+                {'sample': 'pUC19', 'mix': '1', 'replicates': 2},
+                {'sample': 'sample 2', 'mix': None, 'replicates': 1}])
+
+    def test_pack_columns(self):
+        columns = batch.pack_columns(samples(10, '1') + samples(3, '2') + samples(7, '1'))
+        self.assertEqual([len(column) for column in columns], [8, 8, 1, 3])
+        self.assertEqual([column[0]['mix'] for column in columns], ['1', '1', '1', '2'])
+        self.assertEqual(columns[1][2]['sample'], '10')
+
+    def test_plate_manifest(self):
+        manifest = batch.plate_manifest(batch.pack_columns(samples(2, '1', replicates=3)))
+        self.assertEqual(manifest, 'well,sample,mix,replicates\nA1,10,1,3\nB1,11,1,3')
+        self.assertEqual(batch.plate_manifest([samples(1)]), 'well,sample\nA1,s0')
+
+    def test_with_manifest(self):
+        with open(DIGESTION, encoding='utf-8') as f:
+            source = f.read()
+        replaced = batch.with_manifest(source, 'well,sample\nA1,s0')
+        self.assertIn('    manifest = """\nwell,sample\nA1,s0\n"""', replaced)
+        with self.assertRaises(ValueError):
+            batch.with_manifest(source, 'well,sample\nA1,"""')
+        with self.assertRaises(ValueError):
+            batch.with_manifest('def run(protocol):\n    pass\n', '')
+
+    def test_partition_balances_the_slowest_robot(self):
+        planner = ColumnPlanner(DIGESTION, changeover=0)
+        columns = batch.pack_columns(samples(8 * 30))
+        ranges = planner.partition(columns, 3)
+        self.assertEqual([len(part) for part in ranges], [10, 10, 10])
+        self.assertEqual([column for part in ranges for column in part], columns)
+
+    def test_partition_counts_plates_and_changeovers(self):
+        planner = ColumnPlanner(DIGESTION, changeover=15)
+        columns = batch.pack_columns(samples(8 * 13))
+        self.assertEqual([len(plate) for plate in planner.plates(columns)], [12, 1])
+        self.assertEqual(planner.runtime(columns), 60.0 * 13 + 120.0 + 15 * 60.0)
+        # a second plate on one robot costs more than a plate on another robot
+        self.assertEqual([len(part) for part in planner.partition(columns, 2)], [7, 6])
+
+    def test_partition_leaves_idle_robots_last(self):
+        planner = ColumnPlanner(DIGESTION)
+        ranges = planner.partition(batch.pack_columns(samples(8)), 3)
+        self.assertEqual([len(part) for part in ranges], [1, 0, 0])
+
+    def test_plate_runtime_of_the_protocol(self):
+        planner = batch.Planner(DIGESTION)
+        columns = batch.pack_columns(samples(8, '1') + samples(8, '2'))
+        one, two = planner.plate_runtime(columns[:1]), planner.plate_runtime(columns)
+        self.assertGreater(two, one)
+        self.assertEqual(len(planner.plate_runtimes), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from autoclone import generate
+from autoclone.benchmark import SCRIPTS_DIR
+from autoclone.robot import simulate
+
+TEMPLATE = '''from opentrons import protocol_api, types
+
+metadata = {'apiLevel': '2.8'}
+
+
+def run(protocol):
+    volume = 5              # µl
+    label = 'plate µ'
+    rows = ['A', 'B']
+    plate = protocol.load_labware('biorad_96_wellplate_200ul_pcr', '1')
+    tips = protocol.load_labware('opentrons_96_tiprack_20ul', '2')
+    p20 = protocol.load_instrument('p20_single_gen2', 'right', tip_racks=[tips])
+    p20.pick_up_tip()
+    for row in rows:
+        p20.aspirate(volume, plate[row + '1'])
+        p20.dispense(volume, plate[row + '2'].bottom(2))
+        p20.aspirate(volume, plate[row + '3'].center())
+        p20.dispense(volume, plate[row + '4'].top(-1).move(types.Point(x=1)))
+    p20.drop_tip()
+'''
+
+
+class GenerateTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.template = os.path.join(directory.name, 'template.py')
+        self.output = os.path.join(directory.name, 'generated.py')
+        with open(self.template, 'w', encoding='utf-8') as f:
+            f.write(TEMPLATE)
+
+    def test_settings_are_plain_values(self):
+        self.assertEqual(list(generate.settings(TEMPLATE)), ['volume', 'label', 'rows'])
+
+    def test_with_parameters(self):
+        source = generate.with_parameters(TEMPLATE, {'rows': ['C'], 'label': 'µ plate', 'volume': 7.5})
+        self.assertIn("    volume = 7.5              # µl\n    label = 'µ plate'\n    rows = ['C']\n", source)
+        self.assertEqual(generate.with_parameters(TEMPLATE, {}), TEMPLATE)
+        with self.assertRaisesRegex(ValueError, 'unknown parameters plate'):
+            generate.with_parameters(TEMPLATE, {'plate': None})
+
+    def test_locations_as_built_by_the_template(self):
+        text, commands, _, _ = generate.generate(self.template, {'volume': 4, 'rows': ['B']}, self.output)
+        self.assertEqual(commands, 6)
+        self.assertIn('# Parameters: {"volume": 4, "rows": ["B"]}', text)
+        self.assertIn('from opentrons import protocol_api, types\n', text)
+        lines = [line.strip() for line in text.splitlines()]
+        self.assertEqual(lines[-6:], [
+            'pipette_right.pick_up_tip(wells_2[0])',
+            'pipette_right.aspirate(4, wells_1[1])',
+            'pipette_right.dispense(4, wells_1[9].bottom(2))',
+            'pipette_right.aspirate(4, wells_1[17].center())',
+            'pipette_right.dispense(4, wells_1[25].top(-1).move(types.Point(x=1)))',
+            'pipette_right.drop_tip()'])
+
+    def test_generated_protocol_repeats_the_template(self):
+        template = os.path.join(SCRIPTS_DIR, 'golden_gate_assembly_mixing.py')
+        parameters = {'manifest': 'well\nA1:H3\n'}
+        text, _, _, _ = generate.generate(template, parameters, self.output)
+        with open(template, encoding='utf-8') as f:
+            recorded = simulate(template, source=generate.with_parameters(f.read(), parameters)).commands
+        self.assertEqual(generate.differences(recorded, simulate(self.output, source=text).commands), [])
+        self.assertNotIn('transfer(', text)
+
+    def test_refuses_protocols_that_measure_time(self):
+        with self.assertRaisesRegex(ValueError, 'measures time'):
+            generate.generate(os.path.join(SCRIPTS_DIR, 'plasmid_purification.py'), {}, self.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
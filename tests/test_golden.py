@@ -0,0 +1,50 @@
+import os
+import unittest
+
+from autoclone import golden
+from autoclone.benchmark import SCRIPTS_DIR, protocol_name, protocol_paths
+from autoclone.generate import with_parameters
+
+SPOTTING = os.path.join(SCRIPTS_DIR, 'distributing_cells_on_agar_plates.py')
+
+
+def spotting_source(**parameters):
+    with open(SPOTTING, encoding='utf-8') as f:
+        return with_parameters(f.read(), parameters)
+
+
+class GoldenTraceTest(unittest.TestCase):
+    def test_protocols_match_golden_traces(self):
+        for path in protocol_paths():
+            with self.subTest(protocol=protocol_name(path)):
+                differences = golden.check(path)
+                self.assertEqual(differences, [], '\n'.join(
+                    differences + ['run python -m autoclone.golden --update if the change is intended']))
+
+    def test_volume_change(self):
+        differences = golden.check(SPOTTING, source=spotting_source(spot_volume=9))
+        self.assertTrue(any('volume 8 -> 9' in difference for difference in differences), differences)
+
+    def test_tip_change(self):
+        differences = golden.check(SPOTTING, source=spotting_source(manifest='well,replicates\nA1:H11,4\n'))
+        self.assertIn('tips 96 -> 88', differences)
+        self.assertTrue(any(' removed: ' in difference for difference in differences), differences)
+
+    def test_order_change(self):
+        header, entries = golden.load_trace(golden.golden_path(SPOTTING))
+        pickups = [k for k, entry in enumerate(entries) if entry['command'] == 'pick_up_tip']
+        swapped = list(entries)
+        swapped[pickups[0]], swapped[pickups[1]] = swapped[pickups[1]], swapped[pickups[0]]
+        differences = golden.compare_traces((header, entries), (header, swapped))
+        self.assertEqual(len(differences), 2, differences)
+
+    def test_runtime_change(self):
+        header, entries = golden.load_trace(golden.golden_path(SPOTTING))
+        slower = dict(header, total_seconds=header['total_seconds'] * 1.05)
+        faster = dict(header, total_seconds=header['total_seconds'] * 0.995)
+        self.assertEqual(len(golden.compare_traces((header, entries), (slower, entries))), 1)
+        self.assertEqual(golden.compare_traces((header, entries), (faster, entries)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
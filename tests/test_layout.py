@@ -0,0 +1,48 @@
+import os
+import unittest
+
+from autoclone import layout
+from autoclone.benchmark import SCRIPTS_DIR
+
+MIXING = os.path.join(SCRIPTS_DIR, 'heat-shock_transformation_mixing.py')
+TRANSFORMATION = os.path.join(SCRIPTS_DIR, 'heat-shock_transformation.py')
+
+
+class LayoutTest(unittest.TestCase):
+    def test_pinned_slots(self):
+        source = '\n'.join([
+            "    plate = protocol.load_labware ('biorad_96_wellplate_200ul_pcr', '4')",
+            '    # labware for the transformation only (do not occupy these positions)',
+            "    tips = protocol.load_labware ('vwr_96_tiprack_300ul', '3')",
+            "    reservoir = protocol.load_labware('agilent_12_reservoir_21ml','9')",
+            '',
+            "    agar = protocol.load_labware ('agarplate_96_wellplate_5ul', '1')"])
+        self.assertEqual(layout.pinned_slots(source), {'3', '9'})
+
+    def test_shared_positions_stay(self):
+        proposal = layout.propose(MIXING, restarts=2)
+        self.assertEqual([slot for _, slot in proposal['pinned']], ['1', '3', '6', '9'])
+        targets = [target for _, _, target in proposal['moves']]
+        self.assertFalse({'1', '3', '6', '9'} & set(targets), proposal['moves'])
+        self.assertLessEqual(proposal['travel_after'], proposal['travel_before'])
+
+    def test_shared_positions_stay_in_the_next_stage(self):
+        self.assertEqual(layout.shared_slots(MIXING), {'1', '3', '6', '9'})
+        self.assertTrue({'1', '3', '6', '9'} <= layout.shared_slots(TRANSFORMATION))
+
+    def test_dual_plate_slots_are_reserved(self):
+        with open(TRANSFORMATION, encoding='utf-8') as f:
+            self.assertEqual(layout.mode_slots(TRANSFORMATION, f.read()), {'4', '5'})
+        proposal = layout.propose(TRANSFORMATION, restarts=2)
+        pinned = {slot for _, slot in proposal['pinned']}
+        self.assertTrue({'1', '3', '4', '5', '6', '9'} <= pinned)
+        self.assertFalse(pinned & {target for _, _, target in proposal['moves']}, proposal['moves'])
+
+    def test_pinned_on_request(self):
+        proposal = layout.propose(MIXING, restarts=2, pinned=['4'])
+        self.assertNotIn('4', [slot for _, slot, _ in proposal['moves']])
+        self.assertIn('4', [slot for _, slot in proposal['pinned']])
+
+
+if __name__ == '__main__':
+    unittest.main()
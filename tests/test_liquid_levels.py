@@ -0,0 +1,38 @@
+import os
+import unittest
+
+from autoclone.benchmark import SCRIPTS_DIR
+from autoclone.generate import with_parameters
+from autoclone.robot import simulate
+
+PURIFICATION = os.path.join(SCRIPTS_DIR, 'plasmid_purification.py')
+CLEARANCE = 1               # mm, default clearance of LiquidLevels.aspirate
+
+
+def pellet_aspirations(**parameters):
+    with open(PURIFICATION, encoding='utf-8') as f:
+        protocol = simulate(PURIFICATION, source=with_parameters(f.read(), parameters))
+    magnet, = (slot for slot, module in protocol.loaded_modules.items() if module.module_type == 'magdeck')
+    return [command for command in protocol.commands if command['command'] == 'aspirate' and command['slot'] == magnet]
+
+
+class LiquidLevelsTest(unittest.TestCase):
+    def test_fast_aspirations_stay_above_the_slow_zone(self):
+        for slow_zone, fast_aspiration in [(2, 75), (4, 60)]:
+            with self.subTest(slow_zone=slow_zone):
+                aspirations = pellet_aspirations(slow_zone=slow_zone, fast_aspiration=fast_aspiration)
+                fast = [command for command in aspirations if abs(command['flow_rate'] - fast_aspiration) < 1e-6]
+                self.assertTrue(fast)
+                for command in fast:
+                    self.assertEqual(command['reference'][0], 'bottom')
+                    self.assertGreaterEqual(command['reference'][1], CLEARANCE + slow_zone - 1e-6, command)
+
+    def test_slow_aspirations_reach_the_clearance(self):
+        aspirations = pellet_aspirations()
+        slow = [command for command in aspirations if command['flow_rate'] < 75 - 1e-6]
+        self.assertTrue(slow)
+        self.assertAlmostEqual(min(command['reference'][1] for command in slow), CLEARANCE)
+
+
+if __name__ == '__main__':
+    unittest.main()
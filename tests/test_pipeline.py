@@ -0,0 +1,40 @@
+import unittest
+
+from autoclone import pipeline
+from autoclone.robot import simulate
+
+
+def pauses(source):
+    """Messages of the pauses of the pipeline and of the pauses it drops."""
+    commands = simulate(pipeline.OUTPUT, source=source).commands
+    paused = [command['message'] for command in commands if command['command'] == 'pause']
+    dropped = [command['message'] for command in commands
+               if command['command'] == 'comment' and command['message'].startswith('Not needed in the pipeline: ')]
+    return paused, dropped
+
+
+class PipelineTest(unittest.TestCase):
+    def test_protocol_is_up_to_date(self):
+        with open(pipeline.OUTPUT, encoding='utf-8') as f:
+            self.assertEqual(f.read(), pipeline.render(), 'run python -m autoclone.pipeline')
+
+    def test_only_plate_loading_pauses_are_dropped(self):
+        paused, dropped = pauses(pipeline.render())
+        self.assertEqual(len(dropped), 4)
+        self.assertTrue(all('plate' in message for message in dropped), dropped)
+        self.assertEqual([message.split(':')[0] for message in paused],
+                         ['Before transformation mixing', 'Before heat-shock transformation', 'Before additional plating'])
+
+    def test_dual_plate_hand_overs_pause_the_robot(self):
+        source = pipeline.render()
+        self.assertEqual(source.count('    second_plate = False'), 1)
+        paused, dropped = pauses(source.replace('    second_plate = False', '    second_plate = True'))
+        self.assertEqual(len(dropped), 4)
+        for hand_over in ('Please place the DNA plate for plate B', 'Please move plate A from the thermocycler block',
+                          'Please move plate B from the cooling carrier', 'Please place fresh agar plates for plate B'):
+            with self.subTest(hand_over=hand_over):
+                self.assertTrue(any(message.startswith(hand_over) for message in paused), paused)
+
+
+if __name__ == '__main__':
+    unittest.main()
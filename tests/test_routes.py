@@ -0,0 +1,92 @@
+import os
+import unittest
+
+from autoclone import routes
+from autoclone.benchmark import SCRIPTS_DIR
+from autoclone.robot import simulate
+
+PURIFICATION = os.path.join(SCRIPTS_DIR, 'plasmid_purification.py')
+TRANSFORMATION = os.path.join(SCRIPTS_DIR, 'heat-shock_transformation.py')
+
+
+def command(name, slot=None, well=None, phase='lysis', reservoir=False):
+    entry = {'command': name, 'phase': phase}
+    if name not in ('delay', 'pause', 'comment'):
+        entry.update(mount='left', slot=slot, well=well, reservoir=reservoir, x=0.0)
+    return entry
+
+
+def trip(column, phase='lysis', hold=False):
+    commands = [command('pick_up_tip', '4', column, phase), command('aspirate', '3', 'A1', phase, reservoir=True)]
+    if hold:
+        commands.append(command('delay', phase=phase))
+    return commands + [command('dispense', '1', column, phase), command('drop_tip', '12', 'A1', phase)]
+
+
+class FindStepsTest(unittest.TestCase):
+    def test_steps_span_phases(self):
+        steps = routes.find_steps(trip('A1', 'lysis') + trip('A2', 'neutralization') + trip('A3', 'neutralization'))
+        self.assertEqual(len(steps), 1)
+        self.assertEqual(steps[0]['trips'], [(0, 4), (4, 8), (8, 12)])
+        self.assertEqual(steps[0]['phase'], 'lysis')
+
+    def test_delay_with_the_reagent_in_the_tip_pins_its_trip(self):
+        steps = routes.find_steps(trip('A1') + trip('A2', hold=True) + trip('A3'))
+        self.assertEqual([len(step['trips']) for step in steps], [3])
+        self.assertEqual(steps[0]['pinned'], {1})
+
+    def test_mixing_the_column_belongs_to_the_trip(self):
+        mixed = trip('A2')
+        mixed[3:3] = [command('aspirate', '1', 'A2'), command('dispense', '1', 'A2')]
+        steps = routes.find_steps(trip('A1') + mixed + trip('A3'))
+        self.assertEqual([step['trips'] for step in steps], [[(0, 4), (4, 10), (10, 14)]])
+        # taking the liquid elsewhere ends the run
+        moved = trip('A2')
+        moved[3:3] = [command('aspirate', '1', 'A2'), command('dispense', '2', 'A2')]
+        self.assertEqual([len(step['trips']) for step in routes.find_steps(trip('A1') + moved + trip('A3'))], [2])
+
+    def test_delay_between_trips_ends_the_step(self):
+        commands = trip('A1') + trip('A2') + [command('delay')] + trip('A3') + trip('A4')
+        self.assertEqual([step['start'] for step in routes.find_steps(commands)], [0, 9])
+
+    def test_protocol_steps(self):
+        steps = routes.find_steps(simulate(TRANSFORMATION).commands)
+        self.assertEqual([(step['source'], len(step['trips'])) for step in steps], [(('9', 'A1'), 12)])
+        steps = routes.find_steps(simulate(PURIFICATION).commands)
+        self.assertEqual({step['source'][1] for step in steps if step['mixed']}, {'A5'})
+
+
+class BestAssignmentTest(unittest.TestCase):
+    def test_least_total_cost(self):
+        cost = {('a', 'A1'): 5, ('a', 'A2'): 1, ('b', 'A1'): 2, ('b', 'A2'): 3}
+        self.assertEqual(routes.best_assignment(['a', 'b'], ['A1', 'A2'], cost), {'a': 'A2', 'b': 'A1'})
+
+    def test_missing_pairs_are_not_taken(self):
+        cost = {('a', 'A1'): 5, ('a', 'A2'): 1, ('b', 'A2'): 3}
+        self.assertEqual(routes.best_assignment(['a', 'b'], ['A1', 'A2', 'A3'], cost), {'a': 'A1', 'b': 'A2'})
+
+    def test_no_reagents(self):
+        self.assertEqual(routes.best_assignment([], ['A1'], {}), {})
+
+
+class PlanRoutesTest(unittest.TestCase):
+    def test_every_change_saves_time(self):
+        for path in (PURIFICATION, TRANSFORMATION):
+            for description, plan in routes.plan_routes(path):
+                with self.subTest(step=description):
+                    if plan['columns'] != [plan['recorded']] or plan['order'] != 'as recorded':
+                        self.assertLess(plan['after'], plan['before'] - routes.MIN_SAVING)
+                    else:
+                        self.assertEqual(plan['after'], plan['before'])
+
+    def test_reagents_cover_all_their_columns(self):
+        plans = dict(routes.plan_routes(PURIFICATION))
+        self.assertEqual(len(plans), 8)
+        # MagnesilRed is mixed in its column before the binding, so it stays there
+        self.assertEqual(plans['binding: agilent_12_reservoir_21ml (3) A5 -> 12 columns']['columns'], ['A5'])
+        self.assertEqual([description for description, _ in routes.plan_routes(TRANSFORMATION)],
+                         ['SOC addition: agilent_12_reservoir_21ml (9) A1 -> 12 columns'])
+
+
+if __name__ == '__main__':
+    unittest.main()